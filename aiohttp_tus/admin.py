@@ -0,0 +1,397 @@
+import asyncio
+import string
+import time
+from contextlib import suppress
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Mapping, Optional, Tuple
+
+import attr
+from aiohttp import hdrs, web
+
+from .annotations import Decorator, DictStrAny, DictStrStr, Handler, MappingStrStr
+from .constants import APP_TUS_ADMIN_CONFIG_KEY, APP_TUS_CONFIG_KEY
+from .data import (
+    adjust_usage,
+    Config,
+    delete_metadata_paths,
+    get_resource_key,
+    get_resource_lock_path,
+    get_resource_offset_path,
+    get_resource_path,
+    is_resource_uid,
+    read_offset,
+    Resource,
+)
+from .index import IndexedUpload, UploadIndex, UploadsFilter
+from .locks import lock_path, ResourceLocked
+from .profiling import RequestProfiler
+from .quotas import Usage
+from .utils import discard_resource
+
+
+MAX_LIMIT = 1000
+# Characters, which are not allowed in upload path params
+PATH_SEPARATORS = ("/", "\\", "\0")
+
+
+@attr.dataclass(frozen=True, slots=True)
+class AdminConfig:
+    upload_url: str
+    batch_size: int = 100
+    concurrency: int = 4
+
+
+def create_admin_app(
+    *,
+    upload_url: str = "/uploads",
+    decorator: Optional[Decorator] = None,
+    batch_size: int = 100,
+    concurrency: int = 4,
+) -> web.Application:
+    """Create admin sub-application to list & bulk delete in-progress uploads.
+
+    Admin application requires ``upload_index`` to be enabled in
+    :func:`aiohttp_tus.setup_tus` call for given ``upload_url``. When ``profiler``
+    is provided there, aggregated profiles of tus views are available via
+    ``/profiles`` routes as well. Mount it as,
+
+    .. code-block:: python
+
+        app.add_subapp("/tus-admin", create_admin_app(decorator=admin_required))
+
+    :param upload_url: tus.io upload URL, passed to :func:`aiohttp_tus.setup_tus`.
+    :param decorator:
+        Decorator for admin views. **Ensure to guard admin views**, as by default
+        **ANY** client will be able to list & delete uploads.
+    :param batch_size: Number of uploads to delete in one batch.
+    :param concurrency: Max number of batches to delete simultaneously.
+    """
+
+    def decorate(handler: Handler) -> Handler:
+        if decorator is None:
+            return handler
+        return decorator(handler)
+
+    app = web.Application()
+    app[APP_TUS_ADMIN_CONFIG_KEY] = AdminConfig(
+        upload_url=upload_url, batch_size=batch_size, concurrency=concurrency
+    )
+    app.router.add_route("GET", "/uploads", decorate(list_uploads))
+    app.router.add_route("POST", "/uploads/delete", decorate(delete_uploads))
+    app.router.add_route("GET", "/profiles", decorate(list_profiles))
+    app.router.add_route("DELETE", "/profiles", decorate(reset_profiles))
+    app.router.add_route("GET", "/profiles/{view}", decorate(dump_profile))
+    return app
+
+
+async def delete_uploads(request: web.Request) -> web.Response:
+    """Delete in-progress uploads by UIDs or by filter in bounded batches.
+
+    Request body should be JSON object with ``uids`` list or ``filter`` object with
+    ``older_than``, ``min_size``, ``max_size`` or ``file_name`` keys. Uploads, which
+    are modified at a moment, are skipped. Only resource UIDs in form, generated on
+    upload creation, are accepted.
+    """
+    admin_config, config, index = get_admin_context(request)
+    match_info = get_match_info(request, config=config)
+    metadata_path = config.resolve_metadata_path(match_info)
+
+    try:
+        data = config.json_loads(await request.text())
+        if "uids" in data:
+            uids = [str(uid) for uid in data["uids"]]
+            if not all(is_resource_uid(uid) for uid in uids):
+                raise ValueError("Invalid resource UID")
+        else:
+            uploads = await index.run(
+                iter_uploads,
+                index,
+                metadata_path,
+                parse_filter(data.get("filter") or {}),
+            )
+            uids = [item.uid for item in uploads]
+    except (AttributeError, TypeError, ValueError):
+        raise web.HTTPBadRequest(text="Invalid delete uploads request")
+
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(admin_config.concurrency)
+
+    async def delete_batch(batch: List[str]) -> Tuple[List[str], List[str]]:
+        async with semaphore:
+            deleted, skipped, released = await loop.run_in_executor(
+                None, delete_resources, config, match_info, batch
+            )
+
+        index.submit(index.remove_uploads, metadata_path, tuple(deleted))
+        adjust_usage(
+            config=config,
+            match_info=match_info,
+            size=-released.bytes,
+            files=-released.files,
+        )
+        for uid, resource in deleted.items():
+            if config.resource_cache is not None:
+                config.resource_cache.delete(
+                    get_resource_key(config=config, match_info=match_info, uid=uid)
+                )
+            if resource is not None:
+                discard_resource(
+                    config=config, match_info=match_info, resource=resource
+                )
+        return (list(deleted), skipped)
+
+    results = await asyncio.gather(
+        *(
+            delete_batch(batch)
+            for batch in iter_batches(uids, size=admin_config.batch_size)
+        )
+    )
+    return web.json_response(
+        {
+            "deleted": sum(len(deleted) for deleted, _ in results),
+            "skipped": [uid for _, skipped in results for uid in skipped],
+        },
+        dumps=config.json_dumps,
+    )
+
+
+def delete_resources(
+    config: Config, match_info: MappingStrStr, uids: List[str]
+) -> Tuple[Dict[str, Optional[Resource]], List[str], Usage]:
+    """Delete resources & their metadata. Called in thread pool executor.
+
+    Return deleted resources by their UIDs (``None`` for resources, which metadata
+    has been missing), skipped UIDs, as well as storage usage released. UIDs of
+    resources, which do not exist, are not reported.
+    """
+    deleted: Dict[str, Optional[Resource]] = {}
+    skipped: List[str] = []
+    released_bytes, released_files = 0, 0
+    for uid in uids:
+        resource_path = get_resource_path(config=config, match_info=match_info, uid=uid)
+        try:
+            with lock_path(
+                get_resource_lock_path(config=config, match_info=match_info, uid=uid)
+            ):
+                try:
+                    resource: Optional[Resource] = Resource.from_metadata(
+                        config=config, match_info={**match_info, "resource_uid": uid}
+                    )
+                except (IOError, KeyError, TypeError, ValueError):
+                    resource = None
+
+                removed = False
+                with suppress(FileNotFoundError):
+                    size = resource_path.stat().st_size
+                    resource_path.unlink()
+                    released_bytes += size
+                    released_files += 1
+                    removed = True
+
+                if delete_metadata_paths(config=config, match_info=match_info, uid=uid):
+                    removed = True
+                if removed:
+                    deleted[uid] = resource
+        except ResourceLocked:
+            skipped.append(uid)
+    return (deleted, skipped, Usage(bytes=released_bytes, files=released_files))
+
+
+async def dump_profile(request: web.Request) -> web.Response:
+    """Dump aggregated profile of tus view as ``pstats`` file."""
+    view = request.match_info["view"]
+    profile = get_profiler(request).profiles.get(view)
+    if profile is None:
+        raise web.HTTPNotFound(text="")
+    return web.Response(
+        body=profile.to_bytes(),
+        content_type="application/octet-stream",
+        headers={hdrs.CONTENT_DISPOSITION: f'attachment; filename="{view}.prof"'},
+    )
+
+
+def get_admin_context(request: web.Request) -> Tuple[AdminConfig, Config, UploadIndex]:
+    admin_config, config = get_config(request)
+    if config.upload_index is None:
+        raise web.HTTPNotImplemented(text="Upload index is not enabled")
+    return (admin_config, config, config.upload_index)
+
+
+def get_config(request: web.Request) -> Tuple[AdminConfig, Config]:
+    admin_config: AdminConfig = request.app[APP_TUS_ADMIN_CONFIG_KEY]
+    canonical_upload_url = web.DynamicResource(admin_config.upload_url).canonical
+    try:
+        config: Config = request.config_dict[APP_TUS_CONFIG_KEY][canonical_upload_url]
+    except KeyError:
+        raise KeyError(
+            f"Unable to find aiohttp_tus config for {admin_config.upload_url!r} URL"
+        )
+    return (admin_config, config)
+
+
+def get_match_info(request: web.Request, *, config: Config) -> DictStrStr:
+    """Query string params, used to format templated upload path.
+
+    Each param should be single path component, so admin requests never reach
+    paths out of upload path. Upload paths are not created by admin requests.
+
+    :raises aiohttp.web.HTTPBadRequest: on missing or invalid param.
+    :raises aiohttp.web.HTTPNotFound: if upload path does not exist.
+    """
+    match_info: DictStrStr = {}
+    for _, field, _, _ in string.Formatter().parse(str(config.upload_path)):
+        if not field:
+            continue
+        value = request.query.get(field)
+        if (
+            not value
+            or value in (".", "..")
+            or any(item in value for item in PATH_SEPARATORS)
+        ):
+            raise web.HTTPBadRequest(text=f"Invalid {field!r} upload path param")
+        match_info[field] = value
+
+    if match_info and not config.resolve_upload_path(match_info).is_dir():
+        raise web.HTTPNotFound(text="Upload path not found")
+    return match_info
+
+
+def get_profiler(request: web.Request) -> RequestProfiler:
+    _, config = get_config(request)
+    if config.profiler is None:
+        raise web.HTTPNotImplemented(text="Request profiler is not enabled")
+    return config.profiler
+
+
+def iter_batches(items: List[str], *, size: int) -> Iterator[List[str]]:
+    for start in range(0, len(items), size):
+        end = start + size
+        yield items[start:end]
+
+
+def iter_uploads(
+    index: UploadIndex, metadata_path: Path, uploads_filter: UploadsFilter
+) -> List[IndexedUpload]:
+    uploads: List[IndexedUpload] = []
+    after: Optional[Tuple[float, str]] = None
+    while True:
+        page = index.list_uploads(
+            metadata_path, uploads_filter, limit=MAX_LIMIT, after=after
+        )
+        uploads.extend(page)
+        if len(page) < MAX_LIMIT:
+            return uploads
+        after = (page[-1].created_at, page[-1].uid)
+
+
+async def list_profiles(request: web.Request) -> web.Response:
+    """List tus views with number of profiled calls."""
+    profiler = get_profiler(request)
+    return web.json_response(
+        {
+            "profiles": {
+                view: {"calls": profile.calls}
+                for view, profile in sorted(profiler.profiles.items())
+            }
+        }
+    )
+
+
+async def list_uploads(request: web.Request) -> web.Response:
+    """List in-progress uploads from the upload index.
+
+    Supports ``older_than`` (seconds), ``min_size``, ``max_size`` & ``file_name``
+    (glob pattern) filters and pagination via ``limit`` & ``after`` params.
+    """
+    _, config, index = get_admin_context(request)
+    match_info = get_match_info(request, config=config)
+    metadata_path = config.resolve_metadata_path(match_info)
+
+    query = request.query
+    try:
+        uploads_filter = parse_filter(query)
+        limit = min(int(query.get("limit") or 100), MAX_LIMIT)
+        after = parse_cursor(query["after"]) if query.get("after") else None
+    except ValueError:
+        raise web.HTTPBadRequest(text="Invalid list uploads request")
+
+    # Page, total & offsets are read in single job, so up to ``MAX_LIMIT`` offset
+    # reads do not block event loop
+    items, total = await index.run(
+        read_uploads_page,
+        config,
+        match_info,
+        index,
+        metadata_path,
+        uploads_filter,
+        limit=limit,
+        after=after,
+    )
+    return web.json_response(
+        {
+            "uploads": items,
+            "total": total,
+            "next": (
+                f"{items[-1]['created_at']!r}:{items[-1]['uid']}"
+                if len(items) == limit
+                else None
+            ),
+        },
+        dumps=config.json_dumps,
+    )
+
+
+def parse_cursor(value: str) -> Tuple[float, str]:
+    created_at, uid = value.split(":", 1)
+    return (float(created_at), uid)
+
+
+def parse_filter(data: Mapping[str, Any]) -> UploadsFilter:
+    older_than = data.get("older_than")
+    min_size = data.get("min_size")
+    max_size = data.get("max_size")
+    return UploadsFilter(
+        created_before=(
+            time.time() - float(older_than) if older_than is not None else None
+        ),
+        min_size=int(min_size) if min_size is not None else None,
+        max_size=int(max_size) if max_size is not None else None,
+        file_name=data.get("file_name") or None,
+    )
+
+
+def read_uploads_page(
+    config: Config,
+    match_info: MappingStrStr,
+    index: UploadIndex,
+    metadata_path: Path,
+    uploads_filter: UploadsFilter,
+    *,
+    limit: int,
+    after: Optional[Tuple[float, str]],
+) -> Tuple[List[DictStrAny], int]:
+    """Return page of uploads with their offsets & total number of uploads.
+
+    Called in upload index worker thread.
+    """
+    uploads = index.list_uploads(
+        metadata_path, uploads_filter, limit=limit, after=after
+    )
+    items: List[DictStrAny] = [
+        {
+            **attr.asdict(item),
+            "offset": read_offset(
+                get_resource_offset_path(
+                    config=config, match_info=match_info, uid=item.uid
+                )
+            ),
+        }
+        for item in uploads
+    ]
+    return (items, index.count_uploads(metadata_path, uploads_filter))
+
+
+async def reset_profiles(request: web.Request) -> web.Response:
+    """Reset aggregated profiles."""
+    get_profiler(request).reset()
+    return web.Response(status=204)
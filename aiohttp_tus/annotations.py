@@ -1,9 +1,11 @@
-from typing import Any, Callable, Dict, Mapping
+from typing import Any, Callable, Dict, Mapping, Tuple
 
+# Handler is re-exported explicitly, so views & their wrappers (e.g. in monitor &
+# profiler) stay typed, even when implicit re-exports are disabled
 try:
-    from aiohttp.web_middlewares import _Handler as Handler
-except ImportError:
-    from aiohttp.web_middlewares import Handler
+    from aiohttp.typedefs import Handler as Handler
+except ImportError:  # pragma: no cover
+    from aiohttp.web_middlewares import _Handler as Handler  # type: ignore
 
 Decorator = Callable[[Handler], Handler]
 
@@ -16,3 +18,8 @@ JsonLoads = Callable[[str], Any]
 
 MappingStrBytes = Mapping[str, bytes]
 MappingStrStr = Mapping[str, str]
+
+MetadataValidator = Callable[[MappingStrBytes], MappingStrBytes]
+
+# Resolved upload path & resource UID
+ResourceKey = Tuple[str, str]
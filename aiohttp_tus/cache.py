@@ -0,0 +1,83 @@
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple, TYPE_CHECKING
+
+import attr
+
+from .annotations import ResourceKey
+
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .data import Resource
+
+
+CacheItem = Tuple[float, "Resource"]
+
+
+@attr.dataclass(slots=True)
+class ResourceCache:
+    """Bounded in-process cache of resources, keyed by upload path & resource UID.
+
+    Least recently used resources are evicted when cache is full, as well as
+    resources, which had not been updated for ``ttl`` seconds.
+
+    :param maxsize: Max number of cached resources.
+    :param ttl: Time to live of cached resource in seconds.
+    """
+
+    maxsize: int = 1024
+    ttl: float = 60.0
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    items: "OrderedDict[ResourceKey, CacheItem]" = attr.Factory(OrderedDict)
+
+    def clear(self) -> None:
+        self.items.clear()
+
+    def delete(self, key: ResourceKey) -> None:
+        self.items.pop(key, None)
+
+    def get(self, key: ResourceKey) -> Optional["Resource"]:
+        item = self.items.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+
+        expires_at, resource = item
+        if expires_at < time.monotonic():
+            del self.items[key]
+            self.evictions += 1
+            self.misses += 1
+            return None
+
+        self.items.move_to_end(key)
+        self.hits += 1
+        return resource
+
+    def set(self, key: ResourceKey, resource: "Resource") -> None:
+        self.items[key] = (time.monotonic() + self.ttl, resource)
+        self.items.move_to_end(key)
+
+        while len(self.items) > self.maxsize:
+            self.items.popitem(last=False)
+            self.evictions += 1
+
+    @property
+    def stats(self) -> "CacheStats":
+        return CacheStats(
+            size=len(self.items),
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+        )
+
+
+@attr.dataclass(frozen=True, slots=True)
+class CacheStats:
+    size: int
+    hits: int
+    misses: int
+    evictions: int
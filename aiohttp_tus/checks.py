@@ -0,0 +1,207 @@
+import os
+from bisect import bisect_left
+from contextlib import suppress
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import attr
+
+from .annotations import MappingStrStr
+from .compression import SUFFIX_CODECS
+from .data import (
+    Config,
+    get_file_path,
+    get_resource_offset_path,
+    read_offset,
+)
+from .index import IndexedUpload
+
+
+MAX_FILES = 1000
+
+
+@attr.dataclass(frozen=True, slots=True)
+class FileCheck:
+    """File to check before uploading it.
+
+    :param name: File name.
+    :param size: Expected file size, if known.
+    :param digest: Expected content digest, if known & content store is enabled.
+    """
+
+    name: str
+    size: Optional[int] = None
+    digest: Optional[str] = None
+
+
+@attr.dataclass(frozen=True, slots=True)
+class FileStatus:
+    """Result of checking single file.
+
+    ``matches`` is ``None``, when neither size nor digest have been given to compare
+    uploaded file with.
+    """
+
+    name: str
+    exists: bool
+    size: Optional[int] = None
+    matches: Optional[bool] = None
+    uid: Optional[str] = None
+    offset: Optional[int] = None
+
+
+def get_files_status(
+    *,
+    config: Config,
+    match_info: MappingStrStr,
+    checks: List[FileCheck],
+    uploads: Dict[str, IndexedUpload],
+) -> List[FileStatus]:
+    """Check uploaded files & in-progress uploads. Called in thread pool executor.
+
+    Each uploaded file is checked with single ``stat`` call. Same as on starting the
+    upload, file with the same stem (e.g. compressed ``foo.csv.gz`` for ``foo.csv``)
+    is treated as uploaded file, which is found by single scan of the upload path
+    for whole batch. In-progress uploads are expected to be looked up in the upload
+    index beforehand, as metadata path is never scanned.
+    """
+    upload_path = config.resolve_upload_path(match_info)
+    file_names: Optional[List[str]] = None
+    results = []
+    for item in checks:
+        path = get_file_path(config=config, match_info=match_info, file_name=item.name)
+        try:
+            size: Optional[int] = path.stat().st_size
+        except FileNotFoundError:
+            size = None
+
+        if size is None:
+            if file_names is None:
+                file_names = list_file_names(upload_path)
+            stem_path = find_stem_path(upload_path, file_names, item.name)
+            if stem_path is not None:
+                with suppress(FileNotFoundError):
+                    path, size = stem_path, stem_path.stat().st_size
+
+        upload = uploads.get(item.name)
+        results.append(
+            FileStatus(
+                name=item.name,
+                exists=size is not None,
+                size=size,
+                matches=(
+                    is_matching(
+                        config=config,
+                        match_info=match_info,
+                        path=path,
+                        size=size,
+                        check=item,
+                    )
+                    if size is not None
+                    else None
+                ),
+                uid=upload.uid if upload is not None else None,
+                offset=(
+                    read_offset(
+                        get_resource_offset_path(
+                            config=config, match_info=match_info, uid=upload.uid
+                        )
+                    )
+                    if upload is not None
+                    else None
+                ),
+            )
+        )
+    return results
+
+
+def find_stem_path(
+    upload_path: Path, file_names: List[str], file_name: str
+) -> Optional[Path]:
+    """Find first file, which name starts with the stem of given file name.
+
+    Matches the same files as ``{stem}.*`` glob of
+    :func:`aiohttp_tus.validators.check_file_name` via binary search over sorted
+    file names of the upload path.
+    """
+    prefix = f"{Path(file_name).stem}."
+    idx = bisect_left(file_names, prefix)
+    if idx < len(file_names) and file_names[idx].startswith(prefix):
+        return upload_path / file_names[idx]
+    return None
+
+
+def is_matching(
+    *,
+    config: Config,
+    match_info: MappingStrStr,
+    path: Path,
+    size: int,
+    check: FileCheck,
+) -> Optional[bool]:
+    if check.size is None and check.digest is None:
+        return None
+    # Size of compressed file can not be compared with size of original one
+    compressed = path.name != check.name and path.suffix in SUFFIX_CODECS
+    if compressed and check.digest is None:
+        return None
+    if not compressed and check.size is not None and size != check.size:
+        return False
+
+    # Deduplicated files are hard links to stored object of their content digest
+    store = config.content_store
+    if check.digest is None or store is None:
+        return True
+    # Compressed files are linked to objects, keyed with codec suffix
+    object_path = store.find(
+        config.resolve_upload_path(match_info),
+        check.digest,
+        size=size,
+        suffix=path.suffix if path.suffix in SUFFIX_CODECS else "",
+    )
+    return object_path is not None and os.path.samefile(object_path, path)
+
+
+def list_file_names(upload_path: Path) -> List[str]:
+    """Return sorted names of the upload path, except of hidden tus paths."""
+    try:
+        with os.scandir(upload_path) as entries:
+            return sorted(
+                entry.name for entry in entries if not entry.name.startswith(".")
+            )
+    except FileNotFoundError:
+        return []
+
+
+def parse_checks(data: Any) -> List[FileCheck]:
+    """Parse JSON list of file names or ``{"name", "size", "digest"}`` objects.
+
+    :raises ValueError: on invalid data.
+    """
+    if not isinstance(data, list) or len(data) > MAX_FILES:
+        raise ValueError("Expected list of files to check")
+
+    checks = []
+    for item in data:
+        if isinstance(item, str):
+            item = {"name": item}
+        if not isinstance(item, dict):
+            raise ValueError("Invalid file to check")
+
+        name, size, digest = item.get("name"), item.get("size"), item.get("digest")
+        # Only plain file names are allowed, as hidden paths store tus metadata
+        if (
+            not isinstance(name, str)
+            or not name
+            or name != os.path.basename(name)
+            or name.startswith(".")
+        ):
+            raise ValueError("Invalid file name")
+        if size is not None and (
+            not isinstance(size, int) or isinstance(size, bool) or size < 0
+        ):
+            raise ValueError("Invalid file size")
+        if digest is not None and not isinstance(digest, str):
+            raise ValueError("Invalid file digest")
+        checks.append(FileCheck(name=name, size=size, digest=digest))
+    return checks
@@ -0,0 +1,394 @@
+import asyncio
+from pathlib import Path
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple, Union
+
+import aiohttp
+import attr
+from yarl import URL
+
+from . import constants
+from .metadata import format_upload_metadata
+from .streams import iter_file_slices
+
+
+DEFAULT_CHUNK_SIZE = 4194304
+
+# Statuses of temporary failures, after which request is retried
+RETRY_STATUSES = (408, 423, 429, 500, 502, 503, 504)
+# Chunk might be rejected with ``409 Conflict``, when server has persisted part of
+# previous chunk, which has been interrupted, so chunk upload resumes from offset
+# reported by the server
+RESUME_STATUSES = (*RETRY_STATUSES, 409)
+
+PathLike = Union[str, Path]
+
+
+class TusClientError(Exception):
+    """Unexpected response from tus server."""
+
+    def __init__(self, message: str, *, status: Optional[int] = None) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+@attr.dataclass(frozen=True, slots=True)
+class Upload:
+    """Uploaded file.
+
+    :param location: Resource URL of the upload.
+    :param offset: Number of uploaded bytes.
+    :param file_size: File size.
+    """
+
+    location: str
+    offset: int
+    file_size: int
+
+
+@attr.dataclass(slots=True)
+class TusClient:
+    """Asyncio tus client, built on top of :class:`aiohttp.ClientSession`.
+
+    Client uploads files chunk by chunk, streaming each chunk from the file with
+    ``pread`` calls in thread pool executor, so many files are uploaded at once
+    without reading them into memory. On network errors & temporary server failures
+    chunk upload is retried with exponential backoff from the offset, reported by
+    the server. Uploads, which have been started before, are resumed either by
+    given resource URL or by finding them via ``GET {upload_url}`` request, when
+    server has upload index enabled.
+
+    When ``parallel_chunks`` is greater than ``1`` & server supports pipelining,
+    chunks of each file are uploaded concurrently within pipelining window.
+
+    Use client as async context manager,
+
+    .. code-block:: python
+
+        async with TusClient(chunk_size=8 * 1024 * 1024) as client:
+            await client.upload_many("https://example.com/uploads", paths)
+
+    :param session:
+        :class:`aiohttp.ClientSession` to send requests with. By default: session,
+        pooling up to ``concurrency * parallel_chunks`` connections, is created &
+        closed by client.
+    :param chunk_size: Size of each chunk in bytes.
+    :param parallel_chunks: Number of chunks of one file to upload at once.
+    :param concurrency: Number of files to upload at once via :meth:`upload_many`.
+    :param retries: Number of retries after consecutive failures.
+    :param retry_delay:
+        Delay in seconds before first retry, doubled for each next one.
+    :param headers: Extra headers to send with each request, e.g. ``Authorization``.
+    """
+
+    session: Optional[aiohttp.ClientSession] = None
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+    parallel_chunks: int = 1
+    concurrency: int = 4
+    retries: int = 3
+    retry_delay: float = 0.5
+    headers: Dict[str, str] = attr.Factory(dict)
+
+    owns_session: bool = False
+    pipelining_windows: Dict[str, int] = attr.Factory(dict)
+
+    async def __aenter__(self) -> "TusClient":
+        self.get_session()
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        if self.session is not None and self.owns_session:
+            await self.session.close()
+            self.session = None
+            self.owns_session = False
+
+    async def create_upload(
+        self, url: str, *, file_size: int, metadata_header: str
+    ) -> Tuple[str, Optional[int]]:
+        """Start upload & return its resource URL.
+
+        Server completes upload on creation, when it already stores file with digest,
+        declared in upload metadata. Then upload offset is returned as well,
+        otherwise it is ``None``.
+        """
+        async with self.get_session().post(
+            url,
+            headers={
+                **self.get_headers(),
+                constants.HEADER_UPLOAD_LENGTH: str(file_size),
+                constants.HEADER_UPLOAD_METADATA: metadata_header,
+            },
+        ) as response:
+            check_status(response, 201)
+            offset = response.headers.get(constants.HEADER_UPLOAD_OFFSET)
+            return (get_location(response), int(offset) if offset is not None else None)
+
+    async def find_upload(
+        self, url: str, *, file_size: int, metadata_header: str
+    ) -> Optional[Tuple[str, int]]:
+        """Find resource URL & offset of in-progress upload of the same file."""
+        async with self.get_session().get(
+            url,
+            headers={
+                **self.get_headers(),
+                constants.HEADER_UPLOAD_LENGTH: str(file_size),
+                constants.HEADER_UPLOAD_METADATA: metadata_header,
+            },
+        ) as response:
+            check_status(response, 200)
+            if constants.HEADER_LOCATION not in response.headers:
+                return None
+            return (
+                get_location(response),
+                int(response.headers[constants.HEADER_UPLOAD_OFFSET]),
+            )
+
+    def get_headers(self) -> Dict[str, str]:
+        return {**self.headers, **constants.BASE_HEADERS}
+
+    async def get_offset(self, location: str) -> int:
+        """Request offset of in-progress upload."""
+        async with self.get_session().head(
+            location, headers=self.get_headers()
+        ) as response:
+            check_status(response, 200)
+            return int(response.headers[constants.HEADER_UPLOAD_OFFSET])
+
+    async def get_pipelining_window(self, url: str) -> int:
+        """Request pipelining window of the server. Return ``0`` if not supported."""
+        window = self.pipelining_windows.get(url)
+        if window is not None:
+            return window
+
+        async with self.get_session().options(
+            url, headers=self.get_headers()
+        ) as response:
+            check_status(response, 204)
+            window = int(
+                response.headers.get(constants.HEADER_TUS_PIPELINING_WINDOW) or 0
+            )
+
+        self.pipelining_windows[url] = window
+        return window
+
+    def get_session(self) -> aiohttp.ClientSession:
+        if self.session is None:
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.concurrency * self.parallel_chunks
+                )
+            )
+            self.owns_session = True
+        return self.session
+
+    async def retry(
+        self, failures: int, error: Exception, statuses: Sequence[int]
+    ) -> None:
+        """Wait before retrying failed request or re-raise non-retryable error."""
+        if failures > self.retries or not is_retryable(error, statuses):
+            raise error
+        await asyncio.sleep(self.retry_delay * 2 ** (failures - 1))
+
+    async def send_chunk(
+        self, location: str, path: Path, *, start: int, end: int, pipelined: bool
+    ) -> int:
+        """Upload chunk of the file. Return upload offset, reported by the server."""
+        headers = {
+            **self.get_headers(),
+            constants.HEADER_CONTENT_LENGTH: str(end - start),
+            constants.HEADER_CONTENT_TYPE: "application/offset+octet-stream",
+            constants.HEADER_UPLOAD_OFFSET: str(start),
+        }
+        if pipelined:
+            headers[constants.HEADER_UPLOAD_PIPELINING] = "true"
+
+        async with self.get_session().patch(
+            location, data=iter_file_slices(path, start=start, end=end), headers=headers
+        ) as response:
+            check_status(response, 204)
+            return int(response.headers[constants.HEADER_UPLOAD_OFFSET])
+
+    async def upload(
+        self,
+        url: str,
+        path: PathLike,
+        *,
+        file_name: Optional[str] = None,
+        metadata: Optional[Mapping[str, bytes]] = None,
+        location: Optional[str] = None,
+    ) -> Upload:
+        """Upload file to given tus upload URL.
+
+        :param url: tus upload URL.
+        :param path: Path to the file.
+        :param file_name: File name to upload file as. By default: name of the file.
+        :param metadata: Extra upload metadata.
+        :param location:
+            Resource URL of previously started upload to resume. By default
+            in-progress upload of the same file is looked up on the server.
+        """
+        path = Path(path)
+        file_size = path.stat().st_size
+        metadata_header = format_upload_metadata(
+            {"filename": (file_name or path.name).encode("utf-8"), **(metadata or {})}
+        )
+
+        failures = 0
+        while True:
+            try:
+                if location is None:
+                    found = await self.find_upload(
+                        url, file_size=file_size, metadata_header=metadata_header
+                    )
+                    if found is None:
+                        location, created_offset = await self.create_upload(
+                            url, file_size=file_size, metadata_header=metadata_header
+                        )
+                        # No chunks to upload, when upload is completed on creation
+                        if created_offset is not None:
+                            return Upload(
+                                location=location,
+                                offset=created_offset,
+                                file_size=file_size,
+                            )
+                        offset = 0
+                    else:
+                        location, offset = found
+                else:
+                    offset = await self.get_offset(location)
+                break
+            except (aiohttp.ClientError, asyncio.TimeoutError, TusClientError) as err:
+                failures += 1
+                await self.retry(failures, err, RETRY_STATUSES)
+
+        window = (
+            await self.get_pipelining_window(url) if self.parallel_chunks > 1 else 0
+        )
+        if window >= self.chunk_size and offset < file_size:
+            try:
+                offset = await self.upload_pipelined(
+                    location, path, offset=offset, file_size=file_size, window=window
+                )
+            # Continue upload sequentially from the offset, reported by the server
+            except (aiohttp.ClientError, asyncio.TimeoutError, TusClientError) as err:
+                await self.retry(1, err, RESUME_STATUSES)
+                offset = await self.get_offset(location)
+
+        offset = await self.upload_chunks(
+            location, path, offset=offset, file_size=file_size
+        )
+        return Upload(location=location, offset=offset, file_size=file_size)
+
+    async def upload_chunks(
+        self, location: str, path: Path, *, offset: int, file_size: int
+    ) -> int:
+        """Upload chunks one by one, starting from given offset."""
+        failures = 0
+        resync = False
+        # Empty file is completed by single empty chunk
+        pending = file_size == 0 and offset == 0
+        while offset < file_size or pending:
+            try:
+                if resync:
+                    offset = await self.get_offset(location)
+                    resync = False
+                    if offset >= file_size:
+                        break
+                offset = await self.send_chunk(
+                    location,
+                    path,
+                    start=offset,
+                    end=min(offset + self.chunk_size, file_size),
+                    pipelined=False,
+                )
+                failures = 0
+                pending = False
+            except (aiohttp.ClientError, asyncio.TimeoutError, TusClientError) as err:
+                failures += 1
+                await self.retry(failures, err, RESUME_STATUSES)
+                resync = True
+        return offset
+
+    async def upload_many(
+        self,
+        url: str,
+        paths: Sequence[PathLike],
+        *,
+        metadata: Optional[Mapping[str, bytes]] = None,
+    ) -> List[Upload]:
+        """Upload many files, up to ``concurrency`` files at once.
+
+        :param url: tus upload URL.
+        :param paths: Paths to the files, uploaded under their names.
+        :param metadata: Extra upload metadata, sent for each file.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def limited_upload(path: PathLike) -> Upload:
+            async with semaphore:
+                return await self.upload(url, path, metadata=metadata)
+
+        return list(await asyncio.gather(*(limited_upload(item) for item in paths)))
+
+    async def upload_pipelined(
+        self, location: str, path: Path, *, offset: int, file_size: int, window: int
+    ) -> int:
+        """Upload up to ``parallel_chunks`` chunks at once within pipelining window.
+
+        Chunk is sent only when it ends within the window beyond contiguous uploaded
+        offset, as server rejects chunks beyond the window.
+        """
+        condition = asyncio.Condition()
+        semaphore = asyncio.Semaphore(self.parallel_chunks)
+        uploaded: Dict[int, int] = {}
+        contiguous = offset
+
+        async def send(start: int) -> None:
+            nonlocal contiguous
+            end = min(start + self.chunk_size, file_size)
+            async with semaphore:
+                async with condition:
+                    await condition.wait_for(lambda: end <= contiguous + window)
+                await self.send_chunk(
+                    location, path, start=start, end=end, pipelined=True
+                )
+            async with condition:
+                uploaded[start] = end
+                while contiguous in uploaded:
+                    contiguous = uploaded.pop(contiguous)
+                condition.notify_all()
+
+        tasks = [
+            asyncio.create_task(send(start))
+            for start in range(offset, file_size, self.chunk_size)
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
+        return contiguous
+
+
+def check_status(response: aiohttp.ClientResponse, expected: int) -> None:
+    if response.status != expected:
+        raise TusClientError(
+            f"Unexpected response status {response.status} for "
+            f"{response.method} {response.url}",
+            status=response.status,
+        )
+
+
+def get_location(response: aiohttp.ClientResponse) -> str:
+    # Location might be relative to the request URL
+    return str(response.url.join(URL(response.headers[constants.HEADER_LOCATION])))
+
+
+def is_retryable(error: Exception, statuses: Sequence[int]) -> bool:
+    if isinstance(error, TusClientError):
+        return error.status in statuses
+    return True
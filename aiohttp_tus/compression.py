@@ -0,0 +1,124 @@
+import asyncio
+import gzip
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor
+from fnmatch import fnmatchcase
+from pathlib import Path
+from typing import Any, Callable, Dict, Mapping, Optional
+
+import attr
+from aiohttp import web
+
+from .annotations import MappingStrBytes, MappingStrStr
+
+
+try:
+    from compression import zstd
+except ImportError:  # pragma: no cover
+    zstd = None
+
+
+CODEC_GZIP = "gzip"
+CODEC_ZSTD = "zstd"
+
+CodecOpener = Callable[[str, int], Any]
+
+CODECS: Dict[str, CodecOpener] = {
+    CODEC_GZIP: lambda path, level: gzip.open(path, "wb", compresslevel=level),
+}
+if zstd is not None:  # pragma: no cover
+    CODECS[CODEC_ZSTD] = lambda path, level: zstd.open(path, "wb", level=level)
+
+CODEC_SUFFIXES = {CODEC_GZIP: ".gz", CODEC_ZSTD: ".zst"}
+SUFFIX_CODECS = {suffix: codec for codec, suffix in CODEC_SUFFIXES.items()}
+CODEC_LEVELS = {CODEC_GZIP: 6, CODEC_ZSTD: 3}
+
+CONTENT_TYPE_METADATA_KEYS = ("filetype", "content-type", "contenttype")
+DEFAULT_CONTENT_TYPES = {
+    "text/*": CODEC_GZIP,
+    "application/csv": CODEC_GZIP,
+    "application/json": CODEC_GZIP,
+    "application/x-ndjson": CODEC_GZIP,
+    "application/xml": CODEC_GZIP,
+}
+READ_CHUNK_SIZE = 1048576
+
+
+@attr.dataclass(slots=True)
+class Compressor:
+    """Compress completed uploads at rest.
+
+    Codec chosen by the content type, provided in ``Upload-Metadata`` header as
+    ``filetype`` (as `tus-js-client <https://github.com/tus/tus-js-client>`_ does)
+    or ``content-type`` value. Compression runs in process pool, so event loop stays
+    free, while resource chunks are still stored uncompressed until the upload is
+    done, which keeps tus resume semantics intact.
+
+    :param content_types:
+        Mapping of content type patterns (as for :func:`fnmatch.fnmatch`) to codec
+        names. Supported codecs: ``"gzip"`` and, on Python 3.14+, ``"zstd"``.
+    :param levels: Compression levels by codec name.
+    :param max_workers: Max number of processes in the pool.
+    """
+
+    content_types: MappingStrStr = attr.Factory(lambda: DEFAULT_CONTENT_TYPES.copy())
+    levels: Mapping[str, int] = attr.Factory(lambda: CODEC_LEVELS.copy())
+    max_workers: Optional[int] = None
+
+    executor: Optional[Executor] = None
+
+    def __attrs_post_init__(self) -> None:
+        for codec in self.content_types.values():
+            if codec not in CODECS:
+                raise ValueError(f"Compression codec {codec!r} is not supported")
+
+    async def compress(self, path: Path, codec: str) -> Path:
+        """Compress file into the path with codec suffix & remove original file."""
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.max_workers)
+
+        compressed_path = path.with_name(path.name + CODEC_SUFFIXES[codec])
+        await asyncio.get_running_loop().run_in_executor(
+            self.executor,
+            compress_file,
+            str(path),
+            str(compressed_path),
+            codec,
+            self.levels.get(codec, CODEC_LEVELS[codec]),
+        )
+        return compressed_path
+
+    def get_codec(self, metadata: MappingStrBytes) -> Optional[str]:
+        content_type = next(
+            (
+                metadata[key].decode("utf-8", errors="replace")
+                for key in CONTENT_TYPE_METADATA_KEYS
+                if metadata.get(key)
+            ),
+            None,
+        )
+        if content_type is None:
+            return None
+
+        content_type = content_type.split(";", 1)[0].strip().lower()
+        for pattern, codec in self.content_types.items():
+            if fnmatchcase(content_type, pattern):
+                return codec
+        return None
+
+    async def on_cleanup(self, app: web.Application) -> None:
+        self.shutdown()
+
+    def shutdown(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+
+def compress_file(path: str, compressed_path: str, codec: str, level: int) -> int:
+    """Compress file and remove the original one. Return compressed file size."""
+    with open(path, "rb") as source, CODECS[codec](compressed_path, level) as target:
+        for chunk in iter(lambda: source.read(READ_CHUNK_SIZE), b""):
+            target.write(chunk)
+    os.unlink(path)
+    return os.path.getsize(compressed_path)
@@ -1,22 +1,50 @@
+from typing import Tuple
+
+
+APP_TUS_ADMIN_CONFIG_KEY = "tus_admin_config"
 APP_TUS_CONFIG_KEY = "tus_config"
 
+HEADER_ACCEPT_RANGES = "Accept-Ranges"
 HEADER_CACHE_CONTROL = "Cache-Control"
 HEADER_CONTENT_LENGTH = "Content-Length"
+HEADER_CONTENT_RANGE = "Content-Range"
+HEADER_CONTENT_TYPE = "Content-Type"
 HEADER_LOCATION = "Location"
 HEADER_TUS_EXTENSION = "Tus-Extension"
 HEADER_TUS_FILE_EXISTS = "Tus-File-Exists"
 HEADER_TUS_FILE_NAME = "Tus-File-Name"
 HEADER_TUS_MAX_SIZE = "Tus-Max-Size"
+HEADER_TUS_PIPELINING_WINDOW = "Tus-Pipelining-Window"
 HEADER_TUS_RESUMABLE = "Tus-Resumable"
 HEADER_TUS_TEMP_FILENAME = "Tus-Temp-Filename"
 HEADER_TUS_VERSION = "Tus-Version"
+HEADER_UPLOAD_DEFER_LENGTH = "Upload-Defer-Length"
 HEADER_UPLOAD_LENGTH = "Upload-Length"
 HEADER_UPLOAD_METADATA = "Upload-Metadata"
 HEADER_UPLOAD_OFFSET = "Upload-Offset"
+HEADER_UPLOAD_PIPELINING = "Upload-Pipelining"
+
+DOWNLOAD_CHUNK_SIZE = 262144
+
+PIPELINING_LOCK_DELAY = 0.005
+PIPELINING_LOCK_TIMEOUT = 5.0
+
+PROCESSOR_STAGE_AFTER_WRITE = "after_write"
+PROCESSOR_STAGE_BEFORE_WRITE = "before_write"
+
+PROGRESS_EVENTS_HEARTBEAT = 15.0
+
+USAGE_RESERVE_STEP = 16777216  # 16MB
 
 TUS_API_VERSION = "1.0.0"
 TUS_API_VERSION_SUPPORTED = "1.0.0"
-TUS_API_EXTENSIONS = ("creation", "termination", "file-check")
+TUS_API_EXTENSIONS: Tuple[str, ...] = (
+    "creation",
+    "creation-defer-length",
+    "termination",
+    "file-check",
+)
+TUS_API_EXTENSION_PIPELINING = "pipelining"
 TUS_MAX_FILE_SIZE = 4294967296  # 4GB
 
 BASE_HEADERS = {
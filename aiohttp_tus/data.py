@@ -1,16 +1,49 @@
 import base64
 import json
+import os
 import shutil
+import struct
 import uuid
 from contextlib import suppress
 from pathlib import Path
-from typing import Awaitable, Callable, Optional, Tuple
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
 
 import attr
 from aiohttp import web
 
-from .annotations import DictStrAny, JsonDumps, JsonLoads
+from .annotations import (
+    DictStrAny,
+    JsonDumps,
+    JsonLoads,
+    MappingStrBytes,
+    MappingStrStr,
+    MetadataValidator,
+    ResourceKey,
+)
+from .cache import ResourceCache
+from .compression import CODEC_SUFFIXES, Compressor
 from .constants import APP_TUS_CONFIG_KEY
+from .events import ProgressBroker
+from .index import UploadIndex
+from .metadata import get_fingerprint, parse_upload_metadata
+from .processors import ChunkProcessor
+from .profiling import RequestProfiler
+from .quotas import UsageLedger
+from .ranges import ByteRange, RangeSet
+from .scheduling import IOScheduler, PRIORITY_NORMAL
+from .storage import ContentStore
+from .validators import validate_upload_metadata
+from .writers import (
+    BufferPool,
+    DEFAULT_MMAP_WINDOW_SIZE,
+    DURABILITY_NONE,
+    WRITE_MODE_FILE,
+)
+
+
+# Resource offset is stored as fixed-width 8-byte unsigned integer, which allows to
+# update it in place with single ``pwrite`` call on every uploaded chunk
+OFFSET_RECORD = struct.Struct(">Q")
 
 
 @attr.dataclass(frozen=True, slots=True)
@@ -23,24 +56,65 @@ class Config:
     allow_overwrite_files: bool = False
     on_upload_done: Optional["ResourceCallback"] = None
 
+    metadata_validators: Tuple[MetadataValidator, ...] = (validate_upload_metadata,)
+    max_metadata_keys: Optional[int] = 64
+    max_metadata_value_size: Optional[int] = 16384
+
+    chunk_processors: Tuple[ChunkProcessor, ...] = ()
+    progress_broker: Optional[ProgressBroker] = None
+    resource_cache: Optional[ResourceCache] = None
+    content_store: Optional[ContentStore] = None
+    compressor: Optional[Compressor] = None
+    upload_index: Optional[UploadIndex] = None
+    fingerprint_lookup: bool = False
+    usage_ledger: Optional[UsageLedger] = None
+    downloads: bool = False
+    pipelining_window: int = 0
+    # Ranges of pipelined chunks, which are being uploaded by requests in progress
+    inflight_ranges: Dict[ResourceKey, List[ByteRange]] = attr.Factory(dict)
+    buffer_pool: BufferPool = attr.Factory(BufferPool)
+    write_mode: str = WRITE_MODE_FILE
+    mmap_window_size: int = DEFAULT_MMAP_WINDOW_SIZE
+    durability: str = DURABILITY_NONE
+    profiler: Optional[RequestProfiler] = None
+    io_scheduler: Optional[IOScheduler] = None
+    io_priority: str = PRIORITY_NORMAL
+
+    read_idle_timeout: Optional[float] = None
+    min_upload_rate: Optional[int] = None
+    min_upload_rate_grace: float = 5.0
+
     mkdir_mode: int = 0o755
 
     json_dumps: JsonDumps = json.dumps
     json_loads: JsonLoads = json.loads
 
-    def resolve_metadata_path(self, match_info: web.UrlMappingMatchInfo) -> Path:
+    def resolve_completed_path(self, match_info: MappingStrStr) -> Path:
+        completed_path = self.resolve_upload_path(match_info) / ".completed"
+        completed_path.mkdir(mode=self.mkdir_mode, parents=True, exist_ok=True)
+        return completed_path
+
+    def resolve_metadata_path(self, match_info: MappingStrStr) -> Path:
         metadata_path = self.resolve_upload_path(match_info) / ".metadata"
         metadata_path.mkdir(mode=self.mkdir_mode, parents=True, exist_ok=True)
         return metadata_path
 
-    def resolve_resources_path(self, match_info: web.UrlMappingMatchInfo) -> Path:
+    def resolve_resources_path(self, match_info: MappingStrStr) -> Path:
         resources_path = self.resolve_upload_path(match_info) / ".resources"
         resources_path.mkdir(mode=self.mkdir_mode, parents=True, exist_ok=True)
         return resources_path
 
-    def resolve_upload_path(self, match_info: web.UrlMappingMatchInfo) -> Path:
+    def resolve_upload_path(self, match_info: MappingStrStr) -> Path:
         return Path(str(self.upload_path.absolute()).format(**match_info))
 
+    @property
+    def resource_tus_batch_check_name(self) -> str:
+        return f"{self.resource_tus_upload_name}_batch_check"
+
+    @property
+    def resource_tus_resource_events_name(self) -> str:
+        return f"{self.resource_tus_resource_name}_events"
+
     @property
     def resource_tus_resource_name(self) -> str:
         return (
@@ -74,21 +148,93 @@ class Resource:
     to ``on_upload_done`` callback if one is defined at :func:`aiohttp_tus.setup_tus`
     call.
 
+    Immutable resource data (file name, file size & metadata header) is stored into
+    JSON file once on initiating resource upload, while current offset is stored
+    separately as 8-byte binary record, updated in place on every chunk.
+
     :param uid: Resource UUID. By default: ``str(uuid.uuid4())``
     :param file_name: Resource file name.
-    :param file_size: Resource file size.
+    :param file_size:
+        Resource file size. ``None`` for uploads with deferred length, until client
+        declares it.
     :param offset: Current resource offset.
     :param metadata_header: Metadata header sent on initiating resource upload.
+    :param metadata:
+        Decoded metadata header as read-only case insensitive mapping. By default:
+        decoded once from ``metadata_header`` on creating resource instance.
+    :param processors_state:
+        State of chunk processors, stored in between resource chunk uploads.
+    :param processors_results:
+        Finalized results of chunk processors. Available only after upload is done.
+    :param content_digest:
+        Hex digest of resource content. Available only after upload is done and only
+        when content-addressed storage is enabled.
+    :param codec:
+        Codec, resource file has been compressed with. Available only after upload
+        is done and only when at-rest compression is enabled.
+    :param ranges:
+        :class:`aiohttp_tus.ranges.RangeSet` of byte ranges, uploaded out of order by
+        pipelined requests beyond the current offset. Stored in compact binary form
+        in between chunk uploads.
     """
 
     file_name: str
-    file_size: int
+    file_size: Optional[int]
     offset: int
     metadata_header: str
 
     uid: str = attr.Factory(lambda: str(uuid.uuid4()))
 
-    def complete(self, *, config: Config, match_info: web.UrlMappingMatchInfo) -> Path:
+    processors_state: DictStrAny = attr.Factory(dict)
+    processors_results: DictStrAny = attr.Factory(dict)
+    content_digest: Optional[str] = None
+    codec: Optional[str] = None
+    ranges: RangeSet = attr.Factory(RangeSet)
+    metadata: MappingStrBytes = attr.ib(
+        default=attr.Factory(
+            lambda self: parse_upload_metadata(self.metadata_header), takes_self=True
+        ),
+        eq=False,
+        repr=False,
+    )
+
+    @property
+    def fingerprint(self) -> Optional[str]:
+        """Fingerprint to find in-progress upload by, when client lost its URL."""
+        return get_fingerprint(self.metadata, self.file_size)
+
+    @property
+    def reserved_size(self) -> int:
+        """Number of bytes, the resource takes in storage usage, while in progress.
+
+        Resource with declared length is allocated with its full size, while resource
+        with deferred length takes only bytes, appended so far.
+        """
+        return self.file_size if self.file_size is not None else self.offset
+
+    def add_range(self, start: int, end: int) -> "Resource":
+        """Add uploaded byte range & advance offset if range continues it."""
+        ranges = self.ranges.copy()
+        ranges.add(start, end)
+        offset = ranges.get_prefix(self.offset)
+        ranges.remove_prefix(offset)
+        return attr.evolve(self, offset=offset, ranges=ranges)
+
+    def iter_missing_ranges(self) -> Iterator[ByteRange]:
+        """Iterate over byte ranges, which are not uploaded yet."""
+        if self.file_size is None:
+            return iter(())
+        return self.ranges.iter_holes(self.offset, self.file_size)
+
+    def complete(self, *, config: Config, match_info: MappingStrStr) -> Path:
+        """Move resource to the file path & delete its metadata.
+
+        Unless ``allow_overwrite_files`` is enabled, resource is never moved over
+        existing file, even if other process completes upload with the same file name
+        at the same time.
+
+        :raises FileExistsError: if file exists and overwrite is not allowed.
+        """
         resource_path = get_resource_path(
             config=config, match_info=match_info, uid=self.uid
         )
@@ -96,58 +242,151 @@ class Resource:
             config=config, match_info=match_info, file_name=self.file_name
         )
 
-        # Python 3.5-3.8 requires to have source as string.
-        # More details: https://bugs.python.org/issue32689
-        shutil.move(str(resource_path), file_path)
+        # Completed file might differ in size from allocated resource (e.g. when
+        # compressed) as well as might replace existing file
+        size_delta, files_delta = 0, 0
+        if config.usage_ledger is not None:
+            size_delta = resource_path.stat().st_size - (self.file_size or 0)
+            if config.allow_overwrite_files and file_path.exists():
+                size_delta -= file_path.stat().st_size
+                files_delta = -1
+
+        if config.content_store is not None and self.content_digest is not None:
+            config.content_store.store(
+                config.resolve_upload_path(match_info),
+                resource_path,
+                file_path,
+                self.content_digest,
+                overwrite=config.allow_overwrite_files,
+                suffix=CODEC_SUFFIXES[self.codec] if self.codec is not None else "",
+            )
+        else:
+            move_path(
+                resource_path, file_path, overwrite=config.allow_overwrite_files
+            )
         self.delete_metadata(config=config, match_info=match_info)
+        link_completed_path(
+            config=config, match_info=match_info, uid=self.uid, file_path=file_path
+        )
+        adjust_usage(
+            config=config, match_info=match_info, size=size_delta, files=files_delta
+        )
 
         return file_path
 
-    def delete(self, *, config: Config, match_info: web.UrlMappingMatchInfo) -> bool:
-        return delete_path(
+    def delete(self, *, config: Config, match_info: MappingStrStr) -> bool:
+        deleted = delete_path(
             get_resource_path(config=config, match_info=match_info, uid=self.uid)
         )
+        if deleted:
+            adjust_usage(
+                config=config,
+                match_info=match_info,
+                size=-self.reserved_size,
+                files=-1,
+            )
+        return deleted
 
     def delete_metadata(
-        self, *, config: Config, match_info: web.UrlMappingMatchInfo
+        self, *, config: Config, match_info: MappingStrStr
     ) -> int:
-        return delete_path(
-            get_resource_metadata_path(
-                config=config, match_info=match_info, uid=self.uid
+        if config.resource_cache is not None:
+            config.resource_cache.delete(
+                get_resource_key(config=config, match_info=match_info, uid=self.uid)
+            )
+        if config.upload_index is not None:
+            config.upload_index.submit(
+                config.upload_index.remove_upload,
+                config.resolve_metadata_path(match_info),
+                self.uid,
             )
+        return delete_metadata_paths(
+            config=config, match_info=match_info, uid=self.uid
         )
 
+    def fix_length(
+        self, *, config: Config, match_info: MappingStrStr, file_size: int
+    ) -> "Resource":
+        """Fix length of resource, which upload has been started with deferred length.
+
+        Only declared length is recorded, as length can not be changed after, while
+        resource file keeps growing by appending chunks.
+        """
+        resource = attr.evolve(self, file_size=file_size)
+        resource.write_metadata(config=config, match_info=match_info)
+        if config.upload_index is not None:
+            config.upload_index.submit(
+                config.upload_index.set_file_size,
+                config.resolve_metadata_path(match_info),
+                self.uid,
+                file_size,
+                fingerprint=resource.fingerprint,
+            )
+        resource.save_progress(config=config, match_info=match_info)
+        return resource
+
     @classmethod
     def from_metadata(
-        cls, *, config: Config, match_info: web.UrlMappingMatchInfo
+        cls, *, config: Config, match_info: MappingStrStr
     ) -> "Resource":
         uid = match_info["resource_uid"]
         path = get_resource_metadata_path(config=config, match_info=match_info, uid=uid)
         data = config.json_loads(path.read_text())
+
+        # Metadata files, created by previous versions, contain offset & processors
+        # state within JSON data
+        offset = read_offset(
+            get_resource_offset_path(config=config, match_info=match_info, uid=uid)
+        )
+        state_path = get_resource_state_path(
+            config=config, match_info=match_info, uid=uid
+        )
+        processors_state = (
+            config.json_loads(state_path.read_text())
+            if state_path.exists()
+            else data.get("processors_state")
+        )
+        ranges_path = get_resource_ranges_path(
+            config=config, match_info=match_info, uid=uid
+        )
+        ranges = (
+            RangeSet.from_bytes(ranges_path.read_bytes())
+            if config.pipelining_window and ranges_path.exists()
+            else RangeSet()
+        )
+
         return cls(
             uid=data["uid"],
             file_name=data["file_name"],
             file_size=data["file_size"],
-            offset=data["offset"],
+            offset=data.get("offset", 0) if offset is None else offset,
             metadata_header=data["metadata_header"],
+            processors_state=processors_state or {},
+            ranges=ranges,
         )
 
     def initial_save(
-        self, *, config: Config, match_info: web.UrlMappingMatchInfo
+        self, *, config: Config, match_info: MappingStrStr
     ) -> Tuple[Path, int]:
+        # Resource with deferred length grows by appending chunks, while empty
+        # resource has nothing to allocate
+        if not self.file_size:
+            return self.save(
+                config=config, match_info=match_info, chunk=b"", mode="wb", offset=0
+            )
         return self.save(
             config=config,
             match_info=match_info,
             chunk=b"\0",
             mode="wb",
-            offset=self.file_size - 1 if self.file_size > 0 else 0,
+            offset=self.file_size - 1,
         )
 
     def save(
         self,
         *,
         config: Config,
-        match_info: web.UrlMappingMatchInfo,
+        match_info: MappingStrStr,
         chunk: bytes,
         mode: str = None,
         offset: int = None,
@@ -159,21 +398,87 @@ class Resource:
         return (path, chunk_size)
 
     def save_metadata(
-        self, *, config: Config, match_info: web.UrlMappingMatchInfo
+        self, *, config: Config, match_info: MappingStrStr
+    ) -> Tuple[Path, DictStrAny]:
+        """Save immutable resource data as well as its current progress."""
+        path, data = self.write_metadata(config=config, match_info=match_info)
+
+        if config.upload_index is not None:
+            config.upload_index.submit(
+                config.upload_index.add_upload,
+                path.parent,
+                uid=self.uid,
+                file_name=self.file_name,
+                file_size=self.file_size,
+                fingerprint=self.fingerprint,
+            )
+
+        self.save_progress(config=config, match_info=match_info)
+        return (path, data)
+
+    def save_progress(
+        self, *, config: Config, match_info: MappingStrStr
+    ) -> Path:
+        """Save resource offset and, if any, chunk processors state.
+
+        Without chunk processors & pipelining it results in single 8-byte write.
+        """
+        if self.processors_state:
+            get_resource_state_path(
+                config=config, match_info=match_info, uid=self.uid
+            ).write_text(config.json_dumps(self.processors_state))
+        if config.pipelining_window:
+            get_resource_ranges_path(
+                config=config, match_info=match_info, uid=self.uid
+            ).write_bytes(self.ranges.to_bytes())
+
+        path = get_resource_offset_path(
+            config=config, match_info=match_info, uid=self.uid
+        )
+        write_offset(path, self.offset)
+
+        if config.resource_cache is not None:
+            config.resource_cache.set(
+                get_resource_key(config=config, match_info=match_info, uid=self.uid),
+                self,
+            )
+
+        return path
+
+    def write_metadata(
+        self, *, config: Config, match_info: MappingStrStr
     ) -> Tuple[Path, DictStrAny]:
         path = get_resource_metadata_path(
             config=config, match_info=match_info, uid=self.uid
         )
 
-        data = attr.asdict(self)
+        fields = attr.fields(Resource)
+        data = attr.asdict(
+            self,
+            filter=attr.filters.include(
+                fields.uid, fields.file_name, fields.file_size, fields.metadata_header
+            ),
+        )
         path.write_text(config.json_dumps(data))
-
         return (path, data)
 
 
 ResourceCallback = Callable[[web.Request, Resource, Path], Awaitable[None]]
 
 
+def adjust_usage(
+    *, config: Config, match_info: MappingStrStr, size: int, files: int
+) -> None:
+    if config.usage_ledger is None or (not size and not files):
+        return
+    config.usage_ledger.submit(
+        config.usage_ledger.adjust,
+        config.resolve_metadata_path(match_info),
+        size=size,
+        files=files,
+    )
+
+
 def delete_path(path: Path) -> bool:
     if path.exists():
         path.unlink()
@@ -181,6 +486,34 @@ def delete_path(path: Path) -> bool:
     return False
 
 
+def delete_metadata_paths(
+    *, config: Config, match_info: MappingStrStr, uid: str
+) -> bool:
+    """Delete all metadata files of the resource.
+
+    Unlike :meth:`Resource.delete_metadata` does not update resource cache & upload
+    index, so it is safe to call it in thread pool executor.
+    """
+    deleted = delete_path(
+        get_resource_metadata_path(config=config, match_info=match_info, uid=uid)
+    )
+    # Lock file is deleted last, so request, which locks the resource right after,
+    # finds its metadata missing
+    for get_path in (
+        get_resource_offset_path,
+        get_resource_ranges_path,
+        get_resource_state_path,
+        get_resource_lock_path,
+    ):
+        delete_path(get_path(config=config, match_info=match_info, uid=uid))
+    unlink_completed_path(config=config, match_info=match_info, uid=uid)
+    return deleted
+
+
+def get_batch_check_url(upload_url: str) -> str:
+    return "/".join((upload_url.rstrip("/"), "_batch", "check"))
+
+
 def get_config(request: web.Request) -> Config:
     route = request.match_info.route
 
@@ -188,7 +521,11 @@ def get_config(request: web.Request) -> Config:
     info = route.get_info()
 
     config_key = info.get("formatter") or info["path"]
-    if config_key.endswith(r"/{resource_uid}"):
+    if config_key.endswith(r"/{resource_uid}/events") or config_key.endswith(
+        "/_batch/check"
+    ):
+        config_key = get_upload_url(get_upload_url(config_key))
+    elif config_key.endswith(r"/{resource_uid}"):
         config_key = get_upload_url(config_key)
 
     try:
@@ -200,31 +537,126 @@ def get_config(request: web.Request) -> Config:
 
 
 def get_file_path(
-    *, config: Config, match_info: web.UrlMappingMatchInfo, file_name: str
+    *, config: Config, match_info: MappingStrStr, file_name: str
 ) -> Path:
     return config.resolve_upload_path(match_info) / file_name
 
 
+def get_resource_key(
+    *, config: Config, match_info: MappingStrStr, uid: str
+) -> ResourceKey:
+    return (str(config.resolve_upload_path(match_info)), uid)
+
+
+def get_resource_completed_path(
+    *, config: Config, match_info: MappingStrStr, uid: str
+) -> Path:
+    return config.resolve_completed_path(match_info) / uid
+
+
+def get_resource_lock_path(
+    *, config: Config, match_info: MappingStrStr, uid: str
+) -> Path:
+    return config.resolve_metadata_path(match_info) / f"{uid}.lock"
+
+
+def get_resource_offset_path(
+    *, config: Config, match_info: MappingStrStr, uid: str
+) -> Path:
+    return config.resolve_metadata_path(match_info) / f"{uid}.offset"
+
+
+def get_resource_ranges_path(
+    *, config: Config, match_info: MappingStrStr, uid: str
+) -> Path:
+    return config.resolve_metadata_path(match_info) / f"{uid}.ranges"
+
+
 def get_resource_path(
-    *, config: Config, match_info: web.UrlMappingMatchInfo, uid: str
+    *, config: Config, match_info: MappingStrStr, uid: str
 ) -> Path:
     return config.resolve_resources_path(match_info) / uid
 
 
 def get_resource_metadata_path(
-    *, config: Config, match_info: web.UrlMappingMatchInfo, uid: str
+    *, config: Config, match_info: MappingStrStr, uid: str
 ) -> Path:
     return config.resolve_metadata_path(match_info) / f"{uid}.json"
 
 
+def get_resource_state_path(
+    *, config: Config, match_info: MappingStrStr, uid: str
+) -> Path:
+    return config.resolve_metadata_path(match_info) / f"{uid}.state.json"
+
+
 def get_resource_url(upload_url: str) -> str:
     return "/".join((upload_url.rstrip("/"), r"{resource_uid}"))
 
 
+def get_resource_events_url(upload_url: str) -> str:
+    return "/".join((get_resource_url(upload_url), "events"))
+
+
 def get_upload_url(resource_url: str) -> str:
     return resource_url.rsplit("/", 1)[0]
 
 
+def is_resource_uid(value: str) -> bool:
+    """Check whether value is resource UID in form, generated on upload creation."""
+    try:
+        return str(uuid.UUID(value)) == value
+    except ValueError:
+        return False
+
+
+def link_completed_path(
+    *, config: Config, match_info: MappingStrStr, uid: str, file_path: Path
+) -> None:
+    """Symlink completed resource UID to uploaded file to allow its downloading."""
+    if not config.downloads:
+        return
+    path = get_resource_completed_path(config=config, match_info=match_info, uid=uid)
+    with suppress(FileExistsError):
+        path.symlink_to(file_path)
+
+
+def move_path(source: Path, target: Path, *, overwrite: bool) -> None:
+    if overwrite:
+        # Python 3.5-3.8 requires to have source as string.
+        # More details: https://bugs.python.org/issue32689
+        shutil.move(str(source), target)
+        return
+
+    # Hard link creation fails if target exists, which makes check & move atomic
+    try:
+        os.link(source, target)
+    except FileExistsError:
+        raise
+    # Hard links are not supported by file system, so reserve target path first
+    except OSError:
+        with open(target, "xb"):
+            pass
+        shutil.move(str(source), target)
+    else:
+        os.unlink(source)
+
+
+def read_offset(path: Path) -> Optional[int]:
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except FileNotFoundError:
+        return None
+    try:
+        data = os.pread(fd, OFFSET_RECORD.size, 0)
+    finally:
+        os.close(fd)
+    if len(data) != OFFSET_RECORD.size:
+        return None
+    offset: int = OFFSET_RECORD.unpack(data)[0]
+    return offset
+
+
 def set_config(app: web.Application, upload_url: str, config: Config) -> None:
     if upload_url in app[APP_TUS_CONFIG_KEY]:
         raise ValueError(
@@ -232,3 +664,23 @@ def set_config(app: web.Application, upload_url: str, config: Config) -> None:
             "Please pass other `upload_url` keyword argument in `setup_tus` function."
         )
     app[APP_TUS_CONFIG_KEY][upload_url] = config
+
+
+def unlink_completed_path(
+    *, config: Config, match_info: MappingStrStr, uid: str
+) -> None:
+    """Delete download link of completed resource, if any."""
+    if not config.downloads:
+        return
+    with suppress(FileNotFoundError):
+        get_resource_completed_path(
+            config=config, match_info=match_info, uid=uid
+        ).unlink()
+
+
+def write_offset(path: Path, offset: int) -> None:
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT, 0o644)
+    try:
+        os.pwrite(fd, OFFSET_RECORD.pack(offset), 0)
+    finally:
+        os.close(fd)
@@ -0,0 +1,108 @@
+import asyncio
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Set
+
+import attr
+
+from .annotations import DictStrAny, JsonDumps, ResourceKey
+
+
+EVENT_COMPLETED = "completed"
+EVENT_DELETED = "deleted"
+EVENT_PROGRESS = "progress"
+
+
+@attr.dataclass(frozen=True, slots=True)
+class ProgressEvent:
+    """Resource upload progress event, pushed to event stream subscribers."""
+
+    uid: str
+    offset: int
+    file_size: Optional[int]
+    event: str = EVENT_PROGRESS
+
+    @property
+    def is_final(self) -> bool:
+        return self.event != EVENT_PROGRESS
+
+    def to_sse(self, *, json_dumps: JsonDumps) -> bytes:
+        data: DictStrAny = attr.asdict(self)
+        return f"event: {self.event}\ndata: {json_dumps(data)}\n\n".encode("utf-8")
+
+
+ProgressQueue = asyncio.Queue[ProgressEvent]
+
+
+@attr.dataclass(slots=True)
+class ProgressBroker:
+    """In-memory pub/sub for resource upload progress.
+
+    Progress events are coalesced, so each subscriber receives at most one progress
+    event per ``interval`` seconds for given resource. Final events (upload completed
+    or resource deleted) are delivered immediately.
+    """
+
+    interval: float = 0.5
+
+    subscribers: Dict[ResourceKey, Set[ProgressQueue]] = attr.Factory(dict)
+    pending: Dict[ResourceKey, ProgressEvent] = attr.Factory(dict)
+    published_at: Dict[ResourceKey, float] = attr.Factory(dict)
+    timers: Dict[ResourceKey, asyncio.TimerHandle] = attr.Factory(dict)
+
+    def publish(self, key: ResourceKey, event: ProgressEvent) -> None:
+        if key not in self.subscribers:
+            return
+
+        self.pending[key] = event
+        if key in self.timers:
+            if not event.is_final:
+                return
+            self.timers.pop(key).cancel()
+
+        delay = self.interval - (time.monotonic() - self.published_at.get(key, 0))
+        if event.is_final or delay <= 0:
+            self.flush(key)
+        else:
+            self.timers[key] = asyncio.get_running_loop().call_later(
+                delay, self.flush, key
+            )
+
+    def flush(self, key: ResourceKey) -> None:
+        self.timers.pop(key, None)
+        event = self.pending.pop(key, None)
+        if event is None:
+            return
+
+        self.published_at[key] = time.monotonic()
+        for queue in self.subscribers.get(key, ()):
+            # Subscriber interested only in latest resource state, so replace not
+            # yet consumed event with the new one
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    @contextmanager
+    def subscribe(self, key: ResourceKey) -> Iterator[ProgressQueue]:
+        queue: ProgressQueue = asyncio.Queue(maxsize=1)
+        self.subscribers.setdefault(key, set()).add(queue)
+        try:
+            yield queue
+        finally:
+            self.unsubscribe(key, queue)
+
+    def unsubscribe(self, key: ResourceKey, queue: ProgressQueue) -> None:
+        queues = self.subscribers.get(key)
+        if queues is None:
+            return
+
+        queues.discard(queue)
+        if queues:
+            return
+
+        del self.subscribers[key]
+        self.pending.pop(key, None)
+        self.published_at.pop(key, None)
+        timer: Optional[asyncio.TimerHandle] = self.timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
@@ -0,0 +1,335 @@
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    ClassVar,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+import attr
+from aiohttp import web
+
+
+T = TypeVar("T")
+
+INDEX_FILE_NAME = "index.sqlite3"
+
+# Max time in seconds to wait for database, which is locked by other process
+BUSY_TIMEOUT = 1.0
+
+# Keep number of bound parameters below SQLite limit of older versions
+MAX_QUERY_PARAMS = 500
+
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS uploads (
+        uid TEXT PRIMARY KEY,
+        file_name TEXT NOT NULL,
+        file_size INTEGER,
+        created_at REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS uploads_created_at ON uploads (created_at, uid)",
+    "CREATE INDEX IF NOT EXISTS uploads_file_name ON uploads (file_name)",
+    """
+    CREATE TABLE IF NOT EXISTS fingerprints (
+        uid TEXT PRIMARY KEY,
+        fingerprint TEXT NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS fingerprints_fingerprint ON fingerprints (fingerprint)",
+)
+
+logger = logging.getLogger(__name__)
+
+
+@attr.dataclass(frozen=True, slots=True)
+class IndexedUpload:
+    """In-progress upload, stored in the upload index."""
+
+    uid: str
+    file_name: str
+    file_size: Optional[int]
+    created_at: float
+
+
+@attr.dataclass(frozen=True, slots=True)
+class UploadsFilter:
+    """Filter in-progress uploads by age, size or file name.
+
+    :param created_before: Only uploads created before given UNIX timestamp.
+    :param min_size: Only uploads of at least given size in bytes.
+    :param max_size: Only uploads of at most given size in bytes.
+    :param file_name: Only uploads matching given glob pattern, e.g. ``"*.log"``.
+    """
+
+    created_before: Optional[float] = None
+    min_size: Optional[int] = None
+    max_size: Optional[int] = None
+    file_name: Optional[str] = None
+
+    def to_sql(self) -> Tuple[str, List[Any]]:
+        clauses = []
+        params: List[Any] = []
+
+        if self.created_before is not None:
+            clauses.append("created_at < ?")
+            params.append(self.created_before)
+        if self.min_size is not None:
+            clauses.append("file_size >= ?")
+            params.append(self.min_size)
+        if self.max_size is not None:
+            clauses.append("file_size <= ?")
+            params.append(self.max_size)
+        if self.file_name is not None:
+            clauses.append("file_name GLOB ?")
+            params.append(self.file_name)
+
+        return (" AND ".join(clauses) or "1", params)
+
+
+@attr.dataclass(slots=True)
+class SQLiteStore:
+    """SQLite databases of upload paths, accessed off the event loop.
+
+    Methods are safe to call from any thread, but might wait for database, locked by
+    other process. So event loop code either :meth:`submit` updates, which are
+    applied in background in submission order, or awaits :meth:`run` to query
+    database in the single worker thread, which sees all updates submitted before.
+    """
+
+    file_name: ClassVar[str] = ""
+    schema: ClassVar[Tuple[str, ...]] = ()
+
+    connections: Dict[Path, sqlite3.Connection] = attr.ib(factory=dict, kw_only=True)
+    lock: threading.Lock = attr.ib(factory=threading.Lock, kw_only=True)
+    executor: Optional[ThreadPoolExecutor] = attr.ib(default=None, kw_only=True)
+
+    def close(self) -> None:
+        with self.lock:
+            for connection in self.connections.values():
+                connection.close()
+            self.connections.clear()
+
+    def get_executor(self) -> ThreadPoolExecutor:
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(
+                max_workers=1, thread_name_prefix="aiohttp-tus-sqlite"
+            )
+        return self.executor
+
+    async def on_cleanup(self, app: web.Application) -> None:
+        # Close connections after all submitted updates are applied
+        await self.run(self.close)
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    async def run(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        """Call given method in worker thread & wait for its result."""
+        return await asyncio.get_running_loop().run_in_executor(
+            self.get_executor(), partial(func, *args, **kwargs)
+        )
+
+    def submit(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> None:
+        """Call given method in worker thread without waiting for its result."""
+        self.get_executor().submit(func, *args, **kwargs).add_done_callback(
+            log_error
+        )
+
+    @contextmanager
+    def transaction(self, metadata_path: Path) -> Iterator[sqlite3.Connection]:
+        with self.lock:
+            connection = self.connections.get(metadata_path)
+            if connection is None:
+                connection = connect_database(
+                    metadata_path / self.file_name, self.schema
+                )
+                self.connections[metadata_path] = connection
+            with connection:
+                yield connection
+
+
+@attr.dataclass(slots=True)
+class UploadIndex(SQLiteStore):
+    """Index of in-progress uploads, stored as SQLite database in metadata path.
+
+    Index allows to list & filter in-progress uploads without listing huge
+    directories. As SQLite database is safe to access from multiple processes, index
+    can be used, when application runs in multiple worker processes.
+    """
+
+    file_name: ClassVar[str] = INDEX_FILE_NAME
+    schema: ClassVar[Tuple[str, ...]] = SCHEMA
+
+    def add_upload(
+        self,
+        metadata_path: Path,
+        *,
+        uid: str,
+        file_name: str,
+        file_size: Optional[int],
+        created_at: Optional[float] = None,
+        fingerprint: Optional[str] = None,
+    ) -> None:
+        with self.transaction(metadata_path) as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO uploads (uid, file_name, file_size, "
+                "created_at) VALUES (?, ?, ?, ?)",
+                (
+                    uid,
+                    file_name,
+                    file_size,
+                    time.time() if created_at is None else created_at,
+                ),
+            )
+            set_fingerprint(connection, uid, fingerprint)
+
+    def count_uploads(
+        self, metadata_path: Path, uploads_filter: Optional[UploadsFilter] = None
+    ) -> int:
+        where, params = (uploads_filter or UploadsFilter()).to_sql()
+        with self.transaction(metadata_path) as connection:
+            row = connection.execute(
+                f"SELECT COUNT(*) FROM uploads WHERE {where}", params
+            ).fetchone()
+        return int(row[0])
+
+    def find_fingerprint(
+        self, metadata_path: Path, fingerprint: str
+    ) -> Optional[IndexedUpload]:
+        """Find latest in-progress upload with given fingerprint."""
+        with self.transaction(metadata_path) as connection:
+            row = connection.execute(
+                "SELECT uploads.uid, file_name, file_size, created_at FROM uploads "
+                "JOIN fingerprints ON fingerprints.uid = uploads.uid "
+                "WHERE fingerprint = ? ORDER BY created_at DESC, uploads.uid DESC "
+                "LIMIT 1",
+                (fingerprint,),
+            ).fetchone()
+        return IndexedUpload(*row) if row is not None else None
+
+    def find_uploads(
+        self, metadata_path: Path, file_names: Iterable[str]
+    ) -> Dict[str, IndexedUpload]:
+        """Find latest in-progress upload of each given file name."""
+        uploads: Dict[str, IndexedUpload] = {}
+        names = sorted(set(file_names))
+        with self.transaction(metadata_path) as connection:
+            for start in range(0, len(names), MAX_QUERY_PARAMS):
+                chunk = names[start : start + MAX_QUERY_PARAMS]  # noqa: E203
+                rows = connection.execute(
+                    "SELECT uid, file_name, file_size, created_at FROM uploads "
+                    f"WHERE file_name IN ({', '.join('?' * len(chunk))}) "
+                    "ORDER BY created_at, uid",
+                    chunk,
+                )
+                # Later uploads override earlier ones of the same file name
+                uploads.update((row[1], IndexedUpload(*row)) for row in rows)
+        return uploads
+
+    def get_upload(self, metadata_path: Path, uid: str) -> Optional[IndexedUpload]:
+        with self.transaction(metadata_path) as connection:
+            row = connection.execute(
+                "SELECT uid, file_name, file_size, created_at FROM uploads "
+                "WHERE uid = ?",
+                (uid,),
+            ).fetchone()
+        return IndexedUpload(*row) if row is not None else None
+
+    def list_uploads(
+        self,
+        metadata_path: Path,
+        uploads_filter: Optional[UploadsFilter] = None,
+        *,
+        limit: int = 100,
+        after: Optional[Tuple[float, str]] = None,
+    ) -> List[IndexedUpload]:
+        """List uploads ordered by creation time.
+
+        To get next page pass ``(created_at, uid)`` of last upload as ``after``.
+        """
+        where, params = (uploads_filter or UploadsFilter()).to_sql()
+        if after is not None:
+            where = f"{where} AND (created_at, uid) > (?, ?)"
+            params.extend(after)
+
+        with self.transaction(metadata_path) as connection:
+            rows = connection.execute(
+                "SELECT uid, file_name, file_size, created_at FROM uploads "
+                f"WHERE {where} ORDER BY created_at, uid LIMIT ?",
+                (*params, limit),
+            ).fetchall()
+        return [IndexedUpload(*row) for row in rows]
+
+    def set_file_size(
+        self,
+        metadata_path: Path,
+        uid: str,
+        file_size: int,
+        *,
+        fingerprint: Optional[str] = None,
+    ) -> None:
+        """Set file size of upload, which has been started with deferred length."""
+        with self.transaction(metadata_path) as connection:
+            connection.execute(
+                "UPDATE uploads SET file_size = ? WHERE uid = ?", (file_size, uid)
+            )
+            set_fingerprint(connection, uid, fingerprint)
+
+    def remove_upload(self, metadata_path: Path, uid: str) -> None:
+        self.remove_uploads(metadata_path, (uid,))
+
+    def remove_uploads(self, metadata_path: Path, uids: Tuple[str, ...]) -> None:
+        with self.transaction(metadata_path) as connection:
+            connection.executemany(
+                "DELETE FROM uploads WHERE uid = ?", ((uid,) for uid in uids)
+            )
+            connection.executemany(
+                "DELETE FROM fingerprints WHERE uid = ?", ((uid,) for uid in uids)
+            )
+
+
+def connect_database(path: Path, schema: Tuple[str, ...]) -> sqlite3.Connection:
+    """Connect to SQLite database, which is safe to share in between processes."""
+    connection = sqlite3.connect(
+        str(path), timeout=BUSY_TIMEOUT, check_same_thread=False
+    )
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    with connection:
+        for statement in schema:
+            connection.execute(statement)
+    return connection
+
+
+def log_error(future: "Future[Any]") -> None:
+    if future.cancelled():
+        return
+    error = future.exception()
+    if error is not None:
+        logger.error("Unable to update SQLite database", exc_info=error)
+
+
+def set_fingerprint(
+    connection: sqlite3.Connection, uid: str, fingerprint: Optional[str]
+) -> None:
+    if fingerprint is not None:
+        connection.execute(
+            "INSERT OR REPLACE INTO fingerprints (uid, fingerprint) VALUES (?, ?)",
+            (uid, fingerprint),
+        )
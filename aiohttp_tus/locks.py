@@ -0,0 +1,69 @@
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+from aiohttp import web
+
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None  # type: ignore
+
+
+class HTTPLocked(web.HTTPClientError):
+    status_code = 423
+
+
+class ResourceLocked(Exception):
+    """Resource is locked by other request (possibly, in other process)."""
+
+
+@contextmanager
+def lock_path(path: Path, *, blocking: bool = False) -> Iterator[None]:
+    """Acquire exclusive advisory lock on the file at given path.
+
+    Lock is shared in between all processes on the same host, which allows to serve
+    same upload path from multiple worker processes. On platforms without
+    :mod:`fcntl` support lock is noop.
+
+    Lock file is allowed to be unlinked by lock holder, as lock is acquired only
+    on the file, which is still linked to the path.
+
+    :raises ResourceLocked: when ``blocking`` is not set and lock is held by other.
+    """
+    if fcntl is None:  # pragma: no cover
+        yield
+        return
+
+    while True:
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(
+                fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB
+            )
+        except BlockingIOError:
+            os.close(fd)
+            raise ResourceLocked(str(path))
+
+        # Previous holder might have unlinked lock file in between opening & locking
+        # it, so lock of unlinked file does not exclude anyone & need to be retried
+        if is_same_file(fd, path):
+            break
+        os.close(fd)
+
+    try:
+        yield
+    finally:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+
+def is_same_file(fd: int, path: Path) -> bool:
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return False
+    fd_stat = os.fstat(fd)
+    return (stat.st_dev, stat.st_ino) == (fd_stat.st_dev, fd_stat.st_ino)
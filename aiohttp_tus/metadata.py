@@ -0,0 +1,92 @@
+import base64
+import binascii
+import hashlib
+from typing import Mapping, Optional, Tuple
+
+from multidict import CIMultiDict, CIMultiDictProxy
+
+from .annotations import MappingStrBytes
+
+
+# Optional metadata key with client supplied partial hash of file content, e.g. hash
+# of its first & last megabytes, to tell apart files with same name & size
+FINGERPRINT_KEY = "fingerprint"
+
+MetadataItems = Tuple[Tuple[str, bytes], ...]
+
+
+def format_upload_metadata(metadata: Mapping[str, bytes]) -> str:
+    """Format ``Upload-Metadata`` header from mapping of keys to raw values."""
+    return ",".join(
+        f"{key} {base64.b64encode(value).decode('ascii')}" if value else key
+        for key, value in metadata.items()
+    )
+
+
+def get_fingerprint(
+    metadata: MappingStrBytes, file_size: Optional[int]
+) -> Optional[str]:
+    """Fingerprint upload by its file name, file size & optional partial hash.
+
+    Uploads with deferred length are not fingerprinted, as their size is unknown.
+    """
+    file_name = metadata.get("filename")
+    if file_name is None or file_size is None:
+        return None
+
+    digest = hashlib.sha256(b"%s\0%d\0" % (file_name, file_size))
+    digest.update(metadata.get(FINGERPRINT_KEY) or b"")
+    return digest.hexdigest()
+
+
+def parse_upload_metadata(
+    metadata_header: str,
+    *,
+    max_keys: Optional[int] = None,
+    max_value_size: Optional[int] = None,
+) -> MappingStrBytes:
+    """Parse ``Upload-Metadata`` header into read-only case insensitive mapping.
+
+    Values are decoded leniently, same as by previous versions, so characters out
+    of base64 alphabet are ignored, while incorrectly padded values are rejected.
+
+    :raises ValueError: when header is malformed or exceeds given limits.
+    """
+    items = parse_upload_metadata_items(metadata_header)
+
+    if max_keys is not None and len(items) > max_keys:
+        raise ValueError(
+            f"Upload metadata contains {len(items)} keys, while only {max_keys} "
+            "allowed"
+        )
+
+    if max_value_size is not None:
+        for key, value in items:
+            if len(value) > max_value_size:
+                raise ValueError(
+                    f"Upload metadata value for {key!r} exceeds {max_value_size} "
+                    "bytes"
+                )
+
+    return CIMultiDictProxy(CIMultiDict(items))
+
+
+def parse_upload_metadata_items(metadata_header: str) -> MetadataItems:
+    items = []
+
+    for item in metadata_header.split(","):
+        parts = item.split()
+        if not parts:
+            continue
+        if len(parts) > 2:
+            raise ValueError(f"Invalid upload metadata item: {item.strip()!r}")
+
+        key = parts[0]
+        try:
+            value = base64.b64decode(parts[1]) if len(parts) > 1 else b""
+        except binascii.Error as err:
+            raise ValueError(f"Invalid upload metadata value for {key!r}") from err
+
+        items.append((key, value))
+
+    return tuple(items)
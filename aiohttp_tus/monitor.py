@@ -0,0 +1,229 @@
+import asyncio
+import heapq
+import logging
+import random
+import time
+from contextlib import contextmanager, suppress
+from contextvars import ContextVar
+from functools import wraps
+from itertools import count
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import attr
+from aiohttp import web
+
+from . import constants
+from .annotations import Handler
+
+
+logger = logging.getLogger(__name__)
+
+
+@attr.dataclass(slots=True)
+class RequestTiming:
+    """Time spent in each phase of sampled request, which blocks event loop."""
+
+    view: str
+    phases: Dict[str, float] = attr.Factory(dict)
+    bytes: int = 0
+
+    def add(self, phase: str, duration: float, *, size: int = 0) -> None:
+        self.phases[phase] = self.phases.get(phase, 0.0) + duration
+        self.bytes += size
+
+    def get_slowest_phase(self) -> Tuple[Optional[str], float]:
+        if not self.phases:
+            return (None, 0.0)
+        phase = max(self.phases, key=self.phases.__getitem__)
+        return (phase, self.phases[phase])
+
+
+current_timing: ContextVar[Optional[RequestTiming]] = ContextVar(
+    "current_timing", default=None
+)
+
+
+@attr.dataclass(frozen=True, slots=True)
+class SlowOperation:
+    """Slow tus view call.
+
+    Phases are available only for sampled requests. As phases wrap synchronous code,
+    phase duration is the time it blocked event loop.
+    """
+
+    view: str
+    uid: Optional[str]
+    bytes: int
+    duration: float
+    phase: Optional[str] = None
+    phase_duration: float = 0.0
+    phases: Dict[str, float] = attr.Factory(dict)
+
+
+@attr.dataclass(slots=True)
+class MonitorStats:
+    requests: int = 0
+    sampled: int = 0
+    slow: int = 0
+    lag_samples: int = 0
+    lag_max: float = 0.0
+    lag_total: float = 0.0
+
+
+SlowOperationCallback = Callable[[SlowOperation], None]
+
+
+@attr.dataclass(slots=True)
+class LoopMonitor:
+    """Detect event loop lag & slow tus view calls.
+
+    On application startup monitor starts background task, which sleeps for
+    ``interval`` seconds & measures how late it has been woken up. Lag larger than
+    ``lag_threshold`` is logged.
+
+    Each tus view call is timed and ``sample_rate`` fraction of calls is also timed
+    phase by phase (reading metadata, writing chunk, saving progress, completing
+    upload, etc.). Calls, which took longer than ``slow_threshold`` seconds, or which
+    blocked event loop in one phase longer than ``lag_threshold`` seconds, are logged
+    or passed to ``on_slow_operation`` callback. ``max_slowest`` slowest operations
+    are kept in :attr:`slowest`.
+
+    :param interval: Interval in seconds in between event loop lag probes.
+    :param lag_threshold: Min event loop lag in seconds to report.
+    :param slow_threshold: Min duration of view call in seconds to report.
+    :param sample_rate: Fraction of view calls to time phase by phase.
+    :param max_slowest: Number of slowest operations to keep.
+    :param on_slow_operation:
+        Callable, which receives :class:`SlowOperation`. By default slow operations
+        are logged as warnings.
+    """
+
+    interval: float = 0.1
+    lag_threshold: float = 0.05
+    slow_threshold: float = 1.0
+    sample_rate: float = 0.01
+    max_slowest: int = 16
+    on_slow_operation: Optional[SlowOperationCallback] = None
+
+    stats: MonitorStats = attr.Factory(MonitorStats)
+    slowest: List[Tuple[float, int, SlowOperation]] = attr.Factory(list)
+    counter: Iterator[int] = attr.Factory(count)
+    task: Optional["asyncio.Task[None]"] = None
+
+    def get_slowest(self) -> List[SlowOperation]:
+        """Return slowest operations, starting from the slowest one."""
+        return [item[-1] for item in sorted(self.slowest, reverse=True)]
+
+    async def on_cleanup(self, app: web.Application) -> None:
+        if self.task is None:
+            return
+        self.task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self.task
+        self.task = None
+
+    async def on_startup(self, app: web.Application) -> None:
+        # Monitor might be shared in between multiple tus upload URLs
+        if self.task is None:
+            self.task = asyncio.create_task(self.probe())
+
+    async def probe(self) -> None:
+        """Measure event loop lag until cancelled."""
+        loop = asyncio.get_running_loop()
+        while True:
+            started_at = loop.time()
+            await asyncio.sleep(self.interval)
+            lag = max(loop.time() - started_at - self.interval, 0.0)
+
+            self.stats.lag_samples += 1
+            self.stats.lag_total += lag
+            self.stats.lag_max = max(self.stats.lag_max, lag)
+            if lag >= self.lag_threshold:
+                logger.warning("Event loop lag", extra={"lag": lag})
+
+    def record(self, operation: SlowOperation) -> None:
+        self.stats.slow += 1
+
+        item = (operation.duration, next(self.counter), operation)
+        if len(self.slowest) < self.max_slowest:
+            heapq.heappush(self.slowest, item)
+        else:
+            heapq.heappushpop(self.slowest, item)
+
+        if self.on_slow_operation is not None:
+            self.on_slow_operation(operation)
+        else:
+            logger.warning("Slow tus operation", extra=attr.asdict(operation))
+
+    def wrap(self, view: str, handler: Handler) -> Handler:
+        """Time each call of given tus view."""
+
+        @wraps(handler)
+        async def timed(request: web.Request) -> web.StreamResponse:
+            timing = (
+                RequestTiming(view=view)
+                if random.random() < self.sample_rate
+                else None
+            )
+            token = current_timing.set(timing)
+            headers = None
+            started_at = time.monotonic()
+            try:
+                response = await handler(request)
+                headers = response.headers
+                return response
+            except web.HTTPException as exc:
+                headers = exc.headers
+                raise
+            finally:
+                duration = time.monotonic() - started_at
+                current_timing.reset(token)
+                self.stats.requests += 1
+
+                slowest_phase, phase_duration = (None, 0.0)
+                if timing is not None:
+                    self.stats.sampled += 1
+                    slowest_phase, phase_duration = timing.get_slowest_phase()
+
+                if (
+                    duration >= self.slow_threshold
+                    or phase_duration >= self.lag_threshold
+                ):
+                    uid = request.match_info.get("resource_uid")
+                    if uid is None and headers is not None:
+                        uid = headers.get(constants.HEADER_TUS_TEMP_FILENAME)
+                    self.record(
+                        SlowOperation(
+                            view=view,
+                            uid=uid,
+                            bytes=(
+                                timing.bytes
+                                if timing is not None
+                                else request.content_length or 0
+                            ),
+                            duration=duration,
+                            phase=slowest_phase,
+                            phase_duration=phase_duration,
+                            phases=timing.phases if timing is not None else {},
+                        )
+                    )
+
+        return timed
+
+
+@contextmanager
+def phase(name: str, *, size: int = 0) -> Iterator[None]:
+    """Time synchronous phase of sampled tus view call.
+
+    For calls, which are not sampled, it costs a single context variable lookup.
+    """
+    timing = current_timing.get()
+    if timing is None:
+        yield
+        return
+
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.add(name, time.perf_counter() - started_at, size=size)
@@ -0,0 +1,111 @@
+import base64
+from typing import Any, Iterable
+
+import attr
+
+from .annotations import DictStrAny
+from .constants import PROCESSOR_STAGE_AFTER_WRITE, PROCESSOR_STAGE_BEFORE_WRITE
+
+
+PROCESSOR_STAGES = (PROCESSOR_STAGE_BEFORE_WRITE, PROCESSOR_STAGE_AFTER_WRITE)
+
+
+class ChunkProcessor:
+    """Base class for processors, which receive every chunk of uploaded resource.
+
+    Processor state is stored within resource metadata in between PATCH requests,
+    so it must be JSON serializable. Finalized results of all processors are passed
+    to ``on_upload_done`` callback as ``resource.processors_results`` dict.
+
+    :param name: Unique processor name, used as a key for its state & result.
+    :param stage:
+        Whether processor should receive the chunk ``"before_write"`` or
+        ``"after_write"`` it has been written to the disk. Processors on
+        ``"before_write"`` stage may raise :class:`aiohttp.web.HTTPException` to
+        reject the chunk. By default: ``"after_write"``
+    """
+
+    name: str = ""
+    stage: str = PROCESSOR_STAGE_AFTER_WRITE
+
+    def initial_state(self) -> Any:
+        return None
+
+    def process(self, state: Any, chunk: bytes, *, offset: int) -> Any:
+        return state
+
+    def finalize(self, state: Any) -> Any:
+        return state
+
+
+@attr.dataclass(frozen=True, slots=True)
+class HeadProcessor(ChunkProcessor):
+    """Keep first ``size`` bytes of the resource for file magic sniffing.
+
+    Result is ``bytes`` instance with resource head.
+    """
+
+    size: int = 262
+
+    name: str = "head"
+    stage: str = PROCESSOR_STAGE_AFTER_WRITE
+
+    def initial_state(self) -> str:
+        return ""
+
+    def process(self, state: str, chunk: bytes, *, offset: int) -> str:
+        if offset >= self.size:
+            return state
+        head = base64.b64decode(state) + chunk[: self.size - offset]
+        return base64.b64encode(head).decode("utf-8")
+
+    def finalize(self, state: str) -> bytes:
+        return base64.b64decode(state)
+
+
+def feed_processors(
+    processors: Iterable[ChunkProcessor],
+    state: DictStrAny,
+    *,
+    stage: str,
+    chunk: bytes,
+    offset: int,
+) -> DictStrAny:
+    next_state = state
+    for processor in processors:
+        if processor.stage != stage:
+            continue
+        if next_state is state:
+            next_state = state.copy()
+        next_state[processor.name] = processor.process(
+            state[processor.name], chunk, offset=offset
+        )
+    return next_state
+
+
+def finalize_processors(
+    processors: Iterable[ChunkProcessor], state: DictStrAny
+) -> DictStrAny:
+    return {
+        processor.name: processor.finalize(state[processor.name])
+        for processor in processors
+    }
+
+
+def get_initial_processors_state(processors: Iterable[ChunkProcessor]) -> DictStrAny:
+    return {processor.name: processor.initial_state() for processor in processors}
+
+
+def validate_processors(processors: Iterable[ChunkProcessor]) -> None:
+    names = set()
+    for processor in processors:
+        if not processor.name:
+            raise ValueError(f"Chunk processor {processor!r} does not have a name")
+        if processor.name in names:
+            raise ValueError(f"Chunk processor name {processor.name!r} is not unique")
+        if processor.stage not in PROCESSOR_STAGES:
+            raise ValueError(
+                f"Invalid stage {processor.stage!r} of chunk processor "
+                f"{processor.name!r}"
+            )
+        names.add(processor.name)
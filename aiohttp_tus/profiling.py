@@ -0,0 +1,121 @@
+import asyncio
+import cProfile
+import logging
+import marshal
+import pstats
+import random
+import signal
+from functools import wraps
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import attr
+from aiohttp import web
+
+from .annotations import Handler
+
+
+logger = logging.getLogger(__name__)
+
+
+@attr.dataclass(slots=True)
+class ViewProfile:
+    """Aggregated profile of sampled calls of one tus view."""
+
+    calls: int = 0
+    stats: Optional[pstats.Stats] = None
+
+    def add(self, profile: cProfile.Profile) -> None:
+        self.calls += 1
+        if self.stats is None:
+            self.stats = pstats.Stats(profile)
+        else:
+            self.stats.add(profile)
+
+    def to_bytes(self) -> bytes:
+        """Dump aggregated stats in the format of :meth:`pstats.Stats.dump_stats`."""
+        if self.stats is None:
+            return marshal.dumps({})
+        return marshal.dumps(self.stats.stats)  # type: ignore[attr-defined]
+
+
+@attr.dataclass(slots=True)
+class RequestProfiler:
+    """Profile sampled tus view calls with :mod:`cProfile` & aggregate them per view.
+
+    As event loop runs other coroutines, while profiled view awaits, only one view
+    call is profiled at a time & aggregated profile might include code of other
+    coroutines, executed in between. Aggregated profiles are dumped as ``pstats``
+    files, readable by ``snakeviz``, ``gprof2dot`` or ``flameprof``, via admin
+    application (see :func:`aiohttp_tus.admin.create_admin_app`) or on receiving
+    ``dump_signal``.
+
+    :param sample_rate: Fraction of view calls to profile.
+    :param dump_signal: Signal to dump aggregated profiles on, e.g. ``SIGUSR2``.
+    :param dump_path:
+        Directory to dump aggregated profiles into as ``{view}.prof`` files on
+        receiving ``dump_signal``.
+    """
+
+    sample_rate: float = 0.01
+    dump_signal: Optional[signal.Signals] = None
+    dump_path: Optional[Path] = None
+
+    profiles: Dict[str, ViewProfile] = attr.Factory(dict)
+    active: bool = False
+
+    def dump(self, path: Path) -> List[Path]:
+        """Dump aggregated profiles into given directory."""
+        path.mkdir(parents=True, exist_ok=True)
+        dumped = []
+        for view, profile in self.profiles.items():
+            view_path = path / f"{view}.prof"
+            view_path.write_bytes(profile.to_bytes())
+            dumped.append(view_path)
+        return dumped
+
+    async def on_cleanup(self, app: web.Application) -> None:
+        if self.dump_signal is not None and self.dump_path is not None:
+            asyncio.get_running_loop().remove_signal_handler(self.dump_signal)
+
+    async def on_startup(self, app: web.Application) -> None:
+        if self.dump_signal is None or self.dump_path is None:
+            return
+        asyncio.get_running_loop().add_signal_handler(
+            self.dump_signal, self.on_dump_signal
+        )
+
+    def on_dump_signal(self) -> None:
+        assert self.dump_path is not None
+        logger.info(
+            "Dumped request profiles",
+            extra={"paths": [str(item) for item in self.dump(self.dump_path)]},
+        )
+
+    def reset(self) -> None:
+        self.profiles.clear()
+
+    def wrap(self, view: str, handler: Handler) -> Handler:
+        """Profile sampled calls of given tus view."""
+
+        @wraps(handler)
+        async def profiled(request: web.Request) -> web.StreamResponse:
+            if self.active or random.random() >= self.sample_rate:
+                return await handler(request)
+
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            # Other profiler or debugger is active at a moment
+            except ValueError:
+                return await handler(request)
+
+            self.active = True
+            try:
+                return await handler(request)
+            finally:
+                profile.disable()
+                self.active = False
+                self.profiles.setdefault(view, ViewProfile()).add(profile)
+
+        return profiled
@@ -0,0 +1,138 @@
+import os
+from pathlib import Path
+from typing import Callable, ClassVar, Optional, Tuple
+
+import attr
+
+from .annotations import MappingStrStr
+from .index import SQLiteStore
+
+
+USAGE_FILE_NAME = "usage.sqlite3"
+
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS usage (
+        id INTEGER PRIMARY KEY CHECK (id = 0),
+        bytes INTEGER NOT NULL,
+        files INTEGER NOT NULL
+    )
+    """,
+    "INSERT OR IGNORE INTO usage (id, bytes, files) VALUES (0, 0, 0)",
+)
+
+
+@attr.dataclass(frozen=True, slots=True)
+class Quota:
+    """Max storage usage of one upload path.
+
+    :param max_bytes: Max number of bytes of uploaded & in-progress files.
+    :param max_files: Max number of uploaded & in-progress files.
+    """
+
+    max_bytes: Optional[int] = None
+    max_files: Optional[int] = None
+
+
+@attr.dataclass(frozen=True, slots=True)
+class Usage:
+    bytes: int = 0
+    files: int = 0
+
+
+QuotaGetter = Callable[[MappingStrStr], Quota]
+
+
+@attr.dataclass(slots=True)
+class UsageLedger(SQLiteStore):
+    """Incremental storage usage ledger to enforce per-tenant quotas.
+
+    Usage of each (templated) upload path is stored as single row SQLite database in
+    metadata path. Ledger is updated on starting, completing & deleting uploads, so
+    checking quota on starting upload does not require to walk upload path. To
+    reconcile ledger with the files on the disk, use
+    :class:`aiohttp_tus.recovery.RecoveryScan`.
+
+    :param quota: Quota for all upload paths.
+    :param quotas:
+        Callable, which receives ``match_info`` of upload URL and returns quota for
+        given tenant, e.g. by username. Overrides ``quota``, when provided.
+    """
+
+    file_name: ClassVar[str] = USAGE_FILE_NAME
+    schema: ClassVar[Tuple[str, ...]] = SCHEMA
+
+    quota: Quota = Quota()
+    quotas: Optional[QuotaGetter] = None
+
+    def adjust(self, metadata_path: Path, *, size: int, files: int) -> None:
+        with self.transaction(metadata_path) as connection:
+            connection.execute(
+                "UPDATE usage SET bytes = MAX(bytes + ?, 0), "
+                "files = MAX(files + ?, 0) WHERE id = 0",
+                (size, files),
+            )
+
+    def get_usage(self, metadata_path: Path) -> Usage:
+        with self.transaction(metadata_path) as connection:
+            row = connection.execute(
+                "SELECT bytes, files FROM usage WHERE id = 0"
+            ).fetchone()
+        return Usage(bytes=row[0], files=row[1])
+
+    def reserve(
+        self, metadata_path: Path, *, size: int, quota: Quota, files: int = 1
+    ) -> bool:
+        """Atomically add files of given size to usage, unless quota is exceeded."""
+        with self.transaction(metadata_path) as connection:
+            cursor = connection.execute(
+                "UPDATE usage SET bytes = bytes + ?, files = files + ? "
+                "WHERE id = 0 AND (? IS NULL OR bytes + ? <= ?) "
+                "AND (? IS NULL OR files + ? <= ?)",
+                (
+                    size,
+                    files,
+                    quota.max_bytes,
+                    size,
+                    quota.max_bytes,
+                    quota.max_files,
+                    files,
+                    quota.max_files,
+                ),
+            )
+            return cursor.rowcount == 1
+
+    def resolve_quota(self, match_info: MappingStrStr) -> Quota:
+        if self.quotas is not None:
+            return self.quotas(match_info)
+        return self.quota
+
+    def set_usage(self, metadata_path: Path, usage: Usage) -> None:
+        with self.transaction(metadata_path) as connection:
+            connection.execute(
+                "UPDATE usage SET bytes = ?, files = ? WHERE id = 0",
+                (usage.bytes, usage.files),
+            )
+
+
+def compute_usage(upload_path: Path) -> Usage:
+    """Walk upload path to compute actual storage usage.
+
+    Uploaded files as well as files of in-progress uploads are counted, as in-progress
+    upload file is allocated with full size on starting the upload.
+    """
+    total_bytes, total_files = 0, 0
+    for path in (upload_path, upload_path / ".resources"):
+        try:
+            entries = os.scandir(path)
+        except FileNotFoundError:
+            continue
+        with entries:
+            for entry in entries:
+                if entry.name.startswith(".") or not entry.is_file(
+                    follow_symlinks=False
+                ):
+                    continue
+                total_bytes += entry.stat(follow_symlinks=False).st_size
+                total_files += 1
+    return Usage(bytes=total_bytes, files=total_files)
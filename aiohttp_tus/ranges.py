@@ -0,0 +1,129 @@
+from bisect import bisect_left, bisect_right
+from typing import Iterator, List, Tuple
+
+import attr
+
+
+ByteRange = Tuple[int, int]
+
+
+@attr.dataclass(slots=True)
+class RangeSet:
+    """Set of disjoint ``[start, end)`` byte ranges.
+
+    Ranges are kept as two sorted lists of starts & ends, so adding or looking up
+    the range takes ``O(log n)`` comparisons, while adjacent & overlapping ranges are
+    merged on adding. This keeps the set small even for uploads with thousands of
+    chunks, uploaded out of order.
+    """
+
+    starts: List[int] = attr.Factory(list)
+    ends: List[int] = attr.Factory(list)
+
+    def __bool__(self) -> bool:
+        return bool(self.starts)
+
+    def __iter__(self) -> Iterator[ByteRange]:
+        return zip(self.starts, self.ends)
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def add(self, start: int, end: int) -> None:
+        """Add ``[start, end)`` range, merging it with overlapping & adjacent ones."""
+        if start >= end:
+            return
+
+        # Ranges in between ``left`` & ``right`` overlap or touch added range
+        left = bisect_left(self.ends, start)
+        right = bisect_right(self.starts, end)
+        if left < right:
+            start = min(start, self.starts[left])
+            end = max(end, self.ends[right - 1])
+
+        self.starts[left:right] = [start]
+        self.ends[left:right] = [end]
+
+    def copy(self) -> "RangeSet":
+        return RangeSet(starts=self.starts.copy(), ends=self.ends.copy())
+
+    def covers(self, start: int, end: int) -> bool:
+        """Check whether ``[start, end)`` range is fully present."""
+        idx = bisect_right(self.starts, start) - 1
+        return idx >= 0 and self.ends[idx] >= end
+
+    def get_prefix(self, offset: int = 0) -> int:
+        """Return end of contiguous data, starting at given offset."""
+        idx = bisect_right(self.starts, offset) - 1
+        if idx >= 0 and self.ends[idx] > offset:
+            return self.ends[idx]
+        return offset
+
+    def iter_holes(self, start: int, end: int) -> Iterator[ByteRange]:
+        """Iterate over missing ranges in between ``start`` and ``end``."""
+        offset = start
+        for idx in range(bisect_right(self.ends, start), len(self.starts)):
+            if self.starts[idx] >= end:
+                break
+            if self.starts[idx] > offset:
+                yield (offset, self.starts[idx])
+            offset = self.ends[idx]
+        if offset < end:
+            yield (offset, end)
+
+    def overlaps(self, start: int, end: int) -> bool:
+        """Check whether ``[start, end)`` range overlaps any of present ranges."""
+        idx = bisect_left(self.ends, start + 1)
+        return idx < len(self.starts) and self.starts[idx] < end
+
+    def remove_prefix(self, offset: int) -> None:
+        """Remove all ranges, which end at or before given offset."""
+        idx = bisect_right(self.ends, offset)
+        del self.starts[:idx]
+        del self.ends[:idx]
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "RangeSet":
+        ranges = cls()
+        values = iter(decode_varints(data))
+        offset = 0
+        for gap, length in zip(values, values):
+            offset += gap
+            ranges.starts.append(offset)
+            offset += length
+            ranges.ends.append(offset)
+        return ranges
+
+    def to_bytes(self) -> bytes:
+        """Serialize ranges as varint encoded gaps & lengths.
+
+        Usually it results in few bytes per range, as gaps & lengths are much smaller,
+        than absolute offsets.
+        """
+        values: List[int] = []
+        offset = 0
+        for start, end in self:
+            values.extend((start - offset, end - start))
+            offset = end
+        return encode_varints(values)
+
+
+def decode_varints(data: bytes) -> Iterator[int]:
+    value, shift = 0, 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+            continue
+        yield value
+        value, shift = 0, 0
+
+
+def encode_varints(values: List[int]) -> bytes:
+    data = bytearray()
+    for value in values:
+        while value > 0x7F:
+            data.append((value & 0x7F) | 0x80)
+            value >>= 7
+        data.append(value)
+    return bytes(data)
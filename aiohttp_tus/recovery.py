@@ -0,0 +1,508 @@
+import asyncio
+import glob
+import logging
+import os
+import re
+import string
+import time
+from contextlib import suppress
+from itertools import islice
+from pathlib import Path
+from typing import Iterator, List, Optional, Tuple
+
+import attr
+from aiohttp import web
+
+from .annotations import DictStrStr
+from .data import (
+    Config,
+    delete_metadata_paths,
+    delete_path,
+    get_resource_key,
+    get_resource_lock_path,
+    get_resource_metadata_path,
+    get_resource_offset_path,
+    get_resource_path,
+    get_resource_ranges_path,
+    get_resource_state_path,
+    Resource,
+    write_offset,
+)
+from .index import INDEX_FILE_NAME, UploadIndex
+from .locks import lock_path, ResourceLocked
+from .quotas import compute_usage, USAGE_FILE_NAME
+
+
+DATABASE_FILE_NAMES = (INDEX_FILE_NAME, USAGE_FILE_NAME)
+METADATA_SUFFIX = ".json"
+AUX_SUFFIXES = (".state.json", ".offset", ".ranges", ".lock")
+
+STATUS_OK = "ok"
+STATUS_REAPED = "reaped"
+STATUS_REPAIRED = "repaired"
+STATUS_SKIPPED = "skipped"
+
+# Recovered resource with UNIX timestamp of its creation
+Recovered = Tuple[str, str, Optional[Resource], float]
+
+logger = logging.getLogger(__name__)
+
+
+@attr.dataclass(slots=True)
+class RecoveryStats:
+    """Progress of recovery scan."""
+
+    upload_paths: int = 0
+    scanned: int = 0
+    repaired: int = 0
+    reaped: int = 0
+    skipped: int = 0
+    warmed: int = 0
+    done: bool = False
+
+
+@attr.dataclass(slots=True)
+class RecoveryScan:
+    """Reconcile resources & their metadata after crash or deploy.
+
+    Scan starts on application startup and runs in background, so it does not delay
+    serving requests. Upload paths are walked in batches in thread pool executor and,
+
+    - metadata of resources, which files are missing, is reaped
+    - resource files without metadata are reaped
+    - offset, which is beyond data written to the disk, is repaired
+    - resource cache & upload index, if enabled, are warmed with recovered resources
+    - usage ledger, if enabled, is reconciled with the files on the disk
+    - download links of completed uploads, which files are deleted or which are
+      older than ``completed_age``, are reaped
+
+    Entries modified less than ``orphan_age`` seconds ago, as well as resources
+    locked by in-flight requests, are skipped as they might belong to uploads, which
+    are starting at a moment. Progress is available as :attr:`stats`.
+
+    :param batch_size: Number of directory entries to process in one batch.
+    :param orphan_age: Min age in seconds of inconsistent entry to reap or repair it.
+    :param completed_age:
+        Min age in seconds of download link of completed upload to reap it.
+    """
+
+    batch_size: int = 100
+    orphan_age: float = 3600.0
+    completed_age: float = 604800.0
+
+    stats: RecoveryStats = attr.Factory(RecoveryStats)
+    task: Optional["asyncio.Task[None]"] = None
+
+    async def on_cleanup(self, app: web.Application) -> None:
+        if self.task is None:
+            return
+        self.task.cancel()
+        with suppress(asyncio.CancelledError):
+            await self.task
+        self.task = None
+
+    async def on_startup(self, app: web.Application, *, config: Config) -> None:
+        self.task = asyncio.create_task(self.run(config))
+
+    async def run(self, config: Config) -> None:
+        """Scan all upload paths of given config."""
+        self.stats = RecoveryStats()
+        loop = asyncio.get_running_loop()
+
+        for match_info in await loop.run_in_executor(
+            None, lambda: list(iter_match_infos(config))
+        ):
+            self.stats.upload_paths += 1
+            await self.scan(config, match_info)
+
+        self.stats.done = True
+        logger.info("Recovery scan done", extra={"stats": attr.asdict(self.stats)})
+
+    async def scan(self, config: Config, match_info: DictStrStr) -> None:
+        """Scan metadata & resources directories of one upload path."""
+        loop = asyncio.get_running_loop()
+        metadata_path = config.resolve_metadata_path(match_info)
+        resources_path = config.resolve_resources_path(match_info)
+
+        with os.scandir(metadata_path) as entries:
+            while True:
+                names = await loop.run_in_executor(
+                    None, next_batch, entries, self.batch_size
+                )
+                if not names:
+                    break
+
+                recovered = await loop.run_in_executor(
+                    None,
+                    recover_metadata_batch,
+                    config,
+                    match_info,
+                    names,
+                    self.orphan_age,
+                )
+                self.update(config, match_info, recovered)
+
+        with os.scandir(resources_path) as entries:
+            while True:
+                names = await loop.run_in_executor(
+                    None, next_batch, entries, self.batch_size
+                )
+                if not names:
+                    break
+
+                recovered = await loop.run_in_executor(
+                    None,
+                    recover_resources_batch,
+                    config,
+                    match_info,
+                    names,
+                    self.orphan_age,
+                )
+                self.update(config, match_info, recovered)
+
+        await self.scan_completed(config, match_info)
+
+        if config.upload_index is not None:
+            await self.scan_index(config, match_info)
+
+        # Reconcile usage ledger with the files on the disk. Requests, served while
+        # walking upload path, keep updating the ledger, so it is adjusted by the
+        # difference instead of being overwritten
+        ledger = config.usage_ledger
+        if ledger is not None:
+            recorded = await ledger.run(ledger.get_usage, metadata_path)
+            usage = await loop.run_in_executor(
+                None, compute_usage, config.resolve_upload_path(match_info)
+            )
+            ledger.submit(
+                ledger.adjust,
+                metadata_path,
+                size=usage.bytes - recorded.bytes,
+                files=usage.files - recorded.files,
+            )
+
+    async def scan_completed(self, config: Config, match_info: DictStrStr) -> None:
+        """Reap download links of completed uploads."""
+        loop = asyncio.get_running_loop()
+        try:
+            entries = os.scandir(get_completed_path(config, match_info))
+        except FileNotFoundError:
+            return
+
+        with entries:
+            while True:
+                names = await loop.run_in_executor(
+                    None, next_batch, entries, self.batch_size
+                )
+                if not names:
+                    break
+                self.stats.reaped += await loop.run_in_executor(
+                    None,
+                    reap_completed_batch,
+                    config,
+                    match_info,
+                    names,
+                    self.completed_age,
+                )
+
+    async def scan_index(self, config: Config, match_info: DictStrStr) -> None:
+        """Remove index entries, which metadata is missing."""
+        assert config.upload_index is not None
+
+        loop = asyncio.get_running_loop()
+        metadata_path = config.resolve_metadata_path(match_info)
+        after: Optional[Tuple[float, str]] = None
+
+        index = config.upload_index
+        while True:
+            uploads = await index.run(
+                index.list_uploads, metadata_path, limit=self.batch_size, after=after
+            )
+            if not uploads:
+                break
+            after = (uploads[-1].created_at, uploads[-1].uid)
+
+            missing = await loop.run_in_executor(
+                None,
+                lambda: tuple(
+                    item.uid
+                    for item in uploads
+                    if not (metadata_path / f"{item.uid}{METADATA_SUFFIX}").exists()
+                ),
+            )
+            index.submit(index.remove_uploads, metadata_path, missing)
+            self.stats.reaped += len(missing)
+
+    def update(
+        self, config: Config, match_info: DictStrStr, recovered: List[Recovered]
+    ) -> None:
+        """Update stats, resource cache & upload index. Called in event loop."""
+        metadata_path = config.resolve_metadata_path(match_info)
+
+        for uid, status, resource, created_at in recovered:
+            self.stats.scanned += 1
+            if status == STATUS_REAPED:
+                self.stats.reaped += 1
+            elif status == STATUS_REPAIRED:
+                self.stats.repaired += 1
+            elif status == STATUS_SKIPPED:
+                self.stats.skipped += 1
+
+            key = get_resource_key(config=config, match_info=match_info, uid=uid)
+            if resource is None:
+                if config.resource_cache is not None:
+                    config.resource_cache.delete(key)
+                if config.content_store is not None and status == STATUS_REAPED:
+                    config.content_store.discard(key)
+                if config.upload_index is not None and status == STATUS_REAPED:
+                    config.upload_index.submit(
+                        config.upload_index.remove_upload, metadata_path, uid
+                    )
+                continue
+
+            # Do not override resource, cached by request, served while scanning
+            cache = config.resource_cache
+            if cache is not None and key not in cache.items:
+                cache.set(key, resource)
+            if config.upload_index is not None:
+                config.upload_index.submit(
+                    warm_index,
+                    config.upload_index,
+                    metadata_path,
+                    uid=uid,
+                    file_name=resource.file_name,
+                    file_size=resource.file_size,
+                    created_at=created_at,
+                    fingerprint=resource.fingerprint,
+                )
+            self.stats.warmed += 1
+
+        logger.debug("Recovery scan progress", extra={"stats": attr.asdict(self.stats)})
+
+
+def get_completed_path(config: Config, match_info: DictStrStr) -> Path:
+    # Unlike ``Config.resolve_completed_path`` does not create missing directory
+    return config.resolve_upload_path(match_info) / ".completed"
+
+
+def get_data_end(path: Path) -> int:
+    """Return end of contiguous data, written from the start of the file.
+
+    Resource file is allocated sparse, so its size does not tell how many bytes
+    have reached the disk: bytes, which have never been written, are holes. On file
+    systems without ``SEEK_HOLE`` support whole file is treated as data.
+    """
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        if hasattr(os, "SEEK_HOLE"):
+            with suppress(OSError):
+                return os.lseek(fd, 0, os.SEEK_HOLE)
+        return os.fstat(fd).st_size
+    finally:
+        os.close(fd)
+
+
+def is_orphan(path: Path, *, orphan_age: float) -> bool:
+    try:
+        return time.time() - path.stat().st_mtime >= orphan_age
+    except FileNotFoundError:
+        return False
+
+
+def iter_match_infos(config: Config) -> Iterator[DictStrStr]:
+    """Find all existing upload paths for templated upload path."""
+    template = str(config.upload_path.absolute())
+    parsed = list(string.Formatter().parse(template))
+    if not any(field for _, field, _, _ in parsed):
+        yield {}
+        return
+
+    pattern, regex = "", ""
+    for literal, field, _, _ in parsed:
+        pattern += glob.escape(literal)
+        regex += re.escape(literal)
+        if field:
+            pattern += "*"
+            regex += rf"(?P<{field}>[^/]+)"
+
+    compiled = re.compile(regex)
+    for path in glob.iglob(pattern):
+        matched = compiled.fullmatch(path)
+        if matched is not None and os.path.isdir(path):
+            yield matched.groupdict()
+
+
+def next_batch(entries: Iterator["os.DirEntry[str]"], size: int) -> List[str]:
+    return [entry.name for entry in islice(entries, size)]
+
+
+def recover_metadata_batch(
+    config: Config, match_info: DictStrStr, names: List[str], orphan_age: float
+) -> List[Recovered]:
+    """Recover resources by metadata file names. Called in thread pool executor."""
+    recovered: List[Recovered] = []
+    for name in names:
+        if name.startswith(DATABASE_FILE_NAMES):
+            continue
+
+        aux_suffix = next((item for item in AUX_SUFFIXES if name.endswith(item)), None)
+        if aux_suffix is not None:
+            uid = name[: -len(aux_suffix)]
+            if not get_resource_metadata_path(
+                config=config, match_info=match_info, uid=uid
+            ).exists():
+                item = reap_aux_paths(config, match_info, uid, orphan_age)
+                if item is not None:
+                    recovered.append(item)
+        elif name.endswith(METADATA_SUFFIX):
+            uid = name[: -len(METADATA_SUFFIX)]
+            recovered.append(recover_resource(config, match_info, uid, orphan_age))
+    return recovered
+
+
+def recover_resource(
+    config: Config, match_info: DictStrStr, uid: str, orphan_age: float
+) -> Recovered:
+    metadata_path = get_resource_metadata_path(
+        config=config, match_info=match_info, uid=uid
+    )
+    resource_path = get_resource_path(config=config, match_info=match_info, uid=uid)
+    try:
+        with lock_path(
+            get_resource_lock_path(config=config, match_info=match_info, uid=uid)
+        ):
+            try:
+                created_at = metadata_path.stat().st_mtime
+                resource = Resource.from_metadata(
+                    config=config, match_info={**match_info, "resource_uid": uid}
+                )
+                data_end = get_data_end(resource_path)
+            except (FileNotFoundError, KeyError, TypeError, ValueError):
+                if not is_orphan(metadata_path, orphan_age=orphan_age):
+                    return (uid, STATUS_SKIPPED, None, 0)
+                delete_path(resource_path)
+                delete_metadata_paths(config=config, match_info=match_info, uid=uid)
+                return (uid, STATUS_REAPED, None, 0)
+
+            offset_path = get_resource_offset_path(
+                config=config, match_info=match_info, uid=uid
+            )
+            offset = min(resource.offset, data_end)
+            if offset == resource.offset and offset_path.exists():
+                return (uid, STATUS_OK, resource, created_at)
+
+            if not is_orphan(metadata_path, orphan_age=orphan_age):
+                return (uid, STATUS_SKIPPED, None, 0)
+            write_offset(offset_path, offset)
+            return (
+                uid,
+                STATUS_REPAIRED,
+                attr.evolve(resource, offset=offset),
+                created_at,
+            )
+    except ResourceLocked:
+        return (uid, STATUS_SKIPPED, None, 0)
+
+
+def recover_resources_batch(
+    config: Config, match_info: DictStrStr, names: List[str], orphan_age: float
+) -> List[Recovered]:
+    """Reap resource files without metadata. Called in thread pool executor."""
+    recovered: List[Recovered] = []
+    for uid in names:
+        if get_resource_metadata_path(
+            config=config, match_info=match_info, uid=uid
+        ).exists():
+            continue
+
+        resource_path = get_resource_path(config=config, match_info=match_info, uid=uid)
+        if not is_orphan(resource_path, orphan_age=orphan_age):
+            recovered.append((uid, STATUS_SKIPPED, None, 0))
+            continue
+
+        try:
+            with lock_path(
+                get_resource_lock_path(config=config, match_info=match_info, uid=uid)
+            ):
+                delete_path(resource_path)
+                delete_metadata_paths(config=config, match_info=match_info, uid=uid)
+        except ResourceLocked:
+            recovered.append((uid, STATUS_SKIPPED, None, 0))
+        else:
+            recovered.append((uid, STATUS_REAPED, None, 0))
+    return recovered
+
+
+def reap_completed_batch(
+    config: Config, match_info: DictStrStr, names: List[str], completed_age: float
+) -> int:
+    """Reap links to deleted files & old links. Called in thread pool executor."""
+    completed_path = get_completed_path(config, match_info)
+    reaped = 0
+    for name in names:
+        path = completed_path / name
+        try:
+            if (
+                path.exists()
+                and time.time() - path.lstat().st_mtime < completed_age
+            ):
+                continue
+            path.unlink()
+        except FileNotFoundError:
+            continue
+        reaped += 1
+    return reaped
+
+
+def reap_aux_paths(
+    config: Config, match_info: DictStrStr, uid: str, orphan_age: float
+) -> Optional[Recovered]:
+    """Reap offset, ranges, state & lock files, left without resource metadata."""
+    lock_file_path = get_resource_lock_path(
+        config=config, match_info=match_info, uid=uid
+    )
+    paths = [
+        path
+        for path in (
+            get_resource_offset_path(config=config, match_info=match_info, uid=uid),
+            get_resource_ranges_path(config=config, match_info=match_info, uid=uid),
+            get_resource_state_path(config=config, match_info=match_info, uid=uid),
+            lock_file_path,
+        )
+        if path.exists()
+    ]
+    # All files already reaped on processing other file of the same resource
+    if not paths:
+        return None
+    if not all(is_orphan(path, orphan_age=orphan_age) for path in paths):
+        return (uid, STATUS_SKIPPED, None, 0)
+
+    try:
+        with lock_path(lock_file_path):
+            # Resource file, left without metadata, is reaped on scanning resources
+            delete_metadata_paths(config=config, match_info=match_info, uid=uid)
+    except ResourceLocked:
+        return (uid, STATUS_SKIPPED, None, 0)
+    return (uid, STATUS_REAPED, None, 0)
+
+
+def warm_index(
+    index: UploadIndex,
+    metadata_path: Path,
+    *,
+    uid: str,
+    file_name: str,
+    file_size: Optional[int],
+    created_at: float,
+    fingerprint: Optional[str],
+) -> None:
+    """Add recovered upload to the index, unless it has been indexed already."""
+    if index.get_upload(metadata_path, uid) is None:
+        index.add_upload(
+            metadata_path,
+            uid=uid,
+            file_name=file_name,
+            file_size=file_size,
+            created_at=created_at,
+            fingerprint=fingerprint,
+        )
@@ -0,0 +1,124 @@
+import asyncio
+import heapq
+from concurrent.futures import Executor
+from contextlib import asynccontextmanager
+from itertools import count
+from typing import (
+    AsyncIterator,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+import attr
+
+from .annotations import MappingStrBytes
+
+
+T = TypeVar("T")
+
+PRIORITY_BULK = "bulk"
+PRIORITY_INTERACTIVE = "interactive"
+PRIORITY_NORMAL = "normal"
+
+DEFAULT_WEIGHTS = {PRIORITY_INTERACTIVE: 16, PRIORITY_NORMAL: 4, PRIORITY_BULK: 1}
+
+# Optional metadata key to choose priority class of the upload
+PRIORITY_KEY = "priority"
+
+
+@attr.dataclass(slots=True)
+class IOScheduler:
+    """Weighted fair scheduler of disk I/O in between upload priority classes.
+
+    Writes, which hit the disk, ``fdatasync`` calls & completion moves of all
+    uploads are queued per priority class and at most ``concurrency`` of them run
+    at once. Queued operations are dispatched by start-time fair queueing: each
+    class advances its virtual clock by ``cost / weight`` of its operations, so
+    class with weight ``16`` gets 16 times more bytes through than class with weight
+    ``1`` under contention, while operation of idle class is dispatched next
+    regardless of how many operations other classes have queued. Writes & syncs
+    run in thread pool executor, so event loop is not blocked by saturated device.
+
+    :param weights:
+        Mapping of priority class to its weight. By default: ``interactive``,
+        ``normal`` & ``bulk`` classes with ``16``, ``4`` & ``1`` weights.
+    :param concurrency: Max number of I/O operations to run at once.
+    :param executor: Executor to run I/O operations in. By default: loop default.
+    """
+
+    weights: Dict[str, int] = attr.Factory(lambda: dict(DEFAULT_WEIGHTS))
+    concurrency: int = 2
+    executor: Optional[Executor] = None
+
+    active: int = 0
+    virtual_time: float = 0.0
+    finish_times: Dict[str, float] = attr.Factory(dict)
+    queue: List[Tuple[float, int, "asyncio.Future[None]"]] = attr.Factory(list)
+    counter: Iterator[int] = attr.Factory(count)
+
+    async def acquire(self, priority: str, *, cost: int = 1) -> None:
+        """Wait for the turn of I/O operation of given priority class & cost."""
+        start = max(self.virtual_time, self.finish_times.get(priority, 0.0))
+        self.finish_times[priority] = start + max(cost, 1) / self.weights[priority]
+
+        if self.active < self.concurrency and not self.queue:
+            self.active += 1
+            self.virtual_time = start
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self.queue, (start, next(self.counter), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            # Turn has been granted right before cancelling, so pass it along
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def get_priority(self, metadata: MappingStrBytes, default: str) -> str:
+        """Return priority class requested via upload metadata or default one."""
+        value = metadata.get(PRIORITY_KEY)
+        if value is not None:
+            priority = value.decode("utf-8", errors="replace")
+            if priority in self.weights:
+                return priority
+        return default
+
+    def release(self) -> None:
+        self.active -= 1
+        while self.queue and self.active < self.concurrency:
+            start, _, future = heapq.heappop(self.queue)
+            # Waiter has been cancelled while queued
+            if future.done():
+                continue
+            self.active += 1
+            self.virtual_time = start
+            future.set_result(None)
+
+    async def run(
+        self, priority: str, func: Callable[[], T], *, cost: int = 1
+    ) -> T:
+        """Run blocking I/O operation in executor, once its turn comes."""
+        async with self.slot(priority, cost=cost):
+            future = asyncio.get_running_loop().run_in_executor(self.executor, func)
+            try:
+                return await asyncio.shield(future)
+            except asyncio.CancelledError:
+                # Do not let caller close the file, while operation still uses it
+                await asyncio.wait((future,))
+                raise
+
+    @asynccontextmanager
+    async def slot(self, priority: str, *, cost: int = 1) -> AsyncIterator[None]:
+        """Hold the turn for I/O operation, which runs on event loop thread."""
+        await self.acquire(priority, cost=cost)
+        try:
+            yield
+        finally:
+            self.release()
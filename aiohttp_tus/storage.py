@@ -0,0 +1,222 @@
+import hashlib
+import os
+import shutil
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Iterator, Optional, Tuple
+
+import attr
+
+from .annotations import ResourceKey
+
+
+# Number of bytes hasher object from :mod:`hashlib` module has been fed with, hasher
+# itself & monotonic time, when it expires
+HasherItem = Tuple[int, Any, float]
+
+HEX_DIGITS = frozenset("0123456789abcdef")
+OBJECTS_DIR = ".objects"
+READ_CHUNK_SIZE = 1048576
+
+
+@attr.dataclass(slots=True)
+class ContentStore:
+    """Content-addressed storage for completed uploads.
+
+    Completed upload stored once under its digest into ``upload_path / ".objects"``
+    directory and hard linked to the user facing file path. As hard links share
+    same inode, link count of stored object serves as its reference index: object
+    which has no links besides itself is not used by any file and safe to delete.
+
+    Compressed uploads are stored as separate objects, keyed by digest of their
+    uncompressed content & codec suffix (e.g. ``{digest}.gz``), so object of given
+    digest always has size of uncompressed content.
+
+    Resource digest is computed incrementally, while chunks arrive to the current
+    process. If resource chunks have been uploaded to other process (or process has
+    been restarted in between), resource file is hashed on completion. Same applies
+    to resources, which have not received any chunk for ``hasher_ttl`` seconds:
+    their hashers are discarded, so abandoned uploads do not hold memory forever.
+
+    :param algorithm: Name of :mod:`hashlib` algorithm. By default: ``"sha256"``
+    :param trust_declared_digest:
+        When enabled, client may declare digest of the file via ``Upload-Metadata``
+        header (metadata key equals to algorithm name, value is hex digest). If
+        object with such digest and size is already stored, upload is finalized
+        on creation without uploading any bytes.
+
+        **Important:** Enable only if every client is allowed to access every
+        stored file, as knowing file digest is enough to get its copy.
+        By default: ``False``
+    :param hasher_ttl:
+        Time in seconds to keep hasher of resource, which does not receive chunks.
+    """
+
+    algorithm: str = "sha256"
+    trust_declared_digest: bool = False
+    hasher_ttl: float = 3600.0
+
+    hashers: "OrderedDict[ResourceKey, HasherItem]" = attr.Factory(OrderedDict)
+
+    def compute_digest(self, path: Path) -> str:
+        hasher = hashlib.new(self.algorithm)
+        with open(path, "rb") as handler:
+            for chunk in iter(lambda: handler.read(READ_CHUNK_SIZE), b""):
+                hasher.update(chunk)
+        return hasher.hexdigest()
+
+    def discard(self, key: ResourceKey) -> None:
+        self.hashers.pop(key, None)
+
+    def expire(self) -> int:
+        """Discard hashers of resources, which have not received chunks in time."""
+        now = time.monotonic()
+        counter = 0
+        # Hashers are ordered by their expiration time, as updated one is moved to
+        # the end
+        while self.hashers:
+            key, (_, _, expires_at) = next(iter(self.hashers.items()))
+            if expires_at >= now:
+                break
+            del self.hashers[key]
+            counter += 1
+        return counter
+
+    def get_digest(self, key: ResourceKey, *, size: int) -> Optional[str]:
+        """Return resource digest if all its bytes have been hashed incrementally."""
+        item = self.hashers.pop(key, None)
+        if item is None:
+            return None
+        offset, hasher, _ = item
+        if offset != size:
+            return None
+        digest: str = hasher.hexdigest()
+        return digest
+
+    def get_object_path(
+        self, upload_path: Path, digest: str, *, suffix: str = ""
+    ) -> Path:
+        return upload_path / OBJECTS_DIR / digest[:2] / f"{digest}{suffix}"
+
+    def is_valid_digest(self, digest: str) -> bool:
+        return len(digest) == hashlib.new(self.algorithm).digest_size * 2 and all(
+            char in HEX_DIGITS for char in digest
+        )
+
+    def iter_objects(self, upload_path: Path) -> Iterator[Path]:
+        yield from (upload_path / OBJECTS_DIR).glob("*/*")
+
+    def collect_garbage(self, upload_path: Path) -> int:
+        """Delete all stored objects, which are not linked to any file."""
+        counter = 0
+        for path in self.iter_objects(upload_path):
+            if path.stat().st_nlink == 1:
+                path.unlink()
+                counter += 1
+        return counter
+
+    def find(
+        self, upload_path: Path, digest: str, *, size: int, suffix: str = ""
+    ) -> Optional[Path]:
+        """Find stored object by digest & size of its uncompressed content.
+
+        Size of compressed object (one with codec ``suffix``) differs from size of
+        its content, so such object is found by the digest only.
+        """
+        if not self.is_valid_digest(digest):
+            return None
+
+        path = self.get_object_path(upload_path, digest, suffix=suffix)
+        try:
+            object_size = path.stat().st_size
+        except FileNotFoundError:
+            return None
+        if suffix or object_size == size:
+            return path
+        return None
+
+    def link(self, object_path: Path, file_path: Path, *, overwrite: bool) -> None:
+        """Link stored object to the file path.
+
+        :raises FileExistsError: if file exists and overwrite is not allowed.
+        """
+        if overwrite and file_path.exists():
+            file_path.unlink()
+        try:
+            os.link(object_path, file_path)
+        except FileExistsError:
+            raise
+        # Hard links are not supported by file system
+        except OSError:
+            with open(file_path, "wb" if overwrite else "xb"):
+                pass
+            shutil.copyfile(object_path, file_path)
+
+    def release(
+        self, upload_path: Path, file_path: Path, digest: str, *, suffix: str = ""
+    ) -> bool:
+        """Delete file and its stored object if it is not linked to other files."""
+        file_path.unlink()
+
+        object_path = self.get_object_path(upload_path, digest, suffix=suffix)
+        try:
+            if object_path.stat().st_nlink == 1:
+                object_path.unlink()
+                return True
+        except FileNotFoundError:
+            pass
+        return False
+
+    def store(
+        self,
+        upload_path: Path,
+        resource_path: Path,
+        file_path: Path,
+        digest: str,
+        *,
+        overwrite: bool,
+        suffix: str = "",
+    ) -> Path:
+        """Store resource as an object (if necessary) & link it to the file path.
+
+        Compressed resource is stored with codec ``suffix``.
+        """
+        object_path = self.get_object_path(upload_path, digest, suffix=suffix)
+        object_path.parent.mkdir(parents=True, exist_ok=True)
+
+        if object_path.exists():
+            resource_path.unlink()
+        else:
+            os.replace(resource_path, object_path)
+
+        try:
+            self.link(object_path, file_path, overwrite=overwrite)
+        except FileExistsError:
+            # Do not keep object, which is not linked to any file
+            if object_path.stat().st_nlink == 1:
+                object_path.unlink()
+            raise
+        return object_path
+
+    def update(self, key: ResourceKey, *, chunk: bytes, offset: int) -> None:
+        self.expire()
+
+        hashed, hasher, _ = self.hashers.get(key, (0, None, 0.0))
+        if hasher is None:
+            if offset != 0:
+                return
+            hasher = hashlib.new(self.algorithm)
+        # Chunk does not follow already hashed data, so resource need to be
+        # hashed on completion
+        elif hashed != offset:
+            self.discard(key)
+            return
+
+        hasher.update(chunk)
+        self.hashers[key] = (
+            offset + len(chunk),
+            hasher,
+            time.monotonic() + self.hasher_ttl,
+        )
+        self.hashers.move_to_end(key)
@@ -0,0 +1,31 @@
+import asyncio
+import os
+from pathlib import Path
+from typing import AsyncIterator
+
+from . import constants
+
+
+async def iter_file_slices(path: Path, *, start: int, end: int) -> AsyncIterator[bytes]:
+    """Read file slices in between given offsets in thread pool executor.
+
+    Shared by download view & tus client, so it does not depend on server modules.
+    """
+    loop = asyncio.get_running_loop()
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        offset = start
+        while offset < end:
+            data = await loop.run_in_executor(
+                None,
+                os.pread,
+                fd,
+                min(constants.DOWNLOAD_CHUNK_SIZE, end - offset),
+                offset,
+            )
+            if not data:
+                break
+            offset += len(data)
+            yield data
+    finally:
+        os.close(fd)
@@ -1,12 +1,84 @@
 import json
+from functools import partial
 from pathlib import Path
+from typing import Optional, Sequence
 
 from aiohttp import web
 
 from . import views
-from .annotations import Decorator, Handler, JsonDumps, JsonLoads
+from .annotations import (
+    Decorator,
+    Handler,
+    JsonDumps,
+    JsonLoads,
+    MetadataValidator,
+)
+from .cache import ResourceCache
+from .compression import Compressor
 from .constants import APP_TUS_CONFIG_KEY
-from .data import Config, get_resource_url, ResourceCallback, set_config
+from .data import (
+    Config,
+    get_batch_check_url,
+    get_resource_events_url,
+    get_resource_url,
+    ResourceCallback,
+    set_config,
+)
+from .events import ProgressBroker
+from .index import UploadIndex
+from .monitor import LoopMonitor
+from .processors import ChunkProcessor, validate_processors
+from .profiling import RequestProfiler
+from .quotas import UsageLedger
+from .recovery import RecoveryScan
+from .scheduling import IOScheduler, PRIORITY_NORMAL
+from .storage import ContentStore
+from .validators import validate_upload_metadata
+from .writers import (
+    BufferPool,
+    DEFAULT_BUFFER_SIZE,
+    DEFAULT_MMAP_WINDOW_SIZE,
+    DURABILITIES,
+    DURABILITY_NONE,
+    WRITE_MODE_FILE,
+    WRITE_MODES,
+)
+
+
+def add_lifecycle_hooks(
+    app: web.Application,
+    *,
+    config: Config,
+    recovery_scan: Optional[RecoveryScan],
+    monitor: Optional[LoopMonitor],
+) -> None:
+    """Start background tasks on application startup & release them on cleanup."""
+    # Shutdown compressor process pool on application cleanup
+    if config.compressor is not None:
+        app.on_cleanup.append(config.compressor.on_cleanup)
+
+    # Run recovery scan in background on application startup
+    if recovery_scan is not None:
+        app.on_startup.append(partial(recovery_scan.on_startup, config=config))
+        app.on_cleanup.append(recovery_scan.on_cleanup)
+
+    # Probe event loop lag in background
+    if monitor is not None:
+        app.on_startup.append(monitor.on_startup)
+        app.on_cleanup.append(monitor.on_cleanup)
+
+    # Dump aggregated profiles on receiving the signal
+    if config.profiler is not None:
+        app.on_startup.append(config.profiler.on_startup)
+        app.on_cleanup.append(config.profiler.on_cleanup)
+
+    # Close usage ledger connections on application cleanup
+    if config.usage_ledger is not None:
+        app.on_cleanup.append(config.usage_ledger.on_cleanup)
+
+    # Close upload index connections on application cleanup
+    if config.upload_index is not None:
+        app.on_cleanup.append(config.upload_index.on_cleanup)
 
 
 def setup_tus(
@@ -18,6 +90,34 @@ def setup_tus(
     allow_overwrite_files: bool = False,
     decorator: Decorator = None,
     on_upload_done: ResourceCallback = None,
+    metadata_validators: Sequence[MetadataValidator] = (validate_upload_metadata,),
+    max_metadata_keys: Optional[int] = 64,
+    max_metadata_value_size: Optional[int] = 16384,
+    chunk_processors: Sequence[ChunkProcessor] = (),
+    progress_events: bool = False,
+    progress_events_interval: float = 0.5,
+    resource_cache_size: int = 0,
+    resource_cache_ttl: float = 60.0,
+    content_store: ContentStore = None,
+    compressor: Compressor = None,
+    upload_index: bool = False,
+    fingerprint_lookup: bool = False,
+    usage_ledger: UsageLedger = None,
+    downloads: bool = False,
+    batch_checks: bool = False,
+    pipelining_window: int = 0,
+    write_buffer_size: int = DEFAULT_BUFFER_SIZE,
+    write_mode: str = WRITE_MODE_FILE,
+    mmap_window_size: int = DEFAULT_MMAP_WINDOW_SIZE,
+    durability: str = DURABILITY_NONE,
+    read_idle_timeout: float = None,
+    min_upload_rate: int = None,
+    min_upload_rate_grace: float = 5.0,
+    io_scheduler: IOScheduler = None,
+    io_priority: str = PRIORITY_NORMAL,
+    recovery_scan: RecoveryScan = None,
+    monitor: LoopMonitor = None,
+    profiler: RequestProfiler = None,
     json_dumps: JsonDumps = json.dumps,
     json_loads: JsonLoads = json.loads,
 ) -> web.Application:
@@ -55,6 +155,141 @@ def setup_tus(
         uploaded resource such as file name, file size
         (:class:`aiohttp_tus.data.Resource` instance). While file path will contain
         :class:`pathlib.Path` instance of uploaded file.
+
+        Decoded ``Upload-Metadata`` header is available as ``resource.metadata``
+        read-only case insensitive mapping.
+    :param metadata_validators:
+        Chain of functions to validate decoded ``Upload-Metadata`` header on
+        starting upload & on checking whether file exists. Each validator receives
+        mapping returned by previous one and should raise
+        :class:`aiohttp.web.HTTPException` if metadata is not valid. By default:
+        ``(aiohttp_tus.validators.validate_upload_metadata,)``, which ensures
+        ``filename`` value is present
+    :param max_metadata_keys:
+        Max number of keys allowed in ``Upload-Metadata`` header. ``None`` disables
+        the limit. By default: ``64``
+    :param max_metadata_value_size:
+        Max size of decoded ``Upload-Metadata`` value in bytes. ``None`` disables
+        the limit. By default: ``16384``
+    :param chunk_processors:
+        Sequence of :class:`aiohttp_tus.processors.ChunkProcessor` instances to feed
+        with every slice of uploaded data while it arrives. Use it to sniff file
+        magic, compute checksums or feed virus scanners without re-reading uploaded
+        file in ``on_upload_done`` callback. Finalized processor results are
+        available as ``resource.processors_results`` dict. By default: ``()``
+    :param progress_events:
+        When enabled register ``GET {upload_url}/{resource_uid}/events`` view, which
+        streams resource upload progress as Server-Sent Events. Progress is pushed
+        from upload view via in-memory pub/sub, so any number of subscribers do not
+        cause any additional disk reads. By default: ``False``
+    :param progress_events_interval:
+        Minimal interval in seconds in between two progress events for one resource.
+        More frequent progress updates are coalesced. By default: ``0.5``
+    :param resource_cache_size:
+        Max number of resources to keep in in-process cache. When enabled, ``HEAD``
+        requests for active uploads do not read resource metadata from the disk.
+        Cache is kept coherent only within one process, so do not enable it when
+        multiple processes serve the same upload path. By default: ``0`` (which
+        means cache is disabled)
+    :param resource_cache_ttl:
+        Time to live of cached resource in seconds. By default: ``60.0``
+    :param content_store:
+        :class:`aiohttp_tus.storage.ContentStore` instance to enable deduplicating
+        content-addressed storage for completed uploads. Each unique content is
+        stored once and hard linked to the uploaded file path. Content digest is
+        available for ``on_upload_done`` callback as ``resource.content_digest``.
+        By default: ``None``
+    :param compressor:
+        :class:`aiohttp_tus.compression.Compressor` instance to compress completed
+        uploads at rest. Codec is chosen by content type from ``Upload-Metadata``
+        header and compressed file is stored with codec suffix (e.g. ``.gz``) as
+        ``resource.file_name``. By default: ``None``
+    :param upload_index:
+        When enabled keep index of in-progress uploads in SQLite database, stored
+        into ``upload_path / ".metadata"`` directory. Index is required for
+        :func:`aiohttp_tus.admin.create_admin_app` views to list & bulk delete
+        uploads without listing huge metadata directories. It is also required for
+        batched file check view to find in-progress uploads. By default: ``False``
+    :param fingerprint_lookup:
+        When enabled ``GET {upload_url}`` request with ``Upload-Length`` header looks
+        up in-progress upload with same fingerprint in upload index and responds with
+        its ``Location``, so client, which lost its upload URL, resumes the upload.
+        As response exposes UID of upload, started by other client with same file
+        name, size & optional ``fingerprint`` metadata, guard upload views with
+        ``decorator`` and use per-user upload paths. Requires ``upload_index``. By
+        default: ``False``
+    :param usage_ledger:
+        :class:`aiohttp_tus.quotas.UsageLedger` instance to enforce per-tenant
+        storage quotas. Usage is tracked incrementally, so uploads exceeding
+        quota of the upload path are rejected with ``413 Request Entity Too Large``
+        status without walking the upload path. By default: ``None``
+    :param downloads:
+        When enabled register ``GET {upload_url}/{resource_uid}`` view to download
+        completed file or data uploaded so far for in-progress upload. Completed
+        files are sent with ``sendfile`` and both support ``Range`` requests. Access
+        to the view is checked with ``decorator`` as well. By default: ``False``
+    :param batch_checks:
+        When enabled register ``POST {upload_url}/_batch/check`` view to check many
+        files at once. When ``upload_index`` is enabled as well, response exposes
+        UIDs & offsets of in-progress uploads of checked files, so guard the view with
+        ``decorator``. By default: ``False``
+    :param pipelining_window:
+        When set, advertise ``pipelining`` extension and allow clients to send
+        multiple ``PATCH`` requests for one resource without waiting for previous
+        ones. Pipelined request should contain ``Upload-Pipelining: true`` header
+        and its chunk must fit within given number of bytes beyond current resource
+        offset. Chunks are written at their offsets as they arrive & resource is
+        completed, when all its ranges are uploaded. Not supported together with
+        ``chunk_processors``. By default: ``0`` (which means pipelining is disabled)
+    :param write_buffer_size:
+        Size of pooled buffer in bytes, used to coalesce small slices of request body
+        before writing them to the resource file with single ``pwrite`` call. By
+        default: ``1048576``
+    :param write_mode:
+        How to write chunks into resource file. ``file`` to write them via ``pwrite``
+        calls, ``mmap`` to copy them into memory mapped resource file. By default:
+        ``file``
+    :param mmap_window_size:
+        Max number of bytes of resource file to map at once in ``mmap`` write mode.
+        By default: ``67108864``
+    :param durability:
+        ``none`` to leave writing data back to the disk to the kernel, ``sync`` to
+        flush written data to the disk (via ``fdatasync`` or ``msync``) before
+        responding to ``PATCH`` request. By default: ``none``
+    :param read_idle_timeout:
+        Max number of seconds to wait for next slice of ``PATCH`` request body. By
+        default: ``None``
+    :param min_upload_rate:
+        Min rate in bytes per second to read ``PATCH`` request body with. Slower
+        requests are cut off after ``min_upload_rate_grace`` seconds. By default:
+        ``None``
+    :param min_upload_rate_grace:
+        Number of seconds to read request body without enforcing min upload rate.
+        By default: ``5.0``
+
+        Data received before request is cut off by read idle timeout or min upload
+        rate is persisted, so client resumes the upload from its offset.
+    :param io_scheduler:
+        :class:`aiohttp_tus.scheduling.IOScheduler` instance to schedule writes,
+        syncs & completion moves of uploads by their priority classes. Share same
+        instance in between upload URLs, which store files on the same disk. By
+        default: ``None``
+    :param io_priority:
+        Priority class of uploads to given upload URL. Client might request other
+        priority class via ``priority`` upload metadata key. By default: ``"normal"``
+    :param recovery_scan:
+        :class:`aiohttp_tus.recovery.RecoveryScan` instance to reconcile resources
+        & their metadata in background on application startup. Scan reaps orphan
+        resource files & metadata, repairs offsets, which disagree with bytes on
+        the disk, and warms resource cache & upload index. By default: ``None``
+    :param monitor:
+        :class:`aiohttp_tus.monitor.LoopMonitor` instance to measure event loop lag
+        & detect slow tus view calls, as well as the phase, which blocked event loop.
+        By default: ``None``
+    :param profiler:
+        :class:`aiohttp_tus.profiling.RequestProfiler` instance to profile sampled
+        calls of tus views & aggregate profiles per view. Aggregated profiles are
+        available via admin application. By default: ``None``
     :param json_dumps:
         To store resource metadata between chunk uploads ``aiohttp-tus`` using JSON
         files, stored into ``upload_path / ".metadata"`` directory.
@@ -67,7 +302,23 @@ def setup_tus(
         By default: :func:`json.loads`
     """
 
-    def decorate(handler: Handler) -> Handler:
+    validate_processors(chunk_processors)
+    if pipelining_window and chunk_processors:
+        raise ValueError("Chunk processors are not supported for pipelined uploads")
+    if fingerprint_lookup and not upload_index:
+        raise ValueError("Fingerprint lookup requires upload index")
+    if write_mode not in WRITE_MODES:
+        raise ValueError(f"Unsupported write mode: {write_mode}")
+    if durability not in DURABILITIES:
+        raise ValueError(f"Unsupported durability: {durability}")
+    if io_scheduler is not None and io_priority not in io_scheduler.weights:
+        raise ValueError(f"Unknown I/O priority class: {io_priority}")
+
+    def decorate(handler: Handler, *, timed: bool = False) -> Handler:
+        if timed and profiler is not None:
+            handler = profiler.wrap(handler.__name__, handler)
+        if timed and monitor is not None:
+            handler = monitor.wrap(handler.__name__, handler)
         if decorator is None:
             return handler
         return decorator(handler)
@@ -86,25 +337,83 @@ def setup_tus(
         upload_resource_name=upload_resource_name,
         allow_overwrite_files=allow_overwrite_files,
         on_upload_done=on_upload_done,
+        metadata_validators=tuple(metadata_validators),
+        max_metadata_keys=max_metadata_keys,
+        max_metadata_value_size=max_metadata_value_size,
+        chunk_processors=tuple(chunk_processors),
+        progress_broker=(
+            ProgressBroker(interval=progress_events_interval)
+            if progress_events
+            else None
+        ),
+        resource_cache=(
+            ResourceCache(maxsize=resource_cache_size, ttl=resource_cache_ttl)
+            if resource_cache_size > 0
+            else None
+        ),
+        content_store=content_store,
+        compressor=compressor,
+        upload_index=UploadIndex() if upload_index else None,
+        fingerprint_lookup=fingerprint_lookup,
+        usage_ledger=usage_ledger,
+        downloads=downloads,
+        pipelining_window=pipelining_window,
+        buffer_pool=BufferPool(buffer_size=write_buffer_size),
+        write_mode=write_mode,
+        mmap_window_size=mmap_window_size,
+        durability=durability,
+        profiler=profiler,
+        read_idle_timeout=read_idle_timeout,
+        min_upload_rate=min_upload_rate,
+        min_upload_rate_grace=min_upload_rate_grace,
+        io_scheduler=io_scheduler,
+        io_priority=io_priority,
         json_dumps=json_dumps,
         json_loads=json_loads,
     )
     set_config(app, canonical_upload_url, config)
 
+    add_lifecycle_hooks(
+        app, config=config, recovery_scan=recovery_scan, monitor=monitor
+    )
+
     # Views for upload management
     upload_resource = app.router.add_resource(
         upload_url, name=config.resource_tus_upload_name
     )
     upload_resource.add_route("OPTIONS", views.upload_options)
     upload_resource.add_route("GET", decorate(views.upload_details))
-    upload_resource.add_route("POST", decorate(views.start_upload))
+    upload_resource.add_route("POST", decorate(views.start_upload, timed=True))
+    if batch_checks:
+        app.router.add_route(
+            "POST",
+            get_batch_check_url(upload_url),
+            decorate(views.check_files),
+            name=config.resource_tus_batch_check_name,
+        )
 
     # Views for resource management
     resource_resource = app.router.add_resource(
         get_resource_url(upload_url), name=config.resource_tus_resource_name
     )
-    resource_resource.add_route("HEAD", decorate(views.resource_details))
-    resource_resource.add_route("DELETE", decorate(views.delete_resource))
-    resource_resource.add_route("PATCH", decorate(views.upload_resource))
+    resource_resource.add_route(
+        "HEAD", decorate(views.resource_details, timed=True)
+    )
+    resource_resource.add_route(
+        "DELETE", decorate(views.delete_resource, timed=True)
+    )
+    resource_resource.add_route(
+        "PATCH", decorate(views.upload_resource, timed=True)
+    )
+    if downloads:
+        resource_resource.add_route("GET", decorate(views.download_resource))
+
+    # View for streaming resource upload progress
+    if progress_events:
+        events_resource = app.router.add_resource(
+            get_resource_events_url(upload_url),
+            name=config.resource_tus_resource_events_name,
+        )
+        events_resource.add_route("GET", decorate(views.resource_events))
 
     return app
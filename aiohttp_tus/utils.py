@@ -1,23 +1,418 @@
-import base64
+import asyncio
+import errno
 import logging
+import os
+from contextlib import contextmanager, nullcontext
+from functools import wraps
 from pathlib import Path
+from typing import AsyncIterator, Iterator, Optional, Tuple
 
+import attr
 from aiohttp import web
-from multidict import CIMultiDict
 
-from .annotations import DictStrBytes, MappingStrBytes
-from .data import Config, get_config, get_resource_path, Resource
+from . import constants
+from .annotations import DictStrStr, Handler, MappingStrBytes, MappingStrStr
+from .compression import CODEC_SUFFIXES
+from .data import (
+    adjust_usage,
+    Config,
+    delete_path,
+    get_config,
+    get_resource_key,
+    get_resource_lock_path,
+    get_resource_offset_path,
+    get_resource_path,
+    is_resource_uid,
+    read_offset,
+    Resource,
+)
+from .events import EVENT_COMPLETED, EVENT_DELETED, EVENT_PROGRESS, ProgressEvent
+from .locks import HTTPLocked, lock_path, ResourceLocked
+# ``parse_upload_metadata`` is re-exported for backward compatibility
+from .metadata import get_fingerprint, parse_upload_metadata  # noqa: F401
+from .monitor import phase
+from .processors import finalize_processors
+from .writers import ChunkWriter, MmapChunkWriter, WRITE_MODE_MMAP, Writer
 
 
+# Errors of writing into resource file, when there is no space left for its bytes
+DISK_FULL_ERRNOS = (errno.ENOSPC, errno.EDQUOT)
+
 logger = logging.getLogger(__name__)
 
 
-def get_resource(request: web.Request) -> Resource:
-    return Resource.from_metadata(
-        config=get_config(request), match_info=request.match_info,
+async def commit_resource_range(
+    *, config: Config, match_info: MappingStrStr, start: int, end: int
+) -> Tuple[Resource, Resource]:
+    """Add uploaded range to the resource under resource lock.
+
+    As lock is held by other request only for a short time, wait for it without
+    blocking event loop. Return resource before & after committing the range.
+    """
+    uid = get_resource_uid(match_info)
+    path = get_resource_lock_path(config=config, match_info=match_info, uid=uid)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + constants.PIPELINING_LOCK_TIMEOUT
+
+    while True:
+        try:
+            with lock_path(path):
+                try:
+                    resource = Resource.from_metadata(
+                        config=config, match_info=match_info
+                    )
+                except IOError:
+                    raise web.HTTPGone(text="")
+
+                next_resource = resource.add_range(start, end)
+                with phase("save_progress"):
+                    next_resource.save_progress(config=config, match_info=match_info)
+                return (resource, next_resource)
+        except ResourceLocked:
+            if loop.time() >= deadline:
+                raise HTTPLocked(text="", headers=constants.BASE_HEADERS)
+            await asyncio.sleep(constants.PIPELINING_LOCK_DELAY)
+
+
+async def complete_upload(
+    *, request: web.Request, config: Config, resource: Resource
+) -> Path:
+    """Move uploaded resource to the file path & call ``on_upload_done`` callback."""
+    match_info = request.match_info
+    resource = attr.evolve(
+        resource,
+        content_digest=await get_content_digest(
+            config=config, match_info=match_info, resource=resource
+        ),
+    )
+    resource = await compress_resource(
+        config=config, match_info=match_info, resource=resource
+    )
+    scheduler = config.io_scheduler
+    try:
+        async with (
+            scheduler.slot(get_io_priority(config=config, resource=resource))
+            if scheduler is not None
+            else nullcontext()
+        ):
+            with phase("complete"):
+                file_path = resource.complete(config=config, match_info=match_info)
+    # Other upload with the same file name has been completed in between. Resource
+    # file might have been already moved into content store, so its usage is
+    # released explicitly
+    except FileExistsError:
+        delete_path(
+            get_resource_path(config=config, match_info=match_info, uid=resource.uid)
+        )
+        adjust_usage(
+            config=config,
+            match_info=match_info,
+            size=-resource.reserved_size,
+            files=-1,
+        )
+        resource.delete_metadata(config=config, match_info=match_info)
+        raise web.HTTPConflict(
+            text="File with such name already exists",
+            headers=constants.BASE_HEADERS,
+        )
+
+    await on_upload_done(
+        request=request,
+        config=config,
+        resource=attr.evolve(
+            resource,
+            processors_results=finalize_processors(
+                config.chunk_processors, resource.processors_state
+            ),
+        ),
+        file_path=file_path,
+    )
+    publish_progress(
+        config=config,
+        match_info=match_info,
+        resource=resource,
+        offset=resource.offset,
+        event=EVENT_COMPLETED,
+    )
+    return file_path
+
+
+async def compress_resource(
+    *, config: Config, match_info: MappingStrStr, resource: Resource
+) -> Resource:
+    """Compress completed resource file, if its content type is compressible."""
+    compressor = config.compressor
+    if compressor is None:
+        return resource
+
+    codec = compressor.get_codec(resource.metadata)
+    if codec is None:
+        return resource
+
+    path = get_resource_path(config=config, match_info=match_info, uid=resource.uid)
+    compressed_path = await compressor.compress(path, codec)
+    os.replace(compressed_path, path)
+
+    return attr.evolve(
+        resource, file_name=resource.file_name + compressed_path.suffix, codec=codec
     )
 
 
+def create_writer(
+    *,
+    config: Config,
+    match_info: MappingStrStr,
+    resource: Resource,
+    offset: int,
+) -> Writer:
+    """Create writer for the resource file according to configured write mode."""
+    path = get_resource_path(config=config, match_info=match_info, uid=resource.uid)
+    # Resource with deferred length is not allocated & grows by appending, even
+    # after its length has been declared
+    if (
+        config.write_mode == WRITE_MODE_MMAP
+        and resource.file_size is not None
+        and path.stat().st_size >= resource.file_size
+    ):
+        return MmapChunkWriter(
+            path=path,
+            offset=offset,
+            window_size=config.mmap_window_size,
+            durability=config.durability,
+        )
+    return ChunkWriter(
+        path=path, offset=offset, pool=config.buffer_pool, durability=config.durability
+    )
+
+
+def discard_resource(
+    *, config: Config, match_info: MappingStrStr, resource: Resource
+) -> None:
+    """Discard in-process state of deleted resource & notify progress subscribers."""
+    if config.content_store is not None:
+        config.content_store.discard(
+            get_resource_key(config=config, match_info=match_info, uid=resource.uid)
+        )
+    publish_progress(
+        config=config,
+        match_info=match_info,
+        resource=resource,
+        offset=resource.offset,
+        event=EVENT_DELETED,
+    )
+
+
+def find_declared_object(
+    *,
+    config: Config,
+    match_info: MappingStrStr,
+    metadata: MappingStrBytes,
+    size: int,
+) -> Optional[Path]:
+    store = config.content_store
+    if store is None or not store.trust_declared_digest:
+        return None
+
+    digest = metadata.get(store.algorithm)
+    if not digest:
+        return None
+
+    # Upload, which would be compressed on completion, is looked up among objects
+    # compressed with the same codec
+    codec = (
+        config.compressor.get_codec(metadata) if config.compressor is not None else None
+    )
+    return store.find(
+        config.resolve_upload_path(match_info),
+        digest.decode("utf-8", errors="replace"),
+        size=size,
+        suffix=CODEC_SUFFIXES[codec] if codec is not None else "",
+    )
+
+
+async def find_fingerprinted_upload(
+    *,
+    config: Config,
+    match_info: MappingStrStr,
+    metadata: MappingStrBytes,
+    size: Optional[int],
+) -> Optional[Tuple[str, int]]:
+    """Find UID & offset of in-progress upload with same fingerprint.
+
+    Allows client, which lost its upload URL, to resume the upload instead of
+    restarting it. Lookup exposes UID of upload, so it is done only when enabled
+    explicitly.
+    """
+    index = config.upload_index
+    if not config.fingerprint_lookup or index is None:
+        return None
+    fingerprint = get_fingerprint(metadata, size)
+    if fingerprint is None:
+        return None
+
+    upload = await index.run(
+        index.find_fingerprint, config.resolve_metadata_path(match_info), fingerprint
+    )
+    if upload is None:
+        return None
+
+    # Index might be behind, when upload has been just completed or deleted
+    offset = read_offset(
+        get_resource_offset_path(config=config, match_info=match_info, uid=upload.uid)
+    )
+    if offset is None:
+        return None
+    return (upload.uid, offset)
+
+
+async def fix_upload_length(
+    request: web.Request, *, config: Config, resource: Resource
+) -> Resource:
+    """Fix length of resource with deferred length, declared via ``Upload-Length``.
+
+    Bytes, appended before, are already reserved in storage usage, so only the rest
+    of declared length is reserved.
+    """
+    file_size = parse_upload_length(request)
+    if resource.file_size is not None:
+        if file_size != resource.file_size:
+            raise web.HTTPBadRequest(
+                text="Upload-Length can not be changed", headers=constants.BASE_HEADERS
+            )
+        return resource
+
+    if file_size < resource.offset:
+        raise web.HTTPBadRequest(
+            text="Upload-Length is less than Upload-Offset",
+            headers=constants.BASE_HEADERS,
+        )
+    match_info = request.match_info
+    await reserve_usage(
+        config=config,
+        match_info=match_info,
+        size=file_size - resource.offset,
+        files=0,
+    )
+    with phase("fix_length"):
+        return resource.fix_length(
+            config=config, match_info=match_info, file_size=file_size
+        )
+
+
+async def get_content_digest(
+    *, config: Config, match_info: MappingStrStr, resource: Resource
+) -> Optional[str]:
+    store = config.content_store
+    if store is None:
+        return None
+
+    digest = store.get_digest(
+        get_resource_key(config=config, match_info=match_info, uid=resource.uid),
+        size=resource.offset,
+    )
+    if digest is not None:
+        return digest
+
+    return await asyncio.get_running_loop().run_in_executor(
+        None,
+        store.compute_digest,
+        get_resource_path(config=config, match_info=match_info, uid=resource.uid),
+    )
+
+
+def get_io_priority(*, config: Config, resource: Resource) -> str:
+    """Return I/O priority class of the resource upload."""
+    if config.io_scheduler is None:
+        return config.io_priority
+    return config.io_scheduler.get_priority(resource.metadata, config.io_priority)
+
+
+def get_length_headers(resource: Resource) -> DictStrStr:
+    if resource.file_size is None:
+        return {constants.HEADER_UPLOAD_DEFER_LENGTH: "1"}
+    return {constants.HEADER_UPLOAD_LENGTH: str(resource.file_size)}
+
+
+def get_request_range(request: web.Request, *, size: int) -> Optional[Tuple[int, int]]:
+    """Return ``(start, end)`` of requested ``Range`` or ``None`` for whole data.
+
+    :raises aiohttp.web.HTTPRequestRangeNotSatisfiable: on invalid range.
+    """
+    not_satisfiable = web.HTTPRequestRangeNotSatisfiable(
+        headers={
+            **constants.BASE_HEADERS,
+            constants.HEADER_CONTENT_RANGE: f"bytes */{size}",
+        }
+    )
+    try:
+        http_range = request.http_range
+    except ValueError:
+        raise not_satisfiable
+
+    start, end = http_range.start, http_range.stop
+    if start is None and end is None:
+        return None
+
+    if start is None:
+        start = 0
+    elif start < 0:
+        start, end = max(size + start, 0), size
+    end = size if end is None else min(end, size)
+
+    if start >= end:
+        raise not_satisfiable
+    return (start, end)
+
+
+def get_resource_uid(match_info: MappingStrStr) -> str:
+    """Return resource UID from the URL or respond with ``404``, if it is malformed.
+
+    UID is a part of resource file paths, so it is validated before any file system
+    access.
+    """
+    uid = match_info["resource_uid"]
+    if not is_resource_uid(uid):
+        raise web.HTTPNotFound(text="", headers=constants.BASE_HEADERS)
+    return uid
+
+
+def get_upload_length(request: web.Request) -> Optional[int]:
+    """Return upload length, declared by client, or ``None`` if it is deferred.
+
+    :raises aiohttp.web.HTTPBadRequest:
+        if neither ``Upload-Length`` nor ``Upload-Defer-Length: 1`` header is sent.
+    """
+    defer_length = request.headers.get(constants.HEADER_UPLOAD_DEFER_LENGTH)
+    if defer_length is not None:
+        if defer_length != "1":
+            raise web.HTTPBadRequest(
+                text="Invalid Upload-Defer-Length header",
+                headers=constants.BASE_HEADERS,
+            )
+        return None
+    return parse_upload_length(request)
+
+
+def get_resource(request: web.Request) -> Resource:
+    config = get_config(request)
+    match_info = request.match_info
+
+    # Metadata path is built from UID, so validate it first
+    uid = get_resource_uid(match_info)
+    cache = config.resource_cache
+    if cache is None:
+        with phase("metadata"):
+            return Resource.from_metadata(config=config, match_info=match_info)
+
+    key = get_resource_key(config=config, match_info=match_info, uid=uid)
+    resource = cache.get(key)
+    if resource is None:
+        with phase("metadata"):
+            resource = Resource.from_metadata(config=config, match_info=match_info)
+        cache.set(key, resource)
+    return resource
+
+
 def get_resource_or_404(request: web.Request) -> Resource:
     try:
         return get_resource(request)
@@ -39,7 +434,7 @@ def get_resource_or_410(request: web.Request) -> Resource:
     except IOError:
         logger.warning(
             "Attempt to continue upload of removed resource",
-            extra={"file_name" "resource_uid": resource.uid},
+            extra={"resource_uid": request.match_info["resource_uid"]},
         )
         raise web.HTTPGone(text="")
     return resource
@@ -54,13 +449,250 @@ async def on_upload_done(
     await config.on_upload_done(request, resource, file_path)
 
 
-def parse_upload_metadata(metadata_header: str) -> MappingStrBytes:
-    metadata: DictStrBytes = {}
+async def iter_request_chunks(
+    request: web.Request, *, config: Config
+) -> AsyncIterator[bytes]:
+    """Iterate over request body slices, respecting client max size setting.
+
+    When configured, waiting for the next slice is bounded by read idle timeout as
+    well as by the time, when body is read slower than min upload rate (after grace
+    period). On timeout connection is closed without reading rest of the body &
+    ``408 Request Timeout`` error raised, so views persist slices received so far.
+    """
+    max_size = request.client_max_size
+    idle_timeout = config.read_idle_timeout
+    min_rate = config.min_upload_rate
+    size = 0
+
+    loop = asyncio.get_running_loop()
+    started_at = loop.time()
+    iterator = request.content.iter_any().__aiter__()
+
+    while True:
+        timeout = idle_timeout
+        if min_rate:
+            rate_deadline = started_at + max(
+                config.min_upload_rate_grace, size / min_rate
+            )
+            rate_timeout = max(rate_deadline - loop.time(), 0.0)
+            timeout = rate_timeout if timeout is None else min(timeout, rate_timeout)
+
+        try:
+            if timeout is None:
+                data = await iterator.__anext__()
+            else:
+                data = await asyncio.wait_for(iterator.__anext__(), timeout=timeout)
+        except StopAsyncIteration:
+            return
+        except asyncio.TimeoutError:
+            logger.warning(
+                "Request body is read too slow",
+                extra={"resource_uid": request.match_info.get("resource_uid")},
+            )
+            request.protocol.force_close()
+            raise web.HTTPRequestTimeout(
+                text="Request body is read too slow", headers=constants.BASE_HEADERS
+            )
+
+        size += len(data)
+        if max_size and size > max_size:
+            raise web.HTTPRequestEntityTooLarge(max_size=max_size, actual_size=size)
+        yield data
+
+
+def hash_chunk(
+    *,
+    config: Config,
+    match_info: MappingStrStr,
+    resource: Resource,
+    chunk: bytes,
+    offset: int,
+) -> None:
+    if config.content_store is None:
+        return
+
+    config.content_store.update(
+        get_resource_key(config=config, match_info=match_info, uid=resource.uid),
+        chunk=chunk,
+        offset=offset,
+    )
+
+
+@contextmanager
+def insufficient_storage() -> Iterator[None]:
+    """Respond with ``507 Insufficient Storage``, when disk or its quota is full."""
+    try:
+        yield
+    except OSError as err:
+        if err.errno not in DISK_FULL_ERRNOS:
+            raise
+        raise web.HTTPInsufficientStorage(text="", headers=constants.BASE_HEADERS)
+
+
+def parse_upload_length(request: web.Request) -> int:
+    try:
+        value = int(request.headers[constants.HEADER_UPLOAD_LENGTH])
+        if value < 0:
+            raise ValueError(value)
+    except (KeyError, ValueError):
+        raise web.HTTPBadRequest(
+            text="Missing or invalid Upload-Length header",
+            headers=constants.BASE_HEADERS,
+        )
+    return value
+
+
+def publish_progress(
+    *,
+    config: Config,
+    match_info: MappingStrStr,
+    resource: Resource,
+    offset: int,
+    event: str = EVENT_PROGRESS,
+) -> None:
+    broker = config.progress_broker
+    if broker is None:
+        return
+
+    broker.publish(
+        get_resource_key(config=config, match_info=match_info, uid=resource.uid),
+        ProgressEvent(
+            uid=resource.uid, offset=offset, file_size=resource.file_size, event=event
+        ),
+    )
+
+
+@contextmanager
+def reserve_range(
+    *, config: Config, match_info: MappingStrStr, start: int, end: int
+) -> Iterator[None]:
+    """Mark range of pipelined chunk as in-flight while it is being uploaded.
+
+    Respond with ``409 Conflict``, when range overlaps with range of other chunk,
+    which is still being uploaded, as its bytes are not committed to the resource
+    ranges yet.
+    """
+    key = get_resource_key(
+        config=config, match_info=match_info, uid=get_resource_uid(match_info)
+    )
+    ranges = config.inflight_ranges.setdefault(key, [])
+    if any(start < item_end and item_start < end for item_start, item_end in ranges):
+        raise web.HTTPConflict(headers=constants.BASE_HEADERS)
+
+    ranges.append((start, end))
+    try:
+        yield
+    finally:
+        ranges.remove((start, end))
+        if not ranges:
+            config.inflight_ranges.pop(key, None)
+
+
+async def reserve_usage(
+    *, config: Config, match_info: MappingStrStr, size: int, files: int = 1
+) -> None:
+    """Add file of given size to the storage usage, unless quota is exceeded."""
+    ledger = config.usage_ledger
+    if ledger is None:
+        return
+
+    quota = ledger.resolve_quota(match_info)
+    with phase("quota"):
+        reserved = await ledger.run(
+            ledger.reserve,
+            config.resolve_metadata_path(match_info),
+            size=size,
+            quota=quota,
+            files=files,
+        )
+    if not reserved:
+        raise web.HTTPRequestEntityTooLarge(
+            max_size=quota.max_bytes or 0,
+            actual_size=size,
+            text="Upload quota exceeded",
+            headers=constants.BASE_HEADERS,
+        )
+
+
+async def reserve_usage_step(
+    *, config: Config, match_info: MappingStrStr, size: int, max_size: int
+) -> int:
+    """Reserve at least given number of appended bytes & return number of reserved.
+
+    Bytes of chunked request are reserved in steps of up to ``USAGE_RESERVE_STEP``
+    bytes instead of slice by slice. When quota does not fit whole step, only given
+    number of bytes is reserved.
+    """
+    step = min(max(size, constants.USAGE_RESERVE_STEP), max_size)
+    try:
+        await reserve_usage(config=config, match_info=match_info, size=step, files=0)
+    except web.HTTPRequestEntityTooLarge:
+        if step == size:
+            raise
+        await reserve_usage(config=config, match_info=match_info, size=size, files=0)
+        return size
+    return step
+
+
+async def sync_writer(*, config: Config, writer: Writer, priority: str) -> None:
+    """Write buffered data of the writer after the last slice of the chunk."""
+    scheduler = config.io_scheduler
+    with insufficient_storage():
+        if scheduler is None:
+            with phase("write"):
+                writer.flush()
+            return
+        await scheduler.run(priority, writer.sync, cost=writer.buffered)
+
+
+def with_resource_lock(handler: Handler) -> Handler:
+    """Process request only if no other request modifies the same resource.
+
+    Otherwise respond with ``423 Locked`` status.
+    """
+
+    @wraps(handler)
+    async def locked(request: web.Request) -> web.StreamResponse:
+        # Lock path is built from UID, so malformed UID must not reach the disk
+        path = get_resource_lock_path(
+            config=get_config(request),
+            match_info=request.match_info,
+            uid=get_resource_uid(request.match_info),
+        )
+        try:
+            with lock_path(path):
+                try:
+                    return await handler(request)
+                # Do not keep lock files for missing resources
+                except (web.HTTPGone, web.HTTPNotFound):
+                    delete_path(path)
+                    raise
+        except ResourceLocked:
+            logger.warning(
+                "Attempt to modify locked resource",
+                extra={"resource_uid": request.match_info["resource_uid"]},
+            )
+            raise HTTPLocked(text="", headers=constants.BASE_HEADERS)
+
+    return locked
+
+
+async def write_slice(
+    *, config: Config, writer: Writer, data: bytes, flush: bool, priority: str
+) -> None:
+    """Write slice of request body, via I/O scheduler if it hits the disk."""
+    scheduler = config.io_scheduler
+    if scheduler is None or not (flush or writer.needs_flush(len(data))):
+        with phase("write", size=len(data)), insufficient_storage():
+            writer.write(data)
+            if flush:
+                writer.flush()
+        return
 
-    for item in metadata_header.split(","):
-        if not item:
-            continue
-        key, value = item.split()
-        metadata[key] = base64.b64decode(value)
+    def write() -> None:
+        writer.write(data)
+        if flush:
+            writer.flush()
 
-    return CIMultiDict(metadata)
+    with insufficient_storage():
+        await scheduler.run(priority, write, cost=writer.buffered + len(data))
@@ -1,14 +1,18 @@
 from pathlib import Path
-from typing import Optional
+from typing import Optional, TYPE_CHECKING
 
 from aiohttp import web
 
 from .annotations import MappingStrBytes
-from .data import Config
+from .metadata import parse_upload_metadata
+
+
+if TYPE_CHECKING:  # pragma: no cover
+    from .data import Config
 
 
 def check_file_name(
-    valid_metadata: MappingStrBytes, *, config: Config
+    valid_metadata: MappingStrBytes, *, config: "Config"
 ) -> Optional[str]:
     path = Path(valid_metadata["filename"].decode())
     if any(config.upload_path.glob(f"{path.stem}.*")):
@@ -16,6 +20,24 @@ def check_file_name(
     return None
 
 
+def validate_metadata_header(
+    metadata_header: str, *, config: "Config"
+) -> MappingStrBytes:
+    """Parse upload metadata header and pass it through configured validators."""
+    try:
+        metadata = parse_upload_metadata(
+            metadata_header,
+            max_keys=config.max_metadata_keys,
+            max_value_size=config.max_metadata_value_size,
+        )
+    except ValueError as err:
+        raise web.HTTPBadRequest(text=str(err))
+
+    for validator in config.metadata_validators:
+        metadata = validator(metadata)
+    return metadata
+
+
 def validate_upload_metadata(upload_metadata: MappingStrBytes) -> MappingStrBytes:
     if not upload_metadata.get("filename"):
         raise web.HTTPNotFound(text="Upload metadata missed filename value")
@@ -1,23 +1,105 @@
+import asyncio
 import logging
+from functools import partial
+from typing import Dict
 
 import attr
 from aiohttp import web
 
 from . import constants
 from .annotations import DictStrStr
-from .data import get_config, Resource
+from .checks import get_files_status, parse_checks
+from .compression import SUFFIX_CODECS
+from .data import (
+    adjust_usage,
+    get_config,
+    get_file_path,
+    get_resource_completed_path,
+    get_resource_key,
+    get_resource_path,
+    link_completed_path,
+    Resource,
+)
+from .events import ProgressEvent
+from .index import IndexedUpload
+from .monitor import phase
+from .processors import feed_processors, get_initial_processors_state
+from .streams import iter_file_slices
 from .utils import (
+    commit_resource_range,
+    complete_upload,
+    create_writer,
+    discard_resource,
+    find_declared_object,
+    find_fingerprinted_upload,
+    fix_upload_length,
+    get_io_priority,
+    get_length_headers,
+    get_request_range,
     get_resource_or_404,
     get_resource_or_410,
+    get_resource_uid,
+    get_upload_length,
+    hash_chunk,
+    iter_request_chunks,
     on_upload_done,
-    parse_upload_metadata,
+    parse_upload_length,
+    publish_progress,
+    reserve_range,
+    reserve_usage,
+    reserve_usage_step,
+    sync_writer,
+    with_resource_lock,
+    write_slice,
 )
-from .validators import check_file_name, validate_upload_metadata
+from .validators import check_file_name, validate_metadata_header
 
 
 logger = logging.getLogger(__name__)
 
 
+async def check_files(request: web.Request) -> web.Response:
+    """Check whether many files are already uploaded or being uploaded at once.
+
+    Request body should be JSON object with ``files`` list of file names or
+    ``{"name", "size", "digest"}`` objects. In-progress uploads are looked up only
+    in the upload index, so without it their ``uid`` & ``offset`` are ``null``.
+    """
+    config = get_config(request)
+    match_info = request.match_info
+    try:
+        data = config.json_loads(await request.text())
+        checks = parse_checks(data["files"])
+    except (KeyError, TypeError, ValueError):
+        raise web.HTTPBadRequest(text="Invalid file check request")
+
+    uploads: Dict[str, IndexedUpload] = {}
+    if config.upload_index is not None:
+        with phase("index"):
+            uploads = await config.upload_index.run(
+                config.upload_index.find_uploads,
+                config.resolve_metadata_path(match_info),
+                (item.name for item in checks),
+            )
+
+    results = await asyncio.get_running_loop().run_in_executor(
+        None,
+        partial(
+            get_files_status,
+            config=config,
+            match_info=match_info,
+            checks=checks,
+            uploads=uploads,
+        ),
+    )
+    return web.json_response(
+        {"files": [attr.asdict(item) for item in results]},
+        headers=constants.BASE_HEADERS,
+        dumps=config.json_dumps,
+    )
+
+
+@with_resource_lock
 async def delete_resource(request: web.Request) -> web.Response:
     """Delete resource if user canceled the upload."""
     # Ensure resource exists
@@ -26,12 +108,116 @@ async def delete_resource(request: web.Request) -> web.Response:
     # Remove resource file and its metadata
     config = get_config(request)
     match_info = request.match_info
-    resource.delete(config=config, match_info=match_info)
-    resource.delete_metadata(config=config, match_info=match_info)
+    with phase("delete"):
+        resource.delete(config=config, match_info=match_info)
+        resource.delete_metadata(config=config, match_info=match_info)
+    discard_resource(config=config, match_info=match_info, resource=resource)
 
     return web.Response(status=204, headers=constants.BASE_HEADERS)
 
 
+async def download_resource(request: web.Request) -> web.StreamResponse:
+    """Download completed resource or data uploaded so far for in-progress one.
+
+    Completed resources are sent via :class:`aiohttp.web.FileResponse`, which uses
+    ``sendfile`` & supports ``Range`` requests. For in-progress resources only
+    contiguous uploaded data is streamed.
+    """
+    config = get_config(request)
+    match_info = request.match_info
+
+    completed_path = get_resource_completed_path(
+        config=config, match_info=match_info, uid=get_resource_uid(match_info)
+    )
+    if completed_path.is_symlink():
+        file_path = completed_path.resolve()
+        # Uploaded file has been deleted or link points outside of the upload path
+        if not file_path.is_file() or not file_path.is_relative_to(
+            config.resolve_upload_path(match_info).resolve()
+        ):
+            raise web.HTTPNotFound(text="")
+        return web.FileResponse(file_path, headers=constants.BASE_HEADERS)
+
+    # Ensure resource exists
+    resource = get_resource_or_404(request)
+
+    size = resource.offset
+    headers = {
+        **constants.BASE_HEADERS,
+        **get_length_headers(resource),
+        constants.HEADER_ACCEPT_RANGES: "bytes",
+        constants.HEADER_CACHE_CONTROL: "no-store",
+        constants.HEADER_UPLOAD_OFFSET: str(size),
+    }
+    start, end = get_request_range(request, size=size) or (0, size)
+    if end - start != size:
+        headers[constants.HEADER_CONTENT_RANGE] = f"bytes {start}-{end - 1}/{size}"
+
+    response = web.StreamResponse(
+        status=206 if constants.HEADER_CONTENT_RANGE in headers else 200,
+        headers=headers,
+    )
+    response.content_type = "application/octet-stream"
+    response.content_length = end - start
+    await response.prepare(request)
+
+    async for data in iter_file_slices(
+        get_resource_path(config=config, match_info=match_info, uid=resource.uid),
+        start=start,
+        end=end,
+    ):
+        await response.write(data)
+
+    await response.write_eof()
+    return response
+
+
+async def resource_events(request: web.Request) -> web.StreamResponse:
+    """Stream resource upload progress as Server-Sent Events."""
+    config = get_config(request)
+    broker = config.progress_broker
+    if broker is None:
+        raise web.HTTPNotFound(text="")
+
+    match_info = request.match_info
+    key = get_resource_key(
+        config=config, match_info=match_info, uid=match_info["resource_uid"]
+    )
+
+    # Subscribe before reading resource metadata to not miss any progress event
+    with broker.subscribe(key) as queue:
+        # Ensure resource exists
+        resource = get_resource_or_404(request)
+
+        response = web.StreamResponse(
+            status=200,
+            headers={
+                **constants.BASE_HEADERS,
+                constants.HEADER_CACHE_CONTROL: "no-store",
+                constants.HEADER_CONTENT_TYPE: "text/event-stream",
+            },
+        )
+        await response.prepare(request)
+
+        event = ProgressEvent(
+            uid=resource.uid, offset=resource.offset, file_size=resource.file_size
+        )
+        await response.write(event.to_sse(json_dumps=config.json_dumps))
+
+        while not event.is_final:
+            try:
+                event = await asyncio.wait_for(
+                    queue.get(), timeout=constants.PROGRESS_EVENTS_HEARTBEAT
+                )
+            except asyncio.TimeoutError:
+                await response.write(b": heartbeat\n\n")
+                continue
+            await response.write(event.to_sse(json_dumps=config.json_dumps))
+
+    await response.write_eof()
+    return response
+
+
 async def resource_details(request: web.Request) -> web.Response:
     """Request resource offset if it is present."""
     # Ensure resource exists
@@ -42,8 +228,8 @@ async def resource_details(request: web.Request) -> web.Response:
         headers={
             **constants.BASE_HEADERS,
             constants.HEADER_CACHE_CONTROL: "no-store",
+            **get_length_headers(resource),
             constants.HEADER_UPLOAD_OFFSET: str(resource.offset),
-            constants.HEADER_UPLOAD_LENGTH: str(resource.file_size),
         },
     )
 
@@ -64,7 +250,7 @@ async def start_upload(request: web.Request) -> web.Response:
 
     # Ensure upload metadata header is valid one
     metadata_header = request.headers.get(constants.HEADER_UPLOAD_METADATA) or ""
-    valid_metadata = validate_upload_metadata(parse_upload_metadata(metadata_header))
+    valid_metadata = validate_metadata_header(metadata_header, config=config)
     file_name = check_file_name(valid_metadata, config=config)
 
     # If file name already exists in the storage - do not allow attempt to overwrite it
@@ -74,21 +260,97 @@ async def start_upload(request: web.Request) -> web.Response:
     if not file_name:
         file_name = valid_metadata["filename"].decode()
 
-    # Prepare resource for the upload
+    # Prepare resource for the upload. Resource with deferred length has no size
+    # until client declares it on one of next chunk uploads
     resource = Resource(
         file_name=file_name,
-        file_size=int(request.headers.get(constants.HEADER_UPLOAD_LENGTH) or 0),
+        file_size=get_upload_length(request),
         offset=0,
         metadata_header=metadata_header,
+        processors_state=get_initial_processors_state(config.chunk_processors),
     )
+    match_info = request.match_info
+
+    # Specify resource headers for tus client
+    headers[constants.HEADER_LOCATION] = str(
+        request.url.join(
+            request.app.router[config.resource_tus_resource_name].url_for(
+                **request.match_info, resource_uid=resource.uid
+            )
+        )
+    )
+    headers[constants.HEADER_TUS_TEMP_FILENAME] = resource.uid
+
+    # Ensure resource fits into storage quota of the upload path
+    await reserve_usage(
+        config=config, match_info=match_info, size=resource.file_size or 0
+    )
+
+    # If client declared digest of already stored file - finalize upload without
+    # uploading any bytes
+    object_path = (
+        find_declared_object(
+            config=config,
+            match_info=match_info,
+            metadata=valid_metadata,
+            size=resource.file_size,
+        )
+        if resource.file_size is not None
+        else None
+    )
+    if config.content_store is not None and object_path is not None:
+        assert resource.file_size is not None
+        # Compressed object is keyed with codec suffix, which file gets as well
+        codec = SUFFIX_CODECS.get(object_path.suffix)
+        if codec is not None:
+            file_name += object_path.suffix
+        file_path = get_file_path(
+            config=config, match_info=match_info, file_name=file_name
+        )
+        try:
+            config.content_store.link(
+                object_path, file_path, overwrite=config.allow_overwrite_files
+            )
+        except FileExistsError:
+            adjust_usage(
+                config=config,
+                match_info=match_info,
+                size=-resource.file_size,
+                files=-1,
+            )
+            raise web.HTTPConflict(headers=headers)
+        link_completed_path(
+            config=config, match_info=match_info, uid=resource.uid, file_path=file_path
+        )
+        await on_upload_done(
+            request=request,
+            config=config,
+            resource=attr.evolve(
+                resource,
+                file_name=file_name,
+                offset=resource.file_size,
+                content_digest=object_path.stem,
+                codec=codec,
+                processors_state={},
+            ),
+            file_path=file_path,
+        )
+        headers[constants.HEADER_UPLOAD_OFFSET] = str(resource.file_size)
+        return web.Response(status=201, text="", headers=headers)
 
     # Save resource and its metadata
-    match_info = request.match_info
     try:
-        resource.initial_save(config=config, match_info=match_info)
-        resource.save_metadata(config=config, match_info=match_info)
+        with phase("initial_save"):
+            resource.initial_save(config=config, match_info=match_info)
+            resource.save_metadata(config=config, match_info=match_info)
     # In case if file system is not able to store given files - abort the upload
     except IOError:
+        adjust_usage(
+            config=config,
+            match_info=match_info,
+            size=-resource.reserved_size,
+            files=-1,
+        )
         logger.error(
             "Unable to create file",
             exc_info=True,
@@ -102,23 +364,21 @@ async def start_upload(request: web.Request) -> web.Response:
             text="Unexpected error on uploading file", headers=headers
         )
 
-    # Specify resource headers for tus client
-    headers[constants.HEADER_LOCATION] = str(
-        request.url.join(
-            request.app.router[config.resource_tus_resource_name].url_for(
-                **request.match_info, resource_uid=resource.uid
-            )
-        )
-    )
-    headers[constants.HEADER_TUS_TEMP_FILENAME] = resource.uid
-
     return web.Response(status=201, text="", headers=headers)
 
 
 async def upload_details(request: web.Request) -> web.Response:
-    """Check whether requested filename already started to upload or not."""
-    valid_metadata = validate_upload_metadata(parse_upload_metadata(request.headers))
-    file_name = check_file_name(valid_metadata, config=get_config(request))
+    """Check whether requested filename already started to upload or not.
+
+    When ``Upload-Length`` header is sent as well & upload index is enabled, respond
+    with ``Location``, ``Tus-Temp-Filename`` & ``Upload-Offset`` headers of
+    in-progress upload with same fingerprint, so client is able to resume it.
+    """
+    config = get_config(request)
+    valid_metadata = validate_metadata_header(
+        request.headers.get(constants.HEADER_UPLOAD_METADATA) or "", config=config
+    )
+    file_name = check_file_name(valid_metadata, config=config)
 
     headers: DictStrStr = {}
     if file_name is not None:
@@ -127,6 +387,28 @@ async def upload_details(request: web.Request) -> web.Response:
     else:
         headers[constants.HEADER_TUS_FILE_EXISTS] = "false"
 
+    upload = (
+        await find_fingerprinted_upload(
+            config=config,
+            match_info=request.match_info,
+            metadata=valid_metadata,
+            size=parse_upload_length(request),
+        )
+        if constants.HEADER_UPLOAD_LENGTH in request.headers
+        else None
+    )
+    if upload is not None:
+        uid, offset = upload
+        headers[constants.HEADER_LOCATION] = str(
+            request.url.join(
+                request.app.router[config.resource_tus_resource_name].url_for(
+                    **request.match_info, resource_uid=uid
+                )
+            )
+        )
+        headers[constants.HEADER_TUS_TEMP_FILENAME] = uid
+        headers[constants.HEADER_UPLOAD_OFFSET] = str(offset)
+
     return web.Response(status=200, text="", headers=headers)
 
 
@@ -134,17 +416,35 @@ async def upload_options(request: web.Request) -> web.Response:
     """List tus protocol supported options."""
     if not request.headers.get(constants.HEADER_TUS_RESUMABLE):
         return web.Response(status=200, text="")
+
+    config = get_config(request)
+    extensions = constants.TUS_API_EXTENSIONS
+    headers = {
+        **constants.BASE_HEADERS,
+        constants.HEADER_TUS_MAX_SIZE: str(constants.TUS_MAX_FILE_SIZE),
+    }
+    if config.pipelining_window:
+        extensions += (constants.TUS_API_EXTENSION_PIPELINING,)
+        headers[constants.HEADER_TUS_PIPELINING_WINDOW] = str(config.pipelining_window)
+
     return web.Response(
         status=204,
-        headers={
-            **constants.BASE_HEADERS,
-            constants.HEADER_TUS_EXTENSION: ",".join(constants.TUS_API_EXTENSIONS),
-            constants.HEADER_TUS_MAX_SIZE: str(constants.TUS_MAX_FILE_SIZE),
-        },
+        headers={**headers, constants.HEADER_TUS_EXTENSION: ",".join(extensions)},
     )
 
 
-async def upload_resource(request: web.Request) -> web.Response:
+async def upload_resource(request: web.Request) -> web.StreamResponse:
+    """Upload resource chunk, pipelined one if client requested it."""
+    config = get_config(request)
+    if config.pipelining_window and (
+        request.headers.get(constants.HEADER_UPLOAD_PIPELINING) == "true"
+    ):
+        return await upload_resource_range(request)
+    return await upload_resource_chunk(request)
+
+
+@with_resource_lock
+async def upload_resource_chunk(request: web.Request) -> web.Response:
     """Upload resource chunk.
 
     Read resource metadata and save another chunk to the resource. If this is a final
@@ -158,23 +458,140 @@ async def upload_resource(request: web.Request) -> web.Response:
     if upload_offset != resource.offset:
         raise web.HTTPConflict(headers=constants.BASE_HEADERS)
 
-    # Save current chunk to the resource
     config = get_config(request)
     match_info = request.match_info
-    resource.save(config=config, match_info=match_info, chunk=await request.read())
+
+    # Fix length of resource with deferred length, once client declares it
+    if constants.HEADER_UPLOAD_LENGTH in request.headers:
+        resource = await fix_upload_length(request, config=config, resource=resource)
+
+    # Reject chunk, which does not fit into the resource, before reading it.
+    # Resource with deferred length might grow up to max file size
+    deferred = resource.file_size is None
+    if resource.file_size is None:
+        max_size = constants.TUS_MAX_FILE_SIZE - upload_offset
+    else:
+        max_size = resource.file_size - upload_offset
+    content_length = request.content_length
+    if content_length is not None and content_length > max_size:
+        raise web.HTTPRequestEntityTooLarge(
+            max_size=max_size,
+            actual_size=content_length,
+            headers=constants.BASE_HEADERS,
+        )
+
+    # Appended bytes are reserved in storage usage before writing them: whole chunk
+    # at once, when its length is known, otherwise in steps as slices arrive
+    reserved = 0
+    if deferred and content_length is not None:
+        await reserve_usage(
+            config=config, match_info=match_info, size=content_length, files=0
+        )
+        reserved = content_length
+
+    # Save current chunk to the resource slice by slice, feeding chunk processors
+    # with each slice before and after it has been written to the disk. Offset is
+    # accounted by bytes written, not by ``Content-Length`` header, which is missing
+    # for chunked requests. Resource with deferred length grows by appending slices
+    processors = config.chunk_processors
+    processors_state = resource.processors_state
+    slice_offset = resource.offset
+
+    # Slices are coalesced in write buffer, unless processors need them on the disk
+    flush_slices = any(
+        item.stage == constants.PROCESSOR_STAGE_AFTER_WRITE for item in processors
+    )
+    writer = create_writer(
+        config=config, match_info=match_info, resource=resource, offset=slice_offset
+    )
+    priority = get_io_priority(config=config, resource=resource)
+
+    try:
+        with writer:
+            async for data in iter_request_chunks(request, config=config):
+                appended = slice_offset + len(data) - upload_offset
+                if appended > max_size:
+                    raise web.HTTPRequestEntityTooLarge(
+                        max_size=max_size,
+                        actual_size=appended,
+                        headers=constants.BASE_HEADERS,
+                    )
+                if deferred and content_length is None and appended > reserved:
+                    reserved += await reserve_usage_step(
+                        config=config,
+                        match_info=match_info,
+                        size=appended - reserved,
+                        max_size=max_size - reserved,
+                    )
+
+                processors_state = feed_processors(
+                    processors,
+                    processors_state,
+                    stage=constants.PROCESSOR_STAGE_BEFORE_WRITE,
+                    chunk=data,
+                    offset=slice_offset,
+                )
+                await write_slice(
+                    config=config,
+                    writer=writer,
+                    data=data,
+                    flush=flush_slices,
+                    priority=priority,
+                )
+                hash_chunk(
+                    config=config,
+                    match_info=match_info,
+                    resource=resource,
+                    chunk=data,
+                    offset=slice_offset,
+                )
+                processors_state = feed_processors(
+                    processors,
+                    processors_state,
+                    stage=constants.PROCESSOR_STAGE_AFTER_WRITE,
+                    chunk=data,
+                    offset=slice_offset,
+                )
+                slice_offset += len(data)
+                publish_progress(
+                    config=config,
+                    match_info=match_info,
+                    resource=resource,
+                    offset=slice_offset,
+                )
+
+            await sync_writer(config=config, writer=writer, priority=priority)
+    # Accept partial chunk, when request body is interrupted or is too large, so
+    # client resumes upload exactly where written data ends
+    except BaseException:
+        if writer.offset != resource.offset:
+            attr.evolve(
+                resource.add_range(upload_offset, writer.offset),
+                processors_state=processors_state,
+            ).save_progress(config=config, match_info=match_info)
+        raise
+    # Release bytes, reserved for appending, which have not been written
+    finally:
+        if reserved > writer.offset - upload_offset:
+            adjust_usage(
+                config=config,
+                match_info=match_info,
+                size=writer.offset - upload_offset - reserved,
+                files=0,
+            )
 
     # If this is a final chunk - complete upload
-    chunk_size = int(request.headers.get(constants.HEADER_CONTENT_LENGTH) or 0)
-    next_offset = resource.offset + chunk_size
+    next_resource = attr.evolve(
+        resource.add_range(upload_offset, writer.offset),
+        processors_state=processors_state,
+    )
+    next_offset = next_resource.offset
     if next_offset == resource.file_size:
-        file_path = resource.complete(config=config, match_info=match_info)
-        await on_upload_done(
-            request=request, config=config, resource=resource, file_path=file_path
-        )
-    # But if it is not - store new metadata
+        await complete_upload(request=request, config=config, resource=next_resource)
+    # But if it is not - store new resource offset
     else:
-        next_resource = attr.evolve(resource, offset=next_offset)
-        next_resource.save_metadata(config=config, match_info=match_info)
+        with phase("save_progress"):
+            next_resource.save_progress(config=config, match_info=match_info)
 
     # Return upload headers
     return web.Response(
@@ -185,3 +602,96 @@ async def upload_resource(request: web.Request) -> web.Response:
             constants.HEADER_UPLOAD_OFFSET: str(next_offset),
         },
     )
+
+
+async def upload_resource_range(request: web.Request) -> web.Response:
+    """Upload resource chunk at explicit offset, pipelined with other chunks.
+
+    Chunk might be uploaded out of order within pipelining window beyond current
+    resource offset. Chunks are written concurrently at their offsets, while
+    resource lock is held only on committing uploaded range.
+    """
+    # Ensure resource metadata is readable and resource file exists as well
+    resource = get_resource_or_410(request)
+    config = get_config(request)
+    match_info = request.match_info
+
+    # Pipelined chunk requires explicit length to check its range before reading it
+    content_length = request.content_length
+    if content_length is None:
+        raise web.HTTPLengthRequired(headers=constants.BASE_HEADERS)
+
+    # Ensure chunk range is within pipelining window & is not uploaded yet. Chunks of
+    # resource with deferred length are not pipelined, as its end is not known
+    upload_offset = int(request.headers.get(constants.HEADER_UPLOAD_OFFSET) or 0)
+    upload_end = upload_offset + content_length
+    if (
+        resource.file_size is None
+        or upload_offset < resource.offset
+        or upload_end > resource.file_size
+        or upload_end > resource.offset + config.pipelining_window
+        or resource.ranges.overlaps(upload_offset, upload_end)
+    ):
+        raise web.HTTPConflict(headers=constants.BASE_HEADERS)
+
+    # Range is checked & marked as in-flight without yielding to the event loop, so
+    # concurrent request of overlapping chunk is rejected, before any byte is written
+    prev_resource = next_resource = resource
+    with reserve_range(
+        config=config, match_info=match_info, start=upload_offset, end=upload_end
+    ):
+        writer = create_writer(
+            config=config,
+            match_info=match_info,
+            resource=resource,
+            offset=upload_offset,
+        )
+        priority = get_io_priority(config=config, resource=resource)
+        try:
+            with writer:
+                async for data in iter_request_chunks(request, config=config):
+                    hash_chunk(
+                        config=config,
+                        match_info=match_info,
+                        resource=resource,
+                        chunk=data,
+                        offset=writer.offset + writer.buffered,
+                    )
+                    await write_slice(
+                        config=config,
+                        writer=writer,
+                        data=data,
+                        flush=False,
+                        priority=priority,
+                    )
+
+                await sync_writer(config=config, writer=writer, priority=priority)
+        finally:
+            # Commit uploaded range, even if request body has been interrupted
+            if writer.offset > upload_offset:
+                prev_resource, next_resource = await commit_resource_range(
+                    config=config,
+                    match_info=match_info,
+                    start=upload_offset,
+                    end=writer.offset,
+                )
+
+    # Complete upload by request, which filled last missing range
+    if prev_resource.offset < resource.file_size == next_resource.offset:
+        await complete_upload(request=request, config=config, resource=next_resource)
+    else:
+        publish_progress(
+            config=config,
+            match_info=match_info,
+            resource=next_resource,
+            offset=next_resource.offset,
+        )
+
+    return web.Response(
+        status=204,
+        headers={
+            **constants.BASE_HEADERS,
+            constants.HEADER_TUS_TEMP_FILENAME: resource.uid,
+            constants.HEADER_UPLOAD_OFFSET: str(next_resource.offset),
+        },
+    )
@@ -0,0 +1,78 @@
+import logging
+import multiprocessing
+import os
+import signal
+import sys
+from typing import Any, Callable, List, Optional
+
+from aiohttp import web
+
+
+AppFactory = Callable[[], web.Application]
+
+logger = logging.getLogger(__name__)
+
+
+def run_worker(app_factory: AppFactory, host: str, port: int, kwargs: Any) -> None:
+    web.run_app(app_factory(), host=host, port=port, reuse_port=True, **kwargs)
+
+
+def run_workers(
+    app_factory: AppFactory,
+    *,
+    host: str = "0.0.0.0",
+    port: int = 8080,
+    workers: Optional[int] = None,
+    **kwargs: Any,
+) -> None:
+    """Run aiohttp.web application in multiple worker processes sharing one port.
+
+    Each worker process creates application via ``app_factory`` and listens the same
+    port with ``SO_REUSEPORT`` socket option, so kernel balances incoming
+    connections in between workers. Cross-process safety of tus views is provided
+    by advisory resource locks and atomic completion of uploads.
+
+    .. note::
+        Do not enable ``resource_cache_size`` or ``progress_events`` in
+        ``setup_tus`` for applications, which run in multiple workers, as resource
+        cache and progress events are not shared in between processes.
+
+    :param app_factory:
+        Picklable callable (e.g. module level function), which returns
+        :class:`aiohttp.web.Application` instance.
+    :param host: Host to listen. By default: ``"0.0.0.0"``
+    :param port: Port to listen. By default: ``8080``
+    :param workers: Number of worker processes. By default: number of CPUs.
+    :param \\*\\*kwargs: Other keyword arguments to pass to
+        :func:`aiohttp.web.run_app`.
+    """
+    processes: List[multiprocessing.Process] = [
+        multiprocessing.Process(
+            target=run_worker,
+            args=(app_factory, host, port, kwargs),
+            name=f"aiohttp-tus-worker-{idx}",
+        )
+        for idx in range(workers or os.cpu_count() or 1)
+    ]
+
+    # Stop workers on terminating main process as well
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+
+    for process in processes:
+        process.start()
+    logger.info(
+        "Started aiohttp-tus workers",
+        extra={"host": host, "port": port, "workers": len(processes)},
+    )
+
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for process in processes:
+            if process.is_alive() and process.pid is not None:
+                os.kill(process.pid, signal.SIGINT)
+        for process in processes:
+            process.join()
@@ -0,0 +1,280 @@
+import errno
+import mmap
+import os
+from pathlib import Path
+from types import TracebackType
+from typing import List, Optional, Type, Union
+
+import attr
+
+
+DEFAULT_BUFFER_SIZE = 1048576
+DEFAULT_MMAP_WINDOW_SIZE = 67108864
+
+DURABILITY_NONE = "none"
+DURABILITY_SYNC = "sync"
+DURABILITIES = (DURABILITY_NONE, DURABILITY_SYNC)
+
+WRITE_MODE_FILE = "file"
+WRITE_MODE_MMAP = "mmap"
+WRITE_MODES = (WRITE_MODE_FILE, WRITE_MODE_MMAP)
+
+fdatasync = getattr(os, "fdatasync", os.fsync)
+
+# Errors of ``posix_fallocate`` on file systems, which do not support it
+FALLOCATE_UNSUPPORTED_ERRNOS = (errno.EINVAL, errno.EOPNOTSUPP)
+
+
+@attr.dataclass(slots=True)
+class BufferPool:
+    """Pool of preallocated write buffers, shared in between upload requests.
+
+    :param buffer_size: Size of each buffer in bytes.
+    :param max_buffers: Max number of idle buffers to keep in the pool.
+    """
+
+    buffer_size: int = DEFAULT_BUFFER_SIZE
+    max_buffers: int = 16
+
+    buffers: List[bytearray] = attr.Factory(list)
+
+    def acquire(self) -> bytearray:
+        if self.buffers:
+            return self.buffers.pop()
+        return bytearray(self.buffer_size)
+
+    def release(self, buffer: bytearray) -> None:
+        if len(self.buffers) < self.max_buffers:
+            self.buffers.append(buffer)
+
+
+@attr.dataclass(slots=True)
+class ChunkWriter:
+    """Write request body slices into resource file at given offset.
+
+    Small slices are coalesced into pooled buffer and written with single
+    :func:`os.pwrite` call on raw file descriptor, once buffer is full. Slices
+    larger than buffer are written directly without copying. Use writer as context
+    manager, which flushes buffered data & releases the buffer on exit, even if
+    request body has been interrupted.
+
+    With ``sync`` durability written data is also flushed to the disk with
+    ``fdatasync`` on exit.
+    """
+
+    path: Path
+    offset: int
+    pool: BufferPool
+    durability: str = DURABILITY_NONE
+
+    fd: int = -1
+    buffer: Optional[bytearray] = None
+    view: Optional[memoryview] = None
+    filled: int = 0
+    dirty: bool = False
+
+    def __enter__(self) -> "ChunkWriter":
+        self.fd = os.open(self.path, os.O_WRONLY)
+        self.buffer = self.pool.acquire()
+        self.view = memoryview(self.buffer)
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        try:
+            self.sync()
+        finally:
+            os.close(self.fd)
+            assert self.view is not None and self.buffer is not None
+            self.view.release()
+            self.pool.release(self.buffer)
+            self.buffer = self.view = None
+
+    @property
+    def buffered(self) -> int:
+        """Number of bytes, which are not written to the file yet."""
+        return self.filled
+
+    def flush(self) -> int:
+        """Write buffered data to the file. Return number of bytes written."""
+        if not self.filled:
+            return 0
+        assert self.view is not None
+
+        written = self.write_all(self.view[: self.filled])
+        self.filled = 0
+        return written
+
+    def needs_flush(self, size: int) -> bool:
+        """Whether writing slice of given size writes to the file."""
+        assert self.view is not None
+        return self.filled + size > len(self.view)
+
+    def sync(self) -> None:
+        """Write buffered data & with ``sync`` durability flush it to the disk."""
+        self.flush()
+        if self.durability == DURABILITY_SYNC and self.dirty:
+            fdatasync(self.fd)
+        self.dirty = False
+
+    def write(self, data: bytes) -> None:
+        """Write slice after all previously written ones."""
+        assert self.view is not None
+        size = len(data)
+
+        if self.filled + size > len(self.view):
+            self.flush()
+            if size >= len(self.view):
+                self.write_all(data)
+                return
+
+        self.view[self.filled : self.filled + size] = data  # noqa: E203
+        self.filled += size
+
+    def write_all(self, data: Union[bytes, memoryview]) -> int:
+        view = memoryview(data)
+        total = 0
+        try:
+            while total < len(view):
+                total += os.pwrite(self.fd, view[total:], self.offset + total)
+        finally:
+            view.release()
+        self.offset += total
+        self.dirty = True
+        return total
+
+
+@attr.dataclass(slots=True)
+class MmapChunkWriter:
+    """Copy request body slices straight into memory mapped resource file.
+
+    Resource file is allocated with its full size on starting the upload, so it is
+    mapped once per window instead of writing each slice with separate syscall. To
+    keep address space usage bounded for very large files, only ``window_size``
+    bytes are mapped at once & mapping moves forward as chunk is written. Mapped
+    window is advised for sequential access.
+
+    Pages are written back to the file by the kernel, so ``msync`` is called only
+    with ``sync`` durability, before unmapping each window.
+
+    Resource file is sparse, so storing into page, which has no disk block yet, on
+    full disk would kill the process with ``SIGBUS`` instead of raising an error.
+    Therefore each window is allocated on disk with ``posix_fallocate`` before
+    mapping it, which raises :class:`OSError` with ``ENOSPC`` errno, when disk is
+    full.
+    """
+
+    path: Path
+    offset: int
+    window_size: int = DEFAULT_MMAP_WINDOW_SIZE
+    durability: str = DURABILITY_NONE
+
+    fd: int = -1
+    size: int = 0
+    mapping: Optional[mmap.mmap] = None
+    window_start: int = 0
+
+    def __enter__(self) -> "MmapChunkWriter":
+        self.fd = os.open(self.path, os.O_RDWR)
+        self.size = os.fstat(self.fd).st_size
+        return self
+
+    def __exit__(
+        self,
+        exc_type: Optional[Type[BaseException]],
+        exc_value: Optional[BaseException],
+        traceback: Optional[TracebackType],
+    ) -> None:
+        try:
+            self.unmap()
+        finally:
+            os.close(self.fd)
+
+    @property
+    def buffered(self) -> int:
+        """Slices are copied to the mapping on writing, so nothing is buffered."""
+        return 0
+
+    @property
+    def window_end(self) -> int:
+        if self.mapping is None:
+            return self.window_start
+        return self.window_start + len(self.mapping)
+
+    def flush(self) -> int:
+        """Data in the mapping is already visible to file readers, so no-op."""
+        return 0
+
+    def needs_flush(self, size: int) -> bool:
+        """Whether writing slice of given size (re)maps window of the file."""
+        return self.mapping is None or self.offset + size > self.window_end
+
+    def map(self) -> mmap.mmap:
+        """Map window, which starts at current offset."""
+        self.unmap()
+
+        # Mapping offset should be aligned to allocation granularity
+        start = self.offset - self.offset % mmap.ALLOCATIONGRANULARITY
+        length = min(self.offset - start + self.window_size, self.size - start)
+        allocate(self.fd, self.offset, start + length - self.offset)
+        mapping = mmap.mmap(self.fd, length, access=mmap.ACCESS_WRITE, offset=start)
+        if hasattr(mmap, "MADV_SEQUENTIAL"):
+            mapping.madvise(mmap.MADV_SEQUENTIAL)
+
+        self.mapping = mapping
+        self.window_start = start
+        return mapping
+
+    def sync(self) -> None:
+        """Unmap current window, which with ``sync`` durability flushes it."""
+        self.unmap()
+
+    def unmap(self) -> None:
+        if self.mapping is None:
+            return
+        try:
+            if self.durability == DURABILITY_SYNC:
+                self.mapping.flush()
+        finally:
+            self.mapping.close()
+            self.mapping = None
+
+    def write(self, data: bytes) -> None:
+        """Write slice after all previously written ones."""
+        if self.offset + len(data) > self.size:
+            raise ValueError("Unable to write beyond the end of resource file")
+
+        view = memoryview(data)
+        try:
+            written = 0
+            while written < len(view):
+                mapping = self.mapping
+                if mapping is None or self.offset >= self.window_end:
+                    mapping = self.map()
+
+                start = self.offset - self.window_start
+                size = min(len(view) - written, len(mapping) - start)
+                chunk = view[written : written + size]  # noqa: E203
+                mapping[start : start + size] = chunk  # noqa: E203
+                written += size
+                self.offset += size
+        finally:
+            view.release()
+
+
+Writer = Union[ChunkWriter, MmapChunkWriter]
+
+
+def allocate(fd: int, offset: int, length: int) -> None:
+    """Allocate disk blocks for given range of the file, when supported."""
+    if length <= 0 or not hasattr(os, "posix_fallocate"):
+        return
+    try:
+        os.posix_fallocate(fd, offset, length)
+    except OSError as err:
+        if err.errno not in FALLOCATE_UNSUPPORTED_ERRNOS:
+            raise
@@ -0,0 +1,111 @@
+"""Compare CPU cost of at-rest compression against disk bytes saved.
+
+Generates log-like & CSV-like files, compresses them with every supported codec &
+level in process pool (as :class:`aiohttp_tus.compression.Compressor` does) and
+prints compression time, CPU time and compression ratio.
+"""
+import argparse
+import asyncio
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from aiohttp_tus.compression import CODECS, Compressor
+
+
+LOG_LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR")
+
+
+def generate_csv(path: Path, size: int) -> None:
+    rnd = random.Random(42)
+    with open(path, "w") as handler:
+        handler.write("id,user_id,amount,currency,created_at\n")
+        idx = 0
+        while handler.tell() < size:
+            idx += 1
+            handler.write(
+                f"{idx},{rnd.randint(1, 10000)},{rnd.random() * 1000:.2f},"
+                f"{rnd.choice(('EUR', 'USD', 'UAH'))},2020-06-{rnd.randint(1, 30):02}\n"
+            )
+
+
+def generate_log(path: Path, size: int) -> None:
+    rnd = random.Random(42)
+    with open(path, "w") as handler:
+        while handler.tell() < size:
+            handler.write(
+                f"2020-06-08 12:{rnd.randint(0, 59):02}:{rnd.randint(0, 59):02} "
+                f"{rnd.choice(LOG_LEVELS)} aiohttp.access 127.0.0.1 "
+                f'"PATCH /uploads/{rnd.getrandbits(64):x} HTTP/1.1" 204 0\n'
+            )
+
+
+GENERATORS: Dict[str, Callable[[Path, int], None]] = {
+    "csv": generate_csv,
+    "log": generate_log,
+}
+
+
+def get_children_cpu_time() -> float:
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+async def run(size: int, levels: List[int]) -> None:
+    print(
+        f"{'data':<6}{'codec':<8}{'level':>6}{'wall, s':>10}{'cpu, s':>10}"
+        f"{'MB/s':>10}{'ratio':>8}{'saved, MB':>12}"
+    )
+
+    with tempfile.TemporaryDirectory(prefix="aiohttp_tus") as temp_path:
+        for data, generator in GENERATORS.items():
+            source_path = Path(temp_path) / data
+            generator(source_path, size)
+
+            for codec in CODECS:
+                for level in levels:
+                    path = source_path.with_name(f"{data}-{codec}-{level}")
+                    path.write_bytes(source_path.read_bytes())
+
+                    # Use separate process pool for each run, so children CPU time
+                    # counted after pool shutdown
+                    compressor = Compressor(levels={codec: level}, max_workers=1)
+                    cpu_time = get_children_cpu_time()
+                    started_at = time.monotonic()
+                    compressed_path = await compressor.compress(path, codec)
+                    wall_time = time.monotonic() - started_at
+                    compressor.shutdown()
+                    cpu_time = get_children_cpu_time() - cpu_time
+
+                    compressed_size = os.path.getsize(compressed_path)
+                    print(
+                        f"{data:<6}{codec:<8}{level:>6}{wall_time:>10.3f}"
+                        f"{cpu_time:>10.3f}{size / wall_time / 1e6:>10.1f}"
+                        f"{size / compressed_size:>8.1f}"
+                        f"{(size - compressed_size) / 1e6:>12.1f}"
+                    )
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument(
+        "--size", default=64, type=int, help="Size of generated files in MB"
+    )
+    parser.add_argument(
+        "--levels", default="1,3,6,9", help="Comma separated compression levels"
+    )
+    args = parser.parse_args(argv)
+
+    asyncio.run(
+        run(args.size * 1_000_000, [int(item) for item in args.levels.split(",")])
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,104 @@
+"""Measure tus upload throughput of asyncio tus client against local server.
+
+Starts application via :func:`aiohttp_tus.workers.run_workers` & uploads files of
+given size via :class:`aiohttp_tus.client.TusClient`, for each number of chunks
+of one file uploaded at once (pipelined chunks) and prints throughput.
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import shutil
+import signal
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+from aiohttp import web
+
+from aiohttp_tus import setup_tus
+from aiohttp_tus.client import TusClient
+from aiohttp_tus.workers import run_workers
+from benchmarks.workers import HOST, wait_for_port
+
+
+UPLOAD_PATH = Path(tempfile.gettempdir()) / "aiohttp-tus-benchmark-uploads"
+PIPELINING_WINDOW = 268435456
+
+
+def create_app() -> web.Application:
+    return setup_tus(
+        web.Application(),
+        upload_path=UPLOAD_PATH,
+        allow_overwrite_files=True,
+        pipelining_window=PIPELINING_WINDOW,
+    )
+
+
+async def load(
+    port: int, paths: List[Path], *, chunk_size: int, parallel_chunks: int, files: int
+) -> float:
+    url = f"http://{HOST}:{port}/uploads"
+    async with TusClient(
+        chunk_size=chunk_size, parallel_chunks=parallel_chunks, concurrency=files
+    ) as client:
+        started_at = time.monotonic()
+        uploads = await client.upload_many(url, paths)
+        elapsed = time.monotonic() - started_at
+    return sum(item.file_size for item in uploads) / elapsed / 1048576
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--size", default=64, type=int, help="File size in MiB")
+    parser.add_argument("--files", default=4, type=int)
+    parser.add_argument("--chunk-size", default=4096, type=int, help="In KiB")
+    parser.add_argument("--parallel-chunks", default="1,2,4,8")
+    parser.add_argument("--workers", default=os.cpu_count() or 1, type=int)
+    parser.add_argument("--port", default=8302, type=int)
+    args = parser.parse_args(argv)
+
+    UPLOAD_PATH.mkdir(exist_ok=True)
+    source_path = Path(tempfile.mkdtemp())
+    paths = [source_path / f"{idx:04}.bin" for idx in range(args.files)]
+    for path in paths:
+        path.write_bytes(os.urandom(args.size * 1048576))
+
+    server = multiprocessing.Process(
+        target=run_workers,
+        args=(create_app,),
+        kwargs={
+            "host": HOST,
+            "port": args.port,
+            "workers": args.workers,
+            "print": None,
+        },
+    )
+    server.start()
+    try:
+        asyncio.run(wait_for_port(args.port))
+        print(f"{'parallel chunks':>16}{'MiB/s':>10}")
+        for parallel_chunks in map(int, args.parallel_chunks.split(",")):
+            throughput = asyncio.run(
+                load(
+                    args.port,
+                    paths,
+                    chunk_size=args.chunk_size * 1024,
+                    parallel_chunks=parallel_chunks,
+                    files=args.files,
+                )
+            )
+            print(f"{parallel_chunks:>16}{throughput:>10.1f}")
+    finally:
+        if server.pid is not None:
+            os.kill(server.pid, signal.SIGTERM)
+        server.join()
+        shutil.rmtree(UPLOAD_PATH, ignore_errors=True)
+        shutil.rmtree(source_path, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
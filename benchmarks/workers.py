@@ -0,0 +1,138 @@
+"""Measure tus upload throughput for increasing number of worker processes.
+
+Starts application via :func:`aiohttp_tus.workers.run_workers` with 1..N workers
+and uploads many small files in small chunks concurrently, which stresses request
+parsing & resource metadata handling rather than disk or network.
+"""
+import argparse
+import asyncio
+import base64
+import multiprocessing
+import os
+import shutil
+import signal
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+import aiohttp
+from aiohttp import web
+
+from aiohttp_tus import setup_tus
+from aiohttp_tus.workers import run_workers
+
+
+HOST = "127.0.0.1"
+UPLOAD_PATH = Path(tempfile.gettempdir()) / "aiohttp-tus-benchmark-workers"
+
+
+def create_app() -> web.Application:
+    return setup_tus(
+        web.Application(), upload_path=UPLOAD_PATH, allow_overwrite_files=True
+    )
+
+
+async def upload(
+    session: aiohttp.ClientSession, url: str, file_name: str, *, chunks: int
+) -> int:
+    chunk = b"x" * 1024
+    encoded_file_name = base64.b64encode(file_name.encode()).decode()
+    async with session.post(
+        url,
+        headers={
+            "Tus-Resumable": "1.0.0",
+            "Upload-Length": str(len(chunk) * chunks),
+            "Upload-Metadata": f"filename {encoded_file_name}",
+        },
+    ) as response:
+        location = response.headers["Location"]
+
+    for offset in range(0, len(chunk) * chunks, len(chunk)):
+        async with session.patch(
+            location,
+            data=chunk,
+            headers={
+                "Tus-Resumable": "1.0.0",
+                "Upload-Offset": str(offset),
+                "Content-Type": "application/offset+octet-stream",
+            },
+        ) as response:
+            assert response.status == 204, response.status
+
+    return chunks + 1
+
+
+async def wait_for_port(port: int) -> None:
+    for _ in range(100):
+        try:
+            _, writer = await asyncio.open_connection(HOST, port)
+        except OSError:
+            await asyncio.sleep(0.1)
+        else:
+            writer.close()
+            return
+    raise RuntimeError(f"Unable to connect to {HOST}:{port}")
+
+
+async def load(port: int, *, files: int, chunks: int, concurrency: int) -> float:
+    url = f"http://{HOST}:{port}/uploads"
+    semaphore = asyncio.Semaphore(concurrency)
+    connector = aiohttp.TCPConnector(limit=concurrency, force_close=True)
+
+    async with aiohttp.ClientSession(connector=connector) as session:
+
+        async def limited_upload(idx: int) -> int:
+            async with semaphore:
+                return await upload(session, url, f"{idx:08}.bin", chunks=chunks)
+
+        started_at = time.monotonic()
+        requests = sum(
+            await asyncio.gather(*(limited_upload(idx) for idx in range(files)))
+        )
+        return requests / (time.monotonic() - started_at)
+
+
+def run(workers: int, port: int, args: argparse.Namespace) -> float:
+    UPLOAD_PATH.mkdir(exist_ok=True)
+    server = multiprocessing.Process(
+        target=run_workers,
+        args=(create_app,),
+        kwargs={"host": HOST, "port": port, "workers": workers, "print": None},
+    )
+    server.start()
+    try:
+        asyncio.run(wait_for_port(port))
+        return asyncio.run(
+            load(
+                port, files=args.files, chunks=args.chunks, concurrency=args.concurrency
+            )
+        )
+    finally:
+        if server.pid is not None:
+            os.kill(server.pid, signal.SIGTERM)
+        server.join()
+        shutil.rmtree(UPLOAD_PATH, ignore_errors=True)
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--max-workers", default=os.cpu_count() or 1, type=int)
+    parser.add_argument("--files", default=200, type=int)
+    parser.add_argument("--chunks", default=20, type=int)
+    parser.add_argument("--concurrency", default=64, type=int)
+    parser.add_argument("--port", default=8301, type=int)
+    args = parser.parse_args(argv)
+
+    print(f"{'workers':>8}{'requests/s':>12}{'scaling':>10}")
+    baseline = None
+    for workers in range(1, args.max_workers + 1):
+        rps = run(workers, args.port, args)
+        baseline = baseline or rps
+        print(f"{workers:>8}{rps:>12.0f}{rps / baseline:>10.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
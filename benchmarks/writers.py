@@ -0,0 +1,190 @@
+"""Compare writing request body slices via pooled buffers or mmap & file writes.
+
+Writes the same file from slices of given size either by opening resource file,
+seeking & writing each slice (as :meth:`aiohttp_tus.data.Resource.save` does), via
+:class:`aiohttp_tus.writers.ChunkWriter` or via
+:class:`aiohttp_tus.writers.MmapChunkWriter` and prints throughput, number of write
+calls (or mapped windows) and number & size of allocations per written MB.
+
+Slices are generated before writing, so throughput is not skewed by generating
+random bytes. Throughput is measured without tracing allocations, while
+allocations are traced in separate pass of the same writes.
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Tuple
+
+from aiohttp_tus.writers import (
+    BufferPool,
+    ChunkWriter,
+    DURABILITIES,
+    DURABILITY_NONE,
+    MmapChunkWriter,
+)
+
+
+def generate_slices(size: int, slice_size: int) -> List[bytes]:
+    # Emulate aiohttp stream reader, which yields new bytes object for each slice
+    return [
+        os.urandom(min(slice_size, size - offset))
+        for offset in range(0, size, slice_size)
+    ]
+
+
+def iter_traced(slices: Iterable[bytes], allocated: List[int]) -> Iterator[bytes]:
+    """Yield slices & record peak of bytes, allocated on writing each of them."""
+    for data in slices:
+        baseline = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+        yield data
+        allocated.append(tracemalloc.get_traced_memory()[1] - baseline)
+
+
+def write_file(path: Path, slices: Iterable[bytes]) -> int:
+    calls = 0
+    offset = 0
+    for data in slices:
+        with open(path, "r+b") as handler:
+            handler.seek(offset)
+            offset += handler.write(data)
+        calls += 1
+    return calls
+
+
+def write_mmap(
+    path: Path, slices: Iterable[bytes], window_size: int, durability: str
+) -> int:
+    windows = 0
+    with MmapChunkWriter(
+        path=path, offset=0, window_size=window_size, durability=durability
+    ) as writer:
+        for data in slices:
+            mapped_at = writer.window_start
+            writer.write(data)
+            windows += writer.window_start != mapped_at or windows == 0
+    return windows
+
+
+def write_pooled(
+    path: Path, slices: Iterable[bytes], pool: BufferPool, durability: str
+) -> int:
+    calls = 0
+    with ChunkWriter(path=path, offset=0, pool=pool, durability=durability) as writer:
+        for data in slices:
+            flushed_at = writer.offset
+            writer.write(data)
+            calls += writer.offset != flushed_at
+    return calls + 1
+
+
+def measure(
+    path: Path,
+    size: int,
+    slices: List[bytes],
+    callback: Callable[[Iterable[bytes]], int],
+) -> Tuple[float, int, float, float]:
+    """Return wall time, number of writes, allocations & allocated KB per MB."""
+    path.write_bytes(b"")
+    os.truncate(path, size)
+    started_at = time.monotonic()
+    calls = callback(slices)
+    wall_time = time.monotonic() - started_at
+
+    # Peak of tracing itself, recorded for slices, which are not written at all
+    overhead: List[int] = []
+    tracemalloc.start()
+    try:
+        for _ in iter_traced(slices[:16], overhead):
+            pass
+        allocated: List[int] = []
+        path.write_bytes(b"")
+        os.truncate(path, size)
+        callback(iter_traced(slices, allocated))
+    finally:
+        tracemalloc.stop()
+
+    # Only allocations of at least 1 KB (buffers, file objects & mapped windows) are
+    # counted, while objects like ints of offsets & counters are counted by size only
+    threshold = max(overhead)
+    megabytes = size / 1e6
+    return (
+        wall_time,
+        calls,
+        sum(item > threshold + 1024 for item in allocated) / megabytes,
+        sum(item - threshold for item in allocated if item > threshold)
+        / 1024
+        / megabytes,
+    )
+
+
+def run(
+    size: int,
+    slice_sizes: List[int],
+    buffer_size: int,
+    window_size: int,
+    durability: str,
+) -> None:
+    print(
+        f"{'mode':<8}{'slice, KB':>10}{'wall, s':>10}{'MB/s':>10}"
+        f"{'writes':>10}{'allocs/MB':>11}{'KB/MB':>10}"
+    )
+
+    pool = BufferPool(buffer_size=buffer_size)
+    with tempfile.TemporaryDirectory(prefix="aiohttp_tus") as temp_path:
+        path = Path(temp_path) / "resource"
+        for slice_size in slice_sizes:
+            slices = generate_slices(size, slice_size)
+            callbacks: List[Tuple[str, Callable[[Iterable[bytes]], int]]] = [
+                ("file", lambda items: write_file(path, items)),
+                ("pooled", lambda items: write_pooled(path, items, pool, durability)),
+                (
+                    "mmap",
+                    lambda items: write_mmap(path, items, window_size, durability),
+                ),
+            ]
+            for mode, callback in callbacks:
+                wall_time, calls, allocations, allocated = measure(
+                    path, size, slices, callback
+                )
+                print(
+                    f"{mode:<8}{slice_size // 1024:>10}{wall_time:>10.3f}"
+                    f"{size / wall_time / 1e6:>10.1f}{calls:>10}"
+                    f"{allocations:>11.1f}{allocated:>10.1f}"
+                )
+            del slices
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--size", default=256, type=int, help="Size of file in MB")
+    parser.add_argument(
+        "--slices", default="16,64,256,1024", help="Comma separated slice sizes in KB"
+    )
+    parser.add_argument(
+        "--buffer-size", default=1024, type=int, help="Size of pooled buffer in KB"
+    )
+    parser.add_argument(
+        "--window-size", default=64, type=int, help="Size of mmap window in MB"
+    )
+    parser.add_argument(
+        "--durability", choices=DURABILITIES, default=DURABILITY_NONE
+    )
+    args = parser.parse_args(argv)
+
+    run(
+        args.size * 1_000_000,
+        [int(item) * 1024 for item in args.slices.split(",")],
+        args.buffer_size * 1024,
+        args.window_size * 2 ** 20,
+        args.durability,
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
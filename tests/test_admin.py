@@ -0,0 +1,159 @@
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestClient
+
+from aiohttp_tus import setup_tus
+from aiohttp_tus.admin import create_admin_app
+from aiohttp_tus.constants import APP_TUS_CONFIG_KEY
+from aiohttp_tus.data import get_resource_lock_path
+from aiohttp_tus.locks import lock_path
+from tests.common import TEST_UPLOAD_METADATA_HEADER, TEST_UPLOAD_URL
+
+
+ADMIN_URL = "/tus-admin"
+
+
+@pytest.fixture
+def admin_test_client(aiohttp_client, tmp_path):
+    async def factory(*, upload_index: bool = True) -> TestClient:
+        app = setup_tus(
+            web.Application(),
+            upload_path=tmp_path,
+            upload_url=TEST_UPLOAD_URL,
+            upload_index=upload_index,
+        )
+        app.add_subapp(ADMIN_URL, create_admin_app(upload_url=TEST_UPLOAD_URL))
+        return await aiohttp_client(app)
+
+    return factory
+
+
+async def start_upload(client: TestClient, file_size: int) -> str:
+    response = await client.post(
+        TEST_UPLOAD_URL,
+        headers={
+            "Tus-Resumable": "1.0.0",
+            "Upload-Length": str(file_size),
+            "Upload-Metadata": TEST_UPLOAD_METADATA_HEADER,
+        },
+    )
+    assert response.status == 201
+    return response.headers["Tus-Temp-Filename"]
+
+
+async def test_delete_uploads(admin_test_client, tmp_path):
+    client = await admin_test_client()
+    uids = [await start_upload(client, file_size) for file_size in (10, 20, 30)]
+
+    response = await client.post(
+        f"{ADMIN_URL}/uploads/delete", json={"filter": {"min_size": 15}}
+    )
+    assert response.status == 200
+    assert await response.json() == {"deleted": 2, "skipped": []}
+
+    response = await client.get(f"{ADMIN_URL}/uploads")
+    data = await response.json()
+    assert [item["uid"] for item in data["uploads"]] == [uids[0]]
+    assert not (tmp_path / ".metadata" / f"{uids[1]}.json").exists()
+    assert not (tmp_path / ".resources" / uids[2]).exists()
+
+
+async def test_delete_uploads_skip_locked(admin_test_client, tmp_path):
+    client = await admin_test_client()
+    uids = [await start_upload(client, file_size) for file_size in (10, 20)]
+
+    config = client.app[APP_TUS_CONFIG_KEY][TEST_UPLOAD_URL]
+    with lock_path(get_resource_lock_path(config=config, match_info={}, uid=uids[0])):
+        response = await client.post(
+            f"{ADMIN_URL}/uploads/delete", json={"uids": uids}
+        )
+    assert await response.json() == {"deleted": 1, "skipped": [uids[0]]}
+    assert (tmp_path / ".metadata" / f"{uids[0]}.json").exists()
+
+
+async def test_list_uploads(admin_test_client):
+    client = await admin_test_client()
+    uids = [await start_upload(client, file_size) for file_size in (10, 20, 30)]
+
+    response = await client.get(f"{ADMIN_URL}/uploads", params={"limit": "2"})
+    assert response.status == 200
+    data = await response.json()
+    assert data["total"] == 3
+    assert [item["uid"] for item in data["uploads"]] == uids[:2]
+    assert data["uploads"][0]["file_size"] == 10
+    assert data["uploads"][0]["offset"] == 0
+    assert data["next"] is not None
+
+    response = await client.get(
+        f"{ADMIN_URL}/uploads", params={"limit": "2", "after": data["next"]}
+    )
+    data = await response.json()
+    assert [item["uid"] for item in data["uploads"]] == uids[2:]
+    assert data["next"] is None
+
+    response = await client.get(
+        f"{ADMIN_URL}/uploads", params={"max_size": "15", "file_name": "*.txt"}
+    )
+    data = await response.json()
+    assert data["total"] == 1
+
+
+async def test_list_uploads_index_disabled(admin_test_client):
+    client = await admin_test_client(upload_index=False)
+    response = await client.get(f"{ADMIN_URL}/uploads")
+    assert response.status == 501
+
+
+async def test_list_uploads_invalid_params(admin_test_client):
+    client = await admin_test_client()
+    response = await client.get(f"{ADMIN_URL}/uploads", params={"limit": "many"})
+    assert response.status == 400
+
+
+@pytest.mark.parametrize(
+    "uids", (["../../hello.txt"], [".metadata/index.sqlite3"], ["not-an-uid"])
+)
+async def test_delete_uploads_invalid_uids(admin_test_client, tmp_path, uids):
+    client = await admin_test_client()
+    (tmp_path / "hello.txt").write_text("Hello, world!")
+
+    response = await client.post(f"{ADMIN_URL}/uploads/delete", json={"uids": uids})
+    assert response.status == 400
+    assert (tmp_path / "hello.txt").exists()
+
+
+async def test_delete_uploads_missing(admin_test_client):
+    client = await admin_test_client()
+    uid = await start_upload(client, 10)
+
+    response = await client.post(
+        f"{ADMIN_URL}/uploads/delete",
+        json={"uids": [uid, "8f7b5a52-6d4a-4bd1-9a3f-1b2c3d4e5f60"]},
+    )
+    assert await response.json() == {"deleted": 1, "skipped": []}
+
+
+@pytest.mark.parametrize(
+    "params, expected",
+    (
+        ({}, 400),
+        ({"username": ".."}, 400),
+        ({"username": "alice/../.."}, 400),
+        ({"username": "bob"}, 404),
+        ({"username": "alice"}, 200),
+    ),
+)
+async def test_list_uploads_templated(aiohttp_client, tmp_path, params, expected):
+    app = setup_tus(
+        web.Application(),
+        upload_path=tmp_path / "{username}",
+        upload_url="/users/{username}/uploads",
+        upload_index=True,
+    )
+    app.add_subapp(ADMIN_URL, create_admin_app(upload_url="/users/{username}/uploads"))
+    client = await aiohttp_client(app)
+    (tmp_path / "alice").mkdir()
+
+    response = await client.get(f"{ADMIN_URL}/uploads", params=params)
+    assert response.status == expected
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["alice"]
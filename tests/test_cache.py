@@ -0,0 +1,38 @@
+import time
+
+from aiohttp_tus.cache import CacheStats, ResourceCache
+from aiohttp_tus.data import Resource
+
+
+def create_resource(offset: int = 0) -> Resource:
+    return Resource(
+        file_name="hello.txt", file_size=10, offset=offset, metadata_header=""
+    )
+
+
+def test_resource_cache():
+    cache = ResourceCache(maxsize=2)
+    first, second, third = (create_resource() for _ in range(3))
+
+    cache.set(("/uploads", first.uid), first)
+    cache.set(("/uploads", second.uid), second)
+    assert cache.get(("/uploads", first.uid)) is first
+
+    cache.set(("/uploads", third.uid), third)
+    assert cache.get(("/uploads", second.uid)) is None
+    assert cache.get(("/uploads", first.uid)) is first
+
+    cache.delete(("/uploads", first.uid))
+    assert cache.get(("/uploads", first.uid)) is None
+
+    assert cache.stats == CacheStats(size=1, hits=2, misses=2, evictions=1)
+
+
+def test_resource_cache_ttl():
+    cache = ResourceCache(ttl=0)
+    resource = create_resource()
+
+    cache.set(("/uploads", resource.uid), resource)
+    time.sleep(0.001)
+    assert cache.get(("/uploads", resource.uid)) is None
+    assert cache.stats == CacheStats(size=0, hits=0, misses=1, evictions=1)
@@ -0,0 +1,169 @@
+import gzip
+
+import pytest
+from aiohttp import web
+
+from aiohttp_tus import setup_tus
+from aiohttp_tus.checks import FileCheck, parse_checks
+from aiohttp_tus.metadata import format_upload_metadata
+from tests.common import TEST_UPLOAD_METADATA_HEADER, TEST_UPLOAD_URL
+
+
+BATCH_CHECK_URL = f"{TEST_UPLOAD_URL}/_batch/check"
+
+
+@pytest.mark.parametrize(
+    "data",
+    (
+        {"hello.txt": 1},
+        ["../hello.txt"],
+        ["nested/hello.txt"],
+        [".metadata"],
+        [""],
+        [{"name": "hello.txt", "size": -1}],
+        [{"name": "hello.txt", "size": "13"}],
+        [{"name": "hello.txt", "digest": 1}],
+        ["hello.txt"] * 1001,
+    ),
+)
+def test_parse_checks_invalid(data):
+    with pytest.raises(ValueError):
+        parse_checks(data)
+
+
+def test_parse_checks():
+    assert parse_checks(["hello.txt", {"name": "world.txt", "size": 5}]) == [
+        FileCheck(name="hello.txt"),
+        FileCheck(name="world.txt", size=5),
+    ]
+
+
+@pytest.mark.parametrize("upload_index", (False, True))
+async def test_check_files(aiohttp_client, tmp_path, upload_index):
+    client = await aiohttp_client(
+        setup_tus(
+            web.Application(),
+            upload_path=tmp_path,
+            upload_url=TEST_UPLOAD_URL,
+            upload_index=upload_index,
+            batch_checks=True,
+        )
+    )
+
+    (tmp_path / "world.txt").write_text("Hello, world!")
+    response = await client.post(
+        TEST_UPLOAD_URL,
+        headers={
+            "Tus-Resumable": "1.0.0",
+            "Upload-Length": "13",
+            "Upload-Metadata": TEST_UPLOAD_METADATA_HEADER,
+        },
+    )
+    assert response.status == 201
+    uid = response.headers["Tus-Temp-Filename"]
+
+    response = await client.post(
+        BATCH_CHECK_URL,
+        json={
+            "files": [
+                "hello.txt",
+                {"name": "world.txt", "size": 13},
+                {"name": "world.txt", "size": 5},
+                "missing.txt",
+            ]
+        },
+    )
+    assert response.status == 200
+    assert (await response.json())["files"] == [
+        {
+            "name": "hello.txt",
+            "exists": False,
+            "size": None,
+            "matches": None,
+            # In-progress uploads are not looked up without upload index
+            "uid": uid if upload_index else None,
+            "offset": 0 if upload_index else None,
+        },
+        {
+            "name": "world.txt",
+            "exists": True,
+            "size": 13,
+            "matches": True,
+            "uid": None,
+            "offset": None,
+        },
+        {
+            "name": "world.txt",
+            "exists": True,
+            "size": 13,
+            "matches": False,
+            "uid": None,
+            "offset": None,
+        },
+        {
+            "name": "missing.txt",
+            "exists": False,
+            "size": None,
+            "matches": None,
+            "uid": None,
+            "offset": None,
+        },
+    ]
+
+
+async def test_check_files_compressed(aiohttp_client, tmp_path):
+    client = await aiohttp_client(
+        setup_tus(
+            web.Application(),
+            upload_path=tmp_path,
+            upload_url=TEST_UPLOAD_URL,
+            batch_checks=True,
+        )
+    )
+    (tmp_path / "data.csv.gz").write_bytes(gzip.compress(b"a,b\n1,2\n"))
+
+    # File, compressed at rest, exists for GET request as well as for batch check
+    response = await client.get(
+        TEST_UPLOAD_URL,
+        headers={
+            "Tus-Resumable": "1.0.0",
+            "Upload-Metadata": format_upload_metadata({"filename": b"data.csv"}),
+        },
+    )
+    assert response.headers["Tus-File-Exists"] == "true"
+
+    response = await client.post(
+        BATCH_CHECK_URL,
+        json={"files": [{"name": "data.csv", "size": 8}, "data.txt", "other.csv"]},
+    )
+    assert response.status == 200
+    assert [
+        (item["exists"], item["matches"]) for item in (await response.json())["files"]
+    ] == [(True, None), (True, None), (False, None)]
+
+
+@pytest.mark.parametrize("data", ({}, {"files": ["../hello.txt"]}))
+async def test_check_files_invalid(aiohttp_client, tmp_path, data):
+    client = await aiohttp_client(
+        setup_tus(
+            web.Application(),
+            upload_path=tmp_path,
+            upload_url=TEST_UPLOAD_URL,
+            batch_checks=True,
+        )
+    )
+    response = await client.post(BATCH_CHECK_URL, json=data)
+    assert response.status == 400
+
+
+async def test_check_files_disabled(aiohttp_client, tmp_path):
+    client = await aiohttp_client(
+        setup_tus(
+            web.Application(),
+            upload_path=tmp_path,
+            upload_url=TEST_UPLOAD_URL,
+            upload_index=True,
+        )
+    )
+    response = await client.post(BATCH_CHECK_URL, json={"files": ["hello.txt"]})
+    assert response.status == 404
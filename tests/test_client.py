@@ -0,0 +1,193 @@
+import hashlib
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestClient
+
+from aiohttp_tus import setup_tus
+from aiohttp_tus.annotations import Handler
+from aiohttp_tus.client import TusClient, TusClientError
+from aiohttp_tus.metadata import format_upload_metadata
+from aiohttp_tus.storage import ContentStore
+from tests.common import (
+    get_upload_url,
+    TEST_SCREENSHOT_NAME,
+    TEST_SCREENSHOT_PATH,
+    TEST_UPLOAD_URL,
+)
+
+
+TEST_METADATA_HEADER = format_upload_metadata(
+    {"filename": TEST_SCREENSHOT_NAME.encode()}
+)
+
+
+@pytest.fixture
+def tus_test_client(aiohttp_client, tmp_path):
+    async def factory(**kwargs) -> TestClient:
+        return await aiohttp_client(
+            setup_tus(
+                web.Application(),
+                upload_path=tmp_path,
+                upload_url=TEST_UPLOAD_URL,
+                **kwargs,
+            )
+        )
+
+    return factory
+
+
+def fail_first_patch(handler: Handler) -> Handler:
+    failed = []
+
+    async def decorator(request: web.Request) -> web.StreamResponse:
+        if request.method == "PATCH" and not failed:
+            failed.append(request)
+            raise web.HTTPServiceUnavailable()
+        return await handler(request)
+
+    return decorator
+
+
+@pytest.mark.parametrize(
+    "options, client_options",
+    (
+        ({}, {}),
+        ({"pipelining_window": 65536}, {"parallel_chunks": 4}),
+        ({"decorator": fail_first_patch}, {"retry_delay": 0.01}),
+    ),
+)
+async def test_upload(tus_test_client, tmp_path, options, client_options):
+    client = await tus_test_client(**options)
+    url = get_upload_url(client, TEST_UPLOAD_URL)
+
+    async with TusClient(chunk_size=16384, **client_options) as tus:
+        upload = await tus.upload(url, TEST_SCREENSHOT_PATH)
+
+    expected = TEST_SCREENSHOT_PATH.read_bytes()
+    assert upload.offset == upload.file_size == len(expected)
+    assert (tmp_path / TEST_SCREENSHOT_NAME).read_bytes() == expected
+
+
+async def test_upload_declared_digest(tus_test_client, tmp_path):
+    patches = []
+
+    def count_patches(handler: Handler) -> Handler:
+        async def decorator(request: web.Request) -> web.StreamResponse:
+            if request.method == "PATCH":
+                patches.append(request)
+            return await handler(request)
+
+        return decorator
+
+    client = await tus_test_client(
+        content_store=ContentStore(trust_declared_digest=True),
+        decorator=count_patches,
+    )
+    url = get_upload_url(client, TEST_UPLOAD_URL)
+    data = TEST_SCREENSHOT_PATH.read_bytes()
+
+    async with TusClient(chunk_size=16384) as tus:
+        await tus.upload(url, TEST_SCREENSHOT_PATH)
+        uploaded = len(patches)
+
+        # Server stores file of declared digest already, so no chunks are sent
+        upload = await tus.upload(
+            url,
+            TEST_SCREENSHOT_PATH,
+            file_name="copy.png",
+            metadata={"sha256": hashlib.sha256(data).hexdigest().encode()},
+        )
+
+    assert upload.offset == upload.file_size == len(data)
+    assert len(patches) == uploaded
+    assert (tmp_path / "copy.png").read_bytes() == data
+
+
+async def test_upload_many(tus_test_client, tmp_path):
+    client = await tus_test_client()
+    source_path = tmp_path / "source"
+    source_path.mkdir()
+    paths = [source_path / f"{idx}.bin" for idx in range(8)]
+    for idx, path in enumerate(paths):
+        path.write_bytes(bytes([idx]) * idx * 1000)
+
+    async with TusClient(chunk_size=2048, concurrency=3) as tus:
+        uploads = await tus.upload_many(
+            get_upload_url(client, TEST_UPLOAD_URL),
+            paths,
+            metadata={"priority": b"bulk"},
+        )
+
+    assert [item.file_size for item in uploads] == [idx * 1000 for idx in range(8)]
+    for path in paths:
+        assert (tmp_path / path.name).read_bytes() == path.read_bytes()
+
+
+async def test_upload_many_invalid_kwargs(tus_test_client, tmp_path):
+    async with TusClient() as tus:
+        # Per file arguments, such as file name, can not be shared by whole batch
+        with pytest.raises(TypeError):
+            await tus.upload_many(
+                "http://localhost/uploads", [tmp_path], file_name="hello.txt"
+            )
+
+
+async def test_upload_resume(tus_test_client, tmp_path):
+    client = await tus_test_client(upload_index=True, fingerprint_lookup=True)
+    url = get_upload_url(client, TEST_UPLOAD_URL)
+
+    async with TusClient(session=client.session, chunk_size=16384) as tus:
+        location, offset = await tus.create_upload(
+            url,
+            file_size=TEST_SCREENSHOT_PATH.stat().st_size,
+            metadata_header=TEST_METADATA_HEADER,
+        )
+        assert offset is None
+        assert (
+            await tus.send_chunk(
+                location, TEST_SCREENSHOT_PATH, start=0, end=16384, pipelined=False
+            )
+            == 16384
+        )
+
+        # Client, which lost upload URL, finds in-progress upload of the same file
+        found = await tus.find_upload(
+            url,
+            file_size=TEST_SCREENSHOT_PATH.stat().st_size,
+            metadata_header=TEST_METADATA_HEADER,
+        )
+        assert found == (location, 16384)
+
+        upload = await tus.upload(url, TEST_SCREENSHOT_PATH)
+        assert upload.location == location
+
+    assert not client.session.closed
+    assert (tmp_path / TEST_SCREENSHOT_NAME).read_bytes() == (
+        TEST_SCREENSHOT_PATH.read_bytes()
+    )
+
+
+async def test_upload_file_exists(tus_test_client, tmp_path):
+    client = await tus_test_client()
+    (tmp_path / TEST_SCREENSHOT_NAME).write_bytes(b"")
+
+    async with TusClient() as tus:
+        with pytest.raises(TusClientError) as err:
+            await tus.upload(
+                get_upload_url(client, TEST_UPLOAD_URL), TEST_SCREENSHOT_PATH
+            )
+    assert err.value.status == 409
+
+
+async def test_upload_empty_file(tus_test_client, tmp_path):
+    client = await tus_test_client()
+    path = tmp_path / "source.txt"
+    path.write_bytes(b"")
+
+    async with TusClient() as tus:
+        upload = await tus.upload(
+            get_upload_url(client, TEST_UPLOAD_URL), path, file_name="empty.txt"
+        )
+    assert upload.offset == 0
+    assert (tmp_path / "empty.txt").read_bytes() == b""
@@ -0,0 +1,117 @@
+import gzip
+import hashlib
+from functools import partial
+
+import pytest
+import tus
+from aiohttp import web
+from multidict import CIMultiDict
+
+from aiohttp_tus import setup_tus
+from aiohttp_tus.compression import Compressor
+from aiohttp_tus.metadata import format_upload_metadata
+from aiohttp_tus.storage import ContentStore
+from tests.common import (
+    get_upload_url,
+    TEST_FILE_NAME,
+    TEST_FILE_PATH,
+    TEST_UPLOAD_METADATA,
+    TEST_UPLOAD_URL,
+)
+
+
+@pytest.mark.parametrize(
+    "metadata, expected",
+    (
+        (TEST_UPLOAD_METADATA, "gzip"),
+        (CIMultiDict({"filetype": b"application/json; charset=utf-8"}), "gzip"),
+        (CIMultiDict({"filetype": b"image/png"}), None),
+        (CIMultiDict({}), None),
+    ),
+)
+def test_compressor_get_codec(metadata, expected):
+    assert Compressor().get_codec(metadata) == expected
+
+
+def test_compressor_invalid_codec():
+    with pytest.raises(ValueError):
+        Compressor(content_types={"text/*": "lz4"})
+
+
+async def test_upload_compressed(aiohttp_client, loop, tmp_path):
+    files = {}
+
+    async def on_upload_done(request, resource, file_path):
+        files[resource.file_name] = file_path
+
+    client = await aiohttp_client(
+        setup_tus(
+            web.Application(),
+            upload_path=tmp_path,
+            upload_url=TEST_UPLOAD_URL,
+            on_upload_done=on_upload_done,
+            compressor=Compressor(max_workers=1),
+        )
+    )
+    upload = partial(
+        tus.upload, file_name=TEST_FILE_NAME, metadata={"filetype": "text/plain"}
+    )
+
+    with open(TEST_FILE_PATH, "rb") as handler:
+        await loop.run_in_executor(
+            None, upload, handler, get_upload_url(client, TEST_UPLOAD_URL)
+        )
+
+    file_path = tmp_path / f"{TEST_FILE_NAME}.gz"
+    assert files == {f"{TEST_FILE_NAME}.gz": file_path}
+    assert gzip.decompress(file_path.read_bytes()) == TEST_FILE_PATH.read_bytes()
+    assert not (tmp_path / TEST_FILE_NAME).exists()
+
+
+async def test_upload_compressed_deduplicated(aiohttp_client, loop, tmp_path):
+    client = await aiohttp_client(
+        setup_tus(
+            web.Application(),
+            upload_path=tmp_path,
+            upload_url=TEST_UPLOAD_URL,
+            content_store=ContentStore(trust_declared_digest=True),
+            compressor=Compressor(max_workers=1),
+        )
+    )
+    data = TEST_FILE_PATH.read_bytes()
+    digest = hashlib.sha256(data).hexdigest()
+
+    with open(TEST_FILE_PATH, "rb") as handler:
+        await loop.run_in_executor(
+            None,
+            partial(
+                tus.upload,
+                file_name="first.txt",
+                metadata={"filetype": "text/plain"},
+            ),
+            handler,
+            get_upload_url(client, TEST_UPLOAD_URL),
+        )
+
+    # Compressed object is keyed separately from uncompressed content
+    first = tmp_path / "first.txt.gz"
+    assert first.samefile(tmp_path / ".objects" / digest[:2] / f"{digest}.gz")
+    assert not (tmp_path / ".objects" / digest[:2] / digest).exists()
+
+    response = await client.post(
+        TEST_UPLOAD_URL,
+        headers={
+            "Tus-Resumable": "1.0.0",
+            "Upload-Length": str(len(data)),
+            "Upload-Metadata": format_upload_metadata(
+                {
+                    "filename": b"second.txt",
+                    "filetype": b"text/plain",
+                    "sha256": digest.encode(),
+                }
+            ),
+        },
+    )
+    assert response.status == 201
+    assert response.headers["Upload-Offset"] == str(len(data))
+    assert (tmp_path / "second.txt.gz").samefile(first)
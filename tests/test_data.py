@@ -1,7 +1,40 @@
+import attr
 import pytest
 
-from aiohttp_tus.data import get_resource_url, get_upload_url
-from tests.common import TEST_CONFIG
+from aiohttp_tus.data import (
+    delete_metadata_paths,
+    get_resource_completed_path,
+    get_resource_metadata_path,
+    get_resource_url,
+    get_upload_url,
+    link_completed_path,
+    read_offset,
+    Resource,
+)
+from tests.common import (
+    TEST_CONFIG,
+    TEST_UPLOAD_METADATA,
+    TEST_UPLOAD_METADATA_HEADER,
+)
+
+
+def test_delete_metadata_paths_completed(tmp_path):
+    config = attr.evolve(TEST_CONFIG, upload_path=tmp_path, downloads=True)
+    file_path = tmp_path / "hello.txt"
+    file_path.write_bytes(b"Hello")
+    resource = Resource(
+        file_name="hello.txt", file_size=5, offset=5, metadata_header=""
+    )
+    resource.save_metadata(config=config, match_info={})
+    link_completed_path(
+        config=config, match_info={}, uid=resource.uid, file_path=file_path
+    )
+    path = get_resource_completed_path(config=config, match_info={}, uid=resource.uid)
+    assert path.is_symlink()
+
+    assert delete_metadata_paths(config=config, match_info={}, uid=resource.uid)
+    assert not path.is_symlink()
+    assert file_path.exists()
 
 
 def test_get_resource_url():
@@ -21,3 +54,55 @@ def test_get_upload_url(resource_url, expected):
 
 def test_upload_url_id():
     assert TEST_CONFIG.upload_url_id == "L3VwbG9hZHM_"
+
+
+def test_resource_save_metadata(tmp_path):
+    config = attr.evolve(TEST_CONFIG, upload_path=tmp_path)
+    resource = Resource(
+        file_name="hello.txt", file_size=10, offset=0, metadata_header=""
+    )
+    match_info = {"resource_uid": resource.uid}
+
+    path, data = resource.save_metadata(config=config, match_info=match_info)
+    assert "offset" not in data
+    assert Resource.from_metadata(config=config, match_info=match_info) == resource
+
+    next_resource = attr.evolve(resource, offset=5)
+    offset_path = next_resource.save_progress(config=config, match_info=match_info)
+    assert offset_path.stat().st_size == 8
+    assert path.read_text() == config.json_dumps(data)
+    assert read_offset(offset_path) == 5
+    assert (
+        Resource.from_metadata(config=config, match_info=match_info) == next_resource
+    )
+
+
+def test_resource_from_legacy_metadata(tmp_path):
+    config = attr.evolve(TEST_CONFIG, upload_path=tmp_path)
+    resource = Resource(
+        file_name="hello.txt", file_size=10, offset=5, metadata_header=""
+    )
+    match_info = {"resource_uid": resource.uid}
+
+    get_resource_metadata_path(
+        config=config, match_info=match_info, uid=resource.uid
+    ).write_text(
+        config.json_dumps(
+            attr.asdict(
+                resource, filter=attr.filters.exclude(attr.fields(Resource).metadata)
+            )
+        )
+    )
+    assert Resource.from_metadata(config=config, match_info=match_info) == resource
+
+
+def test_resource_metadata():
+    resource = Resource(
+        file_name="hello.txt",
+        file_size=10,
+        offset=0,
+        metadata_header=TEST_UPLOAD_METADATA_HEADER,
+    )
+    assert resource.metadata == TEST_UPLOAD_METADATA
+    # Metadata is decoded once & passed along to next resource states
+    assert attr.evolve(resource, offset=5).metadata is resource.metadata
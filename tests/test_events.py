@@ -0,0 +1,35 @@
+import asyncio
+
+from aiohttp_tus.events import (
+    EVENT_COMPLETED,
+    ProgressBroker,
+    ProgressEvent,
+)
+
+
+KEY = ("/uploads", "uid")
+
+
+async def test_progress_broker_coalesce():
+    broker = ProgressBroker(interval=0.05)
+
+    with broker.subscribe(KEY) as queue:
+        for offset in range(10):
+            broker.publish(KEY, ProgressEvent(uid="uid", offset=offset, file_size=10))
+
+        assert (await queue.get()).offset == 0
+        assert (await asyncio.wait_for(queue.get(), timeout=1)).offset == 9
+
+        broker.publish(
+            KEY,
+            ProgressEvent(uid="uid", offset=10, file_size=10, event=EVENT_COMPLETED),
+        )
+        assert queue.get_nowait().is_final
+
+    assert broker.subscribers == {}
+
+
+def test_progress_broker_no_subscribers():
+    broker = ProgressBroker()
+    broker.publish(KEY, ProgressEvent(uid="uid", offset=0, file_size=10))
+    assert broker.pending == {}
@@ -0,0 +1,135 @@
+import threading
+import time
+
+import pytest
+from aiohttp import web
+from yarl import URL
+
+from aiohttp_tus import setup_tus
+from aiohttp_tus.data import move_path
+from aiohttp_tus.locks import lock_path, ResourceLocked
+from tests.common import TEST_UPLOAD_METADATA_HEADER, TEST_UPLOAD_URL
+
+
+def test_lock_path(tmp_path):
+    path = tmp_path / "resource.lock"
+    with lock_path(path):
+        with pytest.raises(ResourceLocked):
+            with lock_path(path):
+                ...
+    with lock_path(path):
+        ...
+
+
+def test_lock_path_unlinked(tmp_path):
+    path = tmp_path / "resource.lock"
+    locked = []
+
+    def wait_for_lock():
+        with lock_path(path, blocking=True):
+            locked.append(path.exists())
+
+    with lock_path(path):
+        waiter = threading.Thread(target=wait_for_lock)
+        waiter.start()
+        time.sleep(0.1)
+        # Lock holder unlinks lock file, so waiter, which opened it before, need to
+        # lock recreated file instead
+        path.unlink()
+    waiter.join()
+
+    assert locked == [True]
+
+
+@pytest.mark.parametrize("overwrite", (False, True))
+def test_move_path(tmp_path, overwrite):
+    source, target = tmp_path / "source", tmp_path / "target"
+    source.write_text("source")
+    target.write_text("target")
+
+    if overwrite:
+        move_path(source, target, overwrite=True)
+        assert target.read_text() == "source"
+    else:
+        with pytest.raises(FileExistsError):
+            move_path(source, target, overwrite=False)
+        assert target.read_text() == "target"
+
+
+async def test_upload_resource_locked(aiohttp_client, tmp_path):
+    client = await aiohttp_client(
+        setup_tus(web.Application(), upload_path=tmp_path, upload_url=TEST_UPLOAD_URL)
+    )
+    response = await client.post(
+        TEST_UPLOAD_URL,
+        headers={
+            "Tus-Resumable": "1.0.0",
+            "Upload-Length": "5",
+            "Upload-Metadata": TEST_UPLOAD_METADATA_HEADER,
+        },
+    )
+    resource_url = URL(response.headers["Location"]).path
+    uid = response.headers["Tus-Temp-Filename"]
+    headers = {"Tus-Resumable": "1.0.0", "Upload-Offset": "0"}
+
+    with lock_path(tmp_path / ".metadata" / f"{uid}.lock"):
+        response = await client.patch(resource_url, data=b"Hello", headers=headers)
+        assert response.status == 423
+
+    response = await client.patch(resource_url, data=b"Hello", headers=headers)
+    assert response.status == 204
+    assert (tmp_path / "hello.txt").read_bytes() == b"Hello"
+    assert list((tmp_path / ".metadata").iterdir()) == []
+
+
+async def test_upload_resource_file_exists(aiohttp_client, tmp_path):
+    client = await aiohttp_client(
+        setup_tus(web.Application(), upload_path=tmp_path, upload_url=TEST_UPLOAD_URL)
+    )
+    response = await client.post(
+        TEST_UPLOAD_URL,
+        headers={
+            "Tus-Resumable": "1.0.0",
+            "Upload-Length": "5",
+            "Upload-Metadata": TEST_UPLOAD_METADATA_HEADER,
+        },
+    )
+    resource_url = URL(response.headers["Location"]).path
+
+    # Other process completes upload with the same file name
+    (tmp_path / "hello.txt").write_bytes(b"world")
+
+    response = await client.patch(
+        resource_url,
+        data=b"Hello",
+        headers={"Tus-Resumable": "1.0.0", "Upload-Offset": "0"},
+    )
+    assert response.status == 409
+    assert (tmp_path / "hello.txt").read_bytes() == b"world"
+
+
+@pytest.mark.parametrize(
+    "resource_uid, expected",
+    (
+        ("00000000-0000-0000-0000-000000000000", 410),
+        ("..%2F..%2Fresource", 404),
+        ("resource", 404),
+    ),
+)
+async def test_upload_resource_missing(
+    aiohttp_client, tmp_path, resource_uid, expected
+):
+    upload_path = tmp_path / "uploads"
+    client = await aiohttp_client(
+        setup_tus(
+            web.Application(), upload_path=upload_path, upload_url=TEST_UPLOAD_URL
+        )
+    )
+    response = await client.patch(
+        URL(f"{TEST_UPLOAD_URL}/{resource_uid}", encoded=True),
+        data=b"Hello",
+        headers={"Tus-Resumable": "1.0.0", "Upload-Offset": "0"},
+    )
+    assert response.status == expected
+    # No lock files are left behind, neither inside nor outside of upload path
+    assert list(tmp_path.glob("**/*.lock")) == []
@@ -0,0 +1,55 @@
+import pytest
+from multidict import CIMultiDict
+
+from aiohttp_tus import utils
+from aiohttp_tus.metadata import (
+    format_upload_metadata,
+    get_fingerprint,
+    parse_upload_metadata,
+)
+from tests.common import TEST_UPLOAD_METADATA, TEST_UPLOAD_METADATA_HEADER
+
+
+@pytest.mark.parametrize(
+    "metadata_header, expected",
+    (
+        ("", CIMultiDict({})),
+        (TEST_UPLOAD_METADATA_HEADER, TEST_UPLOAD_METADATA),
+        (
+            "is_confidential,Filename aGVsbG8udHh0",
+            CIMultiDict({"is_confidential": b"", "Filename": b"hello.txt"}),
+        ),
+        # Characters out of base64 alphabet are ignored as by previous versions
+        ("Filename aGVsbG8u_dHh0", CIMultiDict({"Filename": b"hello.txt"})),
+    ),
+)
+def test_parse_upload_metadata(metadata_header, expected):
+    assert parse_upload_metadata(metadata_header) == expected
+    assert parse_upload_metadata(format_upload_metadata(expected)) == expected
+    assert utils.parse_upload_metadata(metadata_header) == expected
+
+
+@pytest.mark.parametrize(
+    "metadata_header, kwargs",
+    (
+        ("Filename aGVsbG8udHh0 aGVsbG8udHh0", {}),
+        ("Filename aGVsbG8", {}),
+        (TEST_UPLOAD_METADATA_HEADER, {"max_keys": 1}),
+        (TEST_UPLOAD_METADATA_HEADER, {"max_value_size": 9}),
+    ),
+)
+def test_parse_upload_metadata_error(metadata_header, kwargs):
+    with pytest.raises(ValueError):
+        parse_upload_metadata(metadata_header, **kwargs)
+
+
+def test_get_fingerprint():
+    metadata = parse_upload_metadata(TEST_UPLOAD_METADATA_HEADER)
+    fingerprint = get_fingerprint(metadata, 13)
+    assert fingerprint == get_fingerprint(metadata, 13)
+    assert fingerprint != get_fingerprint(metadata, 14)
+    assert fingerprint != get_fingerprint(
+        parse_upload_metadata(f"{TEST_UPLOAD_METADATA_HEADER}, fingerprint YWJj"), 13
+    )
+    assert get_fingerprint(metadata, None) is None
+    assert get_fingerprint(parse_upload_metadata(""), 13) is None
@@ -0,0 +1,95 @@
+import asyncio
+import time
+
+from aiohttp import web
+from yarl import URL
+
+from aiohttp_tus import setup_tus
+from aiohttp_tus.monitor import current_timing, LoopMonitor, phase, RequestTiming
+from tests.common import TEST_UPLOAD_METADATA_HEADER, TEST_UPLOAD_URL
+
+
+def test_phase():
+    with phase("write", size=5):
+        pass
+
+    timing = RequestTiming(view="upload_resource")
+    token = current_timing.set(timing)
+    try:
+        with phase("write", size=5):
+            pass
+        with phase("write", size=3):
+            time.sleep(0.01)
+        with phase("save_progress"):
+            pass
+    finally:
+        current_timing.reset(token)
+
+    assert timing.bytes == 8
+    assert set(timing.phases) == {"write", "save_progress"}
+    assert timing.get_slowest_phase()[0] == "write"
+
+
+async def test_loop_lag(aiohttp_client, tmp_path):
+    monitor = LoopMonitor(interval=0.01)
+    await aiohttp_client(
+        setup_tus(
+            web.Application(),
+            upload_path=tmp_path,
+            upload_url=TEST_UPLOAD_URL,
+            monitor=monitor,
+        )
+    )
+    await asyncio.sleep(0.02)
+    time.sleep(0.05)
+    await asyncio.sleep(0.02)
+
+    assert monitor.stats.lag_samples > 0
+    assert monitor.stats.lag_max >= 0.04
+
+
+async def test_slow_operations(aiohttp_client, tmp_path):
+    operations = []
+    monitor = LoopMonitor(
+        lag_threshold=0,
+        sample_rate=1.0,
+        max_slowest=2,
+        on_slow_operation=operations.append,
+    )
+    client = await aiohttp_client(
+        setup_tus(
+            web.Application(),
+            upload_path=tmp_path,
+            upload_url=TEST_UPLOAD_URL,
+            monitor=monitor,
+        )
+    )
+
+    response = await client.post(
+        TEST_UPLOAD_URL,
+        headers={
+            "Tus-Resumable": "1.0.0",
+            "Upload-Length": "5",
+            "Upload-Metadata": TEST_UPLOAD_METADATA_HEADER,
+        },
+    )
+    uid = response.headers["Tus-Temp-Filename"]
+    response = await client.patch(
+        URL(response.headers["Location"]).path,
+        data=b"Hello",
+        headers={
+            "Tus-Resumable": "1.0.0",
+            "Upload-Offset": "0",
+            "Content-Type": "application/offset+octet-stream",
+        },
+    )
+    assert response.status == 204
+
+    assert monitor.stats.requests == monitor.stats.sampled == 2
+    assert [(item.view, item.uid) for item in operations] == [
+        ("start_upload", uid),
+        ("upload_resource", uid),
+    ]
+    assert operations[1].bytes == 5
+    assert {"metadata", "write", "complete"} <= set(operations[1].phases)
+    assert len(monitor.get_slowest()) == 2
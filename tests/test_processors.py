@@ -0,0 +1,48 @@
+import pytest
+
+from aiohttp_tus.processors import (
+    ChunkProcessor,
+    feed_processors,
+    finalize_processors,
+    get_initial_processors_state,
+    HeadProcessor,
+    validate_processors,
+)
+
+
+class SizeProcessor(ChunkProcessor):
+    name = "size"
+    stage = "before_write"
+
+    def initial_state(self):
+        return 0
+
+    def process(self, state, chunk, *, offset):
+        return state + len(chunk)
+
+
+def test_feed_processors():
+    processors = (HeadProcessor(size=4), SizeProcessor())
+    state = get_initial_processors_state(processors)
+    assert state == {"head": "", "size": 0}
+
+    for offset, chunk in ((0, b"He"), (2, b"llo, "), (7, b"world!")):
+        for stage in ("before_write", "after_write"):
+            state = feed_processors(
+                processors, state, stage=stage, chunk=chunk, offset=offset
+            )
+
+    assert finalize_processors(processors, state) == {"head": b"Hell", "size": 13}
+
+
+@pytest.mark.parametrize(
+    "processors",
+    (
+        (ChunkProcessor(),),
+        (HeadProcessor(), HeadProcessor(size=10)),
+        (HeadProcessor(stage="on_write"),),
+    ),
+)
+def test_validate_processors_error(processors):
+    with pytest.raises(ValueError):
+        validate_processors(processors)
@@ -0,0 +1,75 @@
+import pstats
+
+from aiohttp import web
+from yarl import URL
+
+from aiohttp_tus import setup_tus
+from aiohttp_tus.admin import create_admin_app
+from aiohttp_tus.profiling import RequestProfiler
+from tests.common import TEST_UPLOAD_METADATA_HEADER, TEST_UPLOAD_URL
+
+
+ADMIN_URL = "/tus-admin"
+
+
+async def test_request_profiler(aiohttp_client, tmp_path):
+    profiler = RequestProfiler(sample_rate=1.0)
+    app = setup_tus(
+        web.Application(),
+        upload_path=tmp_path,
+        upload_url=TEST_UPLOAD_URL,
+        profiler=profiler,
+    )
+    app.add_subapp(ADMIN_URL, create_admin_app(upload_url=TEST_UPLOAD_URL))
+    client = await aiohttp_client(app)
+
+    response = await client.post(
+        TEST_UPLOAD_URL,
+        headers={
+            "Tus-Resumable": "1.0.0",
+            "Upload-Length": "5",
+            "Upload-Metadata": TEST_UPLOAD_METADATA_HEADER,
+        },
+    )
+    resource_url = URL(response.headers["Location"]).path
+    for offset in range(5):
+        response = await client.patch(
+            resource_url,
+            data=b"Hello"[offset : offset + 1],  # noqa: E203
+            headers={
+                "Tus-Resumable": "1.0.0",
+                "Upload-Offset": str(offset),
+                "Content-Type": "application/offset+octet-stream",
+            },
+        )
+        assert response.status == 204
+
+    response = await client.get(f"{ADMIN_URL}/profiles")
+    assert await response.json() == {
+        "profiles": {"start_upload": {"calls": 1}, "upload_resource": {"calls": 5}}
+    }
+
+    response = await client.get(f"{ADMIN_URL}/profiles/upload_resource")
+    assert response.status == 200
+    path = tmp_path / "downloaded.prof"
+    path.write_bytes(await response.read())
+    assert pstats.Stats(str(path)).total_calls > 0
+
+    assert [item.name for item in profiler.dump(tmp_path / "profiles")] == [
+        "start_upload.prof",
+        "upload_resource.prof",
+    ]
+
+    response = await client.delete(f"{ADMIN_URL}/profiles")
+    assert response.status == 204
+    response = await client.get(f"{ADMIN_URL}/profiles/upload_resource")
+    assert response.status == 404
+
+
+async def test_request_profiler_disabled(aiohttp_client, tmp_path):
+    app = setup_tus(web.Application(), upload_path=tmp_path, upload_url=TEST_UPLOAD_URL)
+    app.add_subapp(ADMIN_URL, create_admin_app(upload_url=TEST_UPLOAD_URL))
+    client = await aiohttp_client(app)
+
+    response = await client.get(f"{ADMIN_URL}/profiles")
+    assert response.status == 501
@@ -0,0 +1,286 @@
+import asyncio
+from pathlib import Path
+
+import pytest
+from aiohttp import web
+from yarl import URL
+
+from aiohttp_tus import setup_tus
+from aiohttp_tus.quotas import compute_usage, Quota, Usage, UsageLedger
+from aiohttp_tus.storage import ContentStore
+from tests.common import TEST_UPLOAD_METADATA_HEADER
+
+
+USER_UPLOAD_URL = "/users/{username}/uploads"
+
+
+@pytest.fixture
+def metadata_path(tmp_path) -> Path:
+    return tmp_path
+
+
+def test_compute_usage(tmp_path):
+    (tmp_path / "hello.txt").write_bytes(b"Hello")
+    (tmp_path / ".metadata").mkdir()
+    (tmp_path / ".metadata" / "uid.json").write_bytes(b"{}")
+    (tmp_path / ".resources").mkdir()
+    (tmp_path / ".resources" / "uid").write_bytes(b"\0" * 10)
+    assert compute_usage(tmp_path) == Usage(bytes=15, files=2)
+
+
+def test_ledger_adjust(metadata_path):
+    ledger = UsageLedger()
+    ledger.adjust(metadata_path, size=10, files=1)
+    ledger.adjust(metadata_path, size=-20, files=-2)
+    assert ledger.get_usage(metadata_path) == Usage(bytes=0, files=0)
+
+
+async def test_ledger_submit(metadata_path):
+    ledger = UsageLedger()
+    for _ in range(10):
+        ledger.submit(ledger.adjust, metadata_path, size=10, files=1)
+    # Queries run after all updates, submitted before
+    assert await ledger.run(ledger.get_usage, metadata_path) == (
+        Usage(bytes=100, files=10)
+    )
+    await ledger.on_cleanup(web.Application())
+    assert ledger.connections == {}
+    assert ledger.executor is None
+
+
+@pytest.mark.parametrize(
+    "quota, expected",
+    (
+        (Quota(), True),
+        (Quota(max_bytes=15), True),
+        (Quota(max_bytes=14), False),
+        (Quota(max_files=2), True),
+        (Quota(max_files=1), False),
+    ),
+)
+def test_ledger_reserve(metadata_path, quota, expected):
+    ledger = UsageLedger()
+    ledger.set_usage(metadata_path, Usage(bytes=10, files=1))
+    assert ledger.reserve(metadata_path, size=5, quota=quota) is expected
+    assert ledger.get_usage(metadata_path) == (
+        Usage(bytes=15, files=2) if expected else Usage(bytes=10, files=1)
+    )
+
+
+async def test_usage_quota(aiohttp_client, tmp_path):
+    ledger = UsageLedger(
+        quotas=lambda match_info: Quota(
+            max_bytes=10 if match_info["username"] == "alice" else None
+        )
+    )
+    client = await aiohttp_client(
+        setup_tus(
+            web.Application(),
+            upload_path=tmp_path / "{username}",
+            upload_url=USER_UPLOAD_URL,
+            usage_ledger=ledger,
+        )
+    )
+
+    async def start_upload(username: str, file_size: int) -> web.Response:
+        return await client.post(
+            USER_UPLOAD_URL.format(username=username),
+            headers={
+                "Tus-Resumable": "1.0.0",
+                "Upload-Length": str(file_size),
+                "Upload-Metadata": TEST_UPLOAD_METADATA_HEADER,
+            },
+        )
+
+    alice_metadata_path = tmp_path / "alice" / ".metadata"
+
+    response = await start_upload("alice", 8)
+    assert response.status == 201
+    resource_url = URL(response.headers["Location"]).path
+    assert await ledger.run(ledger.get_usage, alice_metadata_path) == (
+        Usage(bytes=8, files=1)
+    )
+
+    response = await start_upload("alice", 5)
+    assert response.status == 413
+    assert await response.text() == "Upload quota exceeded"
+
+    response = await start_upload("bob", 100)
+    assert response.status == 201
+
+    # Deleting in-progress upload releases its usage
+    response = await client.delete(resource_url, headers={"Tus-Resumable": "1.0.0"})
+    assert response.status == 204
+    assert await ledger.run(ledger.get_usage, alice_metadata_path) == (
+        Usage(bytes=0, files=0)
+    )
+
+    response = await start_upload("alice", 5)
+    assert response.status == 201
+    response = await client.patch(
+        URL(response.headers["Location"]).path,
+        data=b"Hello",
+        headers={
+            "Tus-Resumable": "1.0.0",
+            "Upload-Offset": "0",
+            "Content-Type": "application/offset+octet-stream",
+        },
+    )
+    assert response.status == 204
+    assert (tmp_path / "alice" / "hello.txt").read_bytes() == b"Hello"
+    assert await ledger.run(ledger.get_usage, alice_metadata_path) == (
+        Usage(bytes=5, files=1)
+    )
+
+
+async def test_usage_released_on_file_exists(aiohttp_client, tmp_path):
+    ledger = UsageLedger()
+    client = await aiohttp_client(
+        setup_tus(
+            web.Application(),
+            upload_path=tmp_path,
+            upload_url="/uploads",
+            usage_ledger=ledger,
+            content_store=ContentStore(),
+        )
+    )
+    response = await client.post(
+        "/uploads",
+        headers={
+            "Tus-Resumable": "1.0.0",
+            "Upload-Length": "5",
+            "Upload-Metadata": TEST_UPLOAD_METADATA_HEADER,
+        },
+    )
+    metadata_path = tmp_path / ".metadata"
+    assert await ledger.run(ledger.get_usage, metadata_path) == (
+        Usage(bytes=5, files=1)
+    )
+
+    # Other process completes upload with the same file name
+    (tmp_path / "hello.txt").write_bytes(b"world")
+
+    response = await client.patch(
+        URL(response.headers["Location"]).path,
+        data=b"Hello",
+        headers={"Tus-Resumable": "1.0.0", "Upload-Offset": "0"},
+    )
+    assert response.status == 409
+    assert await ledger.run(ledger.get_usage, metadata_path) == (
+        Usage(bytes=0, files=0)
+    )
+    assert list((tmp_path / ".objects").glob("*/*")) == []
+
+
+async def test_usage_deferred_length(aiohttp_client, tmp_path):
+    ledger = UsageLedger(quota=Quota(max_bytes=10))
+    client = await aiohttp_client(
+        setup_tus(
+            web.Application(),
+            upload_path=tmp_path,
+            upload_url="/uploads",
+            usage_ledger=ledger,
+        )
+    )
+    response = await client.post(
+        "/uploads",
+        headers={
+            "Tus-Resumable": "1.0.0",
+            "Upload-Defer-Length": "1",
+            "Upload-Metadata": TEST_UPLOAD_METADATA_HEADER,
+        },
+    )
+    resource_url = URL(response.headers["Location"]).path
+    metadata_path = tmp_path / ".metadata"
+    headers = {
+        "Tus-Resumable": "1.0.0",
+        "Content-Type": "application/offset+octet-stream",
+    }
+
+    async def body():
+        for data in (b", wo", b"rld!"):
+            yield data
+            await asyncio.sleep(0.01)
+
+    # Appended bytes are reserved up front or slice by slice for chunked requests
+    response = await client.patch(
+        resource_url, data=b"Hello", headers={**headers, "Upload-Offset": "0"}
+    )
+    assert response.status == 204
+    assert await ledger.run(ledger.get_usage, metadata_path) == (
+        Usage(bytes=5, files=1)
+    )
+
+    response = await client.patch(
+        resource_url, data=body(), headers={**headers, "Upload-Offset": "5"}
+    )
+    assert response.status == 413
+    response = await client.head(resource_url, headers=headers)
+    assert response.headers["Upload-Offset"] == "9"
+    assert await ledger.run(ledger.get_usage, metadata_path) == (
+        Usage(bytes=9, files=1)
+    )
+
+    # Only the rest of declared length is reserved
+    response = await client.patch(
+        resource_url,
+        data=b"r",
+        headers={**headers, "Upload-Offset": "9", "Upload-Length": "10"},
+    )
+    assert response.status == 204
+    assert (tmp_path / "hello.txt").read_bytes() == b"Hello, wor"
+    assert await ledger.run(ledger.get_usage, metadata_path) == (
+        Usage(bytes=10, files=1)
+    )
+
+
+async def test_usage_deferred_length_chunked(aiohttp_client, monkeypatch, tmp_path):
+    ledger = UsageLedger()
+    client = await aiohttp_client(
+        setup_tus(
+            web.Application(),
+            upload_path=tmp_path,
+            upload_url="/uploads",
+            usage_ledger=ledger,
+        )
+    )
+    response = await client.post(
+        "/uploads",
+        headers={
+            "Tus-Resumable": "1.0.0",
+            "Upload-Defer-Length": "1",
+            "Upload-Metadata": TEST_UPLOAD_METADATA_HEADER,
+        },
+    )
+    resource_url = URL(response.headers["Location"]).path
+    metadata_path = tmp_path / ".metadata"
+
+    reserved = []
+    reserve = UsageLedger.reserve
+
+    def counted_reserve(self, *args, **kwargs):
+        reserved.append(kwargs["size"])
+        return reserve(self, *args, **kwargs)
+
+    monkeypatch.setattr(UsageLedger, "reserve", counted_reserve)
+
+    async def body():
+        for data in (b"Hello", b", wo", b"rld!"):
+            yield data
+            await asyncio.sleep(0.01)
+
+    # Slices are reserved in one step, while the rest of step is released after
+    response = await client.patch(
+        resource_url,
+        data=body(),
+        headers={
+            "Tus-Resumable": "1.0.0",
+            "Content-Type": "application/offset+octet-stream",
+            "Upload-Offset": "0",
+        },
+    )
+    assert response.status == 204
+    assert len(reserved) == 1
+    assert await ledger.run(ledger.get_usage, metadata_path) == (
+        Usage(bytes=13, files=1)
+    )
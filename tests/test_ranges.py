@@ -0,0 +1,99 @@
+import random
+
+import attr
+import pytest
+from aiohttp import web
+
+from aiohttp_tus.data import Resource
+from aiohttp_tus.ranges import RangeSet
+from aiohttp_tus.utils import commit_resource_range, reserve_range
+from tests.common import TEST_CONFIG
+
+
+def make_ranges(*items):
+    ranges = RangeSet()
+    for start, end in items:
+        ranges.add(start, end)
+    return ranges
+
+
+@pytest.mark.parametrize(
+    "items, expected",
+    (
+        (((0, 5), (10, 15)), [(0, 5), (10, 15)]),
+        (((10, 15), (0, 5)), [(0, 5), (10, 15)]),
+        (((0, 5), (5, 10)), [(0, 10)]),
+        (((0, 5), (10, 15), (3, 12)), [(0, 15)]),
+        (((0, 5), (10, 15), (20, 25), (5, 20)), [(0, 25)]),
+        (((0, 5), (1, 2), (5, 5)), [(0, 5)]),
+    ),
+)
+def test_add(items, expected):
+    assert list(make_ranges(*items)) == expected
+
+
+def test_add_random_chunks():
+    chunks = [(start, start + 10) for start in range(0, 10000, 10)]
+    random.Random(42).shuffle(chunks)
+
+    ranges = RangeSet()
+    for start, end in chunks:
+        ranges.add(start, end)
+    assert list(ranges) == [(0, 10000)]
+
+
+@pytest.mark.parametrize(
+    "start, end, expected",
+    ((0, 5, True), (5, 10, False), (4, 11, True), (14, 20, True), (15, 20, False)),
+)
+def test_overlaps(start, end, expected):
+    assert make_ranges((0, 5), (10, 15)).overlaps(start, end) is expected
+
+
+def test_covers_prefix_holes():
+    ranges = make_ranges((0, 5), (10, 15))
+    assert ranges.covers(1, 5) is True
+    assert ranges.covers(4, 11) is False
+    assert ranges.get_prefix() == 5
+    assert ranges.get_prefix(10) == 15
+    assert ranges.get_prefix(7) == 7
+    assert list(ranges.iter_holes(0, 20)) == [(5, 10), (15, 20)]
+    assert list(ranges.iter_holes(12, 14)) == []
+
+
+def test_serialization():
+    ranges = make_ranges((5, 10), (300, 70000), (2 ** 40, 2 ** 40 + 1))
+    data = ranges.to_bytes()
+    assert len(data) < 16
+    assert RangeSet.from_bytes(data) == ranges
+    assert RangeSet.from_bytes(b"") == RangeSet()
+
+
+def test_resource_add_range():
+    resource = Resource(
+        file_name="hello.txt", file_size=20, offset=0, metadata_header=""
+    )
+
+    resource = resource.add_range(10, 15)
+    assert resource.offset == 0
+    assert list(resource.iter_missing_ranges()) == [(0, 10), (15, 20)]
+
+    resource = resource.add_range(0, 10)
+    assert resource.offset == 15
+    assert not resource.ranges
+    assert list(resource.iter_missing_ranges()) == [(15, 20)]
+
+
+@pytest.mark.parametrize("resource_uid", ("../../resource", "resource"))
+async def test_commit_resource_range_invalid_uid(tmp_path, resource_uid):
+    config = attr.evolve(TEST_CONFIG, upload_path=tmp_path / "uploads")
+    match_info = {"resource_uid": resource_uid}
+
+    with pytest.raises(web.HTTPNotFound):
+        with reserve_range(config=config, match_info=match_info, start=0, end=5):
+            ...
+    with pytest.raises(web.HTTPNotFound):
+        await commit_resource_range(
+            config=config, match_info=match_info, start=0, end=5
+        )
+    assert list(tmp_path.iterdir()) == []
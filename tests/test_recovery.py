@@ -0,0 +1,157 @@
+import pytest
+from aiohttp import web
+
+from aiohttp_tus import setup_tus
+from aiohttp_tus.constants import APP_TUS_CONFIG_KEY
+from aiohttp_tus.data import Config, read_offset, write_offset
+from aiohttp_tus.quotas import Usage, UsageLedger
+from aiohttp_tus.recovery import get_data_end, iter_match_infos, RecoveryScan
+from tests.common import TEST_UPLOAD_METADATA_HEADER, TEST_UPLOAD_URL
+
+
+async def start_upload(client, file_size: int) -> str:
+    response = await client.post(
+        TEST_UPLOAD_URL,
+        headers={
+            "Tus-Resumable": "1.0.0",
+            "Upload-Length": str(file_size),
+            "Upload-Metadata": TEST_UPLOAD_METADATA_HEADER,
+        },
+    )
+    assert response.status == 201
+    return response.headers["Tus-Temp-Filename"]
+
+
+def test_iter_match_infos(tmp_path):
+    (tmp_path / "alice" / "uploads").mkdir(parents=True)
+    (tmp_path / "bob" / "uploads").mkdir(parents=True)
+    (tmp_path / "bob" / "downloads").mkdir(parents=True)
+
+    config = Config(
+        upload_path=tmp_path / "{username}" / "uploads",
+        upload_url="/users/{username}/uploads",
+    )
+    assert sorted(
+        match_info["username"] for match_info in iter_match_infos(config)
+    ) == ["alice", "bob"]
+
+
+def test_iter_match_infos_plain(tmp_path):
+    config = Config(upload_path=tmp_path, upload_url=TEST_UPLOAD_URL)
+    assert list(iter_match_infos(config)) == [{}]
+
+
+@pytest.mark.parametrize("orphan_age, expected", ((0, (4, 1, 0)), (3600, (1, 0, 5))))
+async def test_recovery_scan(aiohttp_client, tmp_path, orphan_age, expected):
+    app = setup_tus(
+        web.Application(),
+        upload_path=tmp_path,
+        upload_url=TEST_UPLOAD_URL,
+        resource_cache_size=16,
+        upload_index=True,
+    )
+    client = await aiohttp_client(app)
+    config = app[APP_TUS_CONFIG_KEY][TEST_UPLOAD_URL]
+
+    uids = [await start_upload(client, 10) for _ in range(3)]
+    metadata_path = tmp_path / ".metadata"
+    resources_path = tmp_path / ".resources"
+
+    # Resource file is missing
+    (resources_path / uids[0]).unlink()
+    # Resource metadata is missing
+    (metadata_path / f"{uids[1]}.json").unlink()
+    # Offset is larger than bytes on the disk
+    (resources_path / uids[2]).write_bytes(b"12345")
+    write_offset(metadata_path / f"{uids[2]}.offset", 8)
+    # Offset is left without metadata
+    write_offset(metadata_path / "orphan.offset", 5)
+
+    config.resource_cache.clear()
+    scan = RecoveryScan(batch_size=2, orphan_age=orphan_age)
+    await scan.run(config)
+
+    stats = scan.stats
+    assert stats.done is True
+    assert stats.upload_paths == 1
+    assert (stats.reaped, stats.repaired, stats.skipped) == expected
+
+    if orphan_age:
+        return
+
+    assert not (metadata_path / f"{uids[0]}.json").exists()
+    assert not (resources_path / uids[1]).exists()
+    assert not (metadata_path / "orphan.offset").exists()
+    assert read_offset(metadata_path / f"{uids[2]}.offset") == 5
+
+    assert stats.warmed == 1
+    assert config.resource_cache.get((str(tmp_path.absolute()), uids[2])).offset == 5
+    index = config.upload_index
+    assert [
+        item.uid for item in await index.run(index.list_uploads, metadata_path)
+    ] == [uids[2]]
+
+
+async def test_recovery_scan_completed(tmp_path):
+    config = Config(upload_path=tmp_path, upload_url=TEST_UPLOAD_URL, downloads=True)
+    completed_path = config.resolve_completed_path({})
+    (tmp_path / "hello.txt").write_bytes(b"Hello")
+    (completed_path / "fresh").symlink_to(tmp_path / "hello.txt")
+    (completed_path / "dangling").symlink_to(tmp_path / "deleted.txt")
+
+    scan = RecoveryScan()
+    await scan.run(config)
+    assert scan.stats.reaped == 1
+    assert sorted(path.name for path in completed_path.iterdir()) == ["fresh"]
+
+    scan = RecoveryScan(completed_age=0)
+    await scan.run(config)
+    assert scan.stats.reaped == 1
+    assert list(completed_path.iterdir()) == []
+
+
+async def test_recovery_scan_on_startup(aiohttp_client, tmp_path):
+    scan = RecoveryScan()
+    await aiohttp_client(
+        setup_tus(
+            web.Application(),
+            upload_path=tmp_path,
+            upload_url=TEST_UPLOAD_URL,
+            recovery_scan=scan,
+        )
+    )
+    await scan.task
+    assert scan.stats.done is True
+
+
+async def test_recovery_scan_usage_ledger(tmp_path):
+    (tmp_path / "hello.txt").write_bytes(b"Hello")
+    ledger = UsageLedger()
+    config = Config(
+        upload_path=tmp_path, upload_url=TEST_UPLOAD_URL, usage_ledger=ledger
+    )
+    metadata_path = config.resolve_metadata_path({})
+    ledger.set_usage(metadata_path, Usage(bytes=100, files=10))
+
+    await RecoveryScan().run(config)
+    assert await ledger.run(ledger.get_usage, metadata_path) == Usage(bytes=5, files=1)
+
+
+async def test_recovery_scan_sparse_resource(aiohttp_client, tmp_path):
+    app = setup_tus(web.Application(), upload_path=tmp_path, upload_url=TEST_UPLOAD_URL)
+    client = await aiohttp_client(app)
+    config = app[APP_TUS_CONFIG_KEY][TEST_UPLOAD_URL]
+
+    # Resource file is allocated with full size, while no data has reached the disk
+    uid = await start_upload(client, 4194304)
+    resource_path = tmp_path / ".resources" / uid
+    if get_data_end(resource_path) == resource_path.stat().st_size:
+        pytest.skip("File system does not support SEEK_HOLE")
+
+    offset_path = tmp_path / ".metadata" / f"{uid}.offset"
+    write_offset(offset_path, 1048576)
+
+    scan = RecoveryScan(orphan_age=0)
+    await scan.run(config)
+    assert scan.stats.repaired == 1
+    assert read_offset(offset_path) == 0
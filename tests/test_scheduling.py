@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+from aiohttp import web
+from multidict import CIMultiDict
+
+from aiohttp_tus import setup_tus
+from aiohttp_tus.scheduling import (
+    IOScheduler,
+    PRIORITY_BULK,
+    PRIORITY_INTERACTIVE,
+    PRIORITY_NORMAL,
+)
+
+
+async def test_io_scheduler_order(loop):
+    scheduler = IOScheduler(concurrency=1)
+    order = []
+
+    async def operation(priority: str, name: str, cost: int) -> None:
+        async with scheduler.slot(priority, cost=cost):
+            order.append(name)
+            await asyncio.sleep(0)
+
+    # Hold the only slot, so all operations are queued
+    await scheduler.acquire(PRIORITY_BULK)
+    tasks = [
+        asyncio.create_task(operation(PRIORITY_BULK, f"bulk-{idx}", 1024))
+        for idx in range(3)
+    ]
+    await asyncio.sleep(0)
+    tasks.append(
+        asyncio.create_task(operation(PRIORITY_INTERACTIVE, "interactive", 1024))
+    )
+    await asyncio.sleep(0)
+    scheduler.release()
+    await asyncio.gather(*tasks)
+
+    assert order == ["interactive", "bulk-0", "bulk-1", "bulk-2"]
+    assert scheduler.active == 0
+
+
+async def test_io_scheduler_cancel(loop):
+    scheduler = IOScheduler(concurrency=1)
+    await scheduler.acquire(PRIORITY_NORMAL)
+
+    task = asyncio.create_task(scheduler.acquire(PRIORITY_NORMAL))
+    await asyncio.sleep(0)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    scheduler.release()
+    assert scheduler.active == 0
+    assert await scheduler.run(PRIORITY_BULK, lambda: 42) == 42
+    assert scheduler.active == 0
+
+
+@pytest.mark.parametrize(
+    "metadata, expected",
+    (
+        ({}, PRIORITY_NORMAL),
+        ({"priority": b"interactive"}, PRIORITY_INTERACTIVE),
+        ({"priority": b"unknown"}, PRIORITY_NORMAL),
+    ),
+)
+def test_io_scheduler_get_priority(metadata, expected):
+    assert IOScheduler().get_priority(CIMultiDict(metadata), PRIORITY_NORMAL) == (
+        expected
+    )
+
+
+def test_setup_tus_unknown_priority(tmp_path):
+    with pytest.raises(ValueError):
+        setup_tus(
+            web.Application(),
+            upload_path=tmp_path,
+            io_scheduler=IOScheduler(),
+            io_priority="realtime",
+        )
@@ -0,0 +1,113 @@
+import base64
+import hashlib
+
+import pytest
+import tus
+from aiohttp import web
+
+from aiohttp_tus import setup_tus
+from aiohttp_tus.storage import ContentStore
+from tests.common import get_upload_url, TEST_FILE_PATH, TEST_UPLOAD_URL
+
+
+TEST_FILE_DIGEST = hashlib.sha256(TEST_FILE_PATH.read_bytes()).hexdigest()
+
+
+@pytest.fixture
+def content_store_client(aiohttp_client, tmp_path):
+    async def factory(content_store: ContentStore):
+        return await aiohttp_client(
+            setup_tus(
+                web.Application(),
+                upload_path=tmp_path,
+                upload_url=TEST_UPLOAD_URL,
+                content_store=content_store,
+            )
+        )
+
+    return factory
+
+
+def test_content_store(tmp_path):
+    store = ContentStore()
+    data = b"Hello, world!"
+    digest = hashlib.sha256(data).hexdigest()
+
+    for idx, chunk in enumerate((data[:5], data[5:])):
+        store.update(("/", "uid"), chunk=chunk, offset=idx * 5)
+    assert store.get_digest(("/", "uid"), size=len(data)) == digest
+
+    paths = (tmp_path / "first.txt", tmp_path / "second.txt")
+    for path in paths:
+        resource_path = tmp_path / "resource"
+        resource_path.write_bytes(data)
+        object_path = store.store(
+            tmp_path, resource_path, path, digest, overwrite=False
+        )
+
+    assert object_path.stat().st_nlink == 3
+    assert store.find(tmp_path, digest, size=len(data)) == object_path
+    assert store.find(tmp_path, "../../etc/passwd", size=len(data)) is None
+
+    assert store.release(tmp_path, paths[0], digest) is False
+    assert store.collect_garbage(tmp_path) == 0
+    assert store.release(tmp_path, paths[1], digest) is True
+    assert not object_path.exists()
+
+
+def test_content_store_out_of_order_chunks():
+    store = ContentStore()
+    store.update(("/", "uid"), chunk=b"Hello", offset=0)
+    store.update(("/", "uid"), chunk=b"world", offset=7)
+    assert store.get_digest(("/", "uid"), size=12) is None
+
+
+def test_content_store_expire_hashers():
+    store = ContentStore(hasher_ttl=-1)
+    store.update(("/", "abandoned"), chunk=b"Hello", offset=0)
+    store.update(("/", "uid"), chunk=b"Hello", offset=0)
+    assert list(store.hashers) == [("/", "uid")]
+    assert store.expire() == 1
+    assert store.get_digest(("/", "uid"), size=5) is None
+
+
+async def test_upload_deduplicated(content_store_client, loop, tmp_path):
+    client = await content_store_client(ContentStore())
+    tus_upload_url = get_upload_url(client, TEST_UPLOAD_URL)
+
+    for file_name in ("first.txt", "second.txt"):
+        with open(TEST_FILE_PATH, "rb") as handler:
+            await loop.run_in_executor(
+                None, lambda: tus.upload(handler, tus_upload_url, file_name=file_name)
+            )
+
+    first, second = (tmp_path / "first.txt"), (tmp_path / "second.txt")
+    assert first.read_bytes() == TEST_FILE_PATH.read_bytes()
+    assert first.stat().st_ino == second.stat().st_ino
+    assert first.stat().st_nlink == 3
+
+
+async def test_start_upload_declared_digest(content_store_client, loop, tmp_path):
+    client = await content_store_client(ContentStore(trust_declared_digest=True))
+    tus_upload_url = get_upload_url(client, TEST_UPLOAD_URL)
+
+    with open(TEST_FILE_PATH, "rb") as handler:
+        await loop.run_in_executor(
+            None, lambda: tus.upload(handler, tus_upload_url, file_name="first.txt")
+        )
+
+    metadata = ",".join(
+        f"{key} {base64.b64encode(value.encode()).decode()}"
+        for key, value in (("filename", "second.txt"), ("sha256", TEST_FILE_DIGEST))
+    )
+    response = await client.post(
+        TEST_UPLOAD_URL,
+        headers={
+            "Tus-Resumable": "1.0.0",
+            "Upload-Length": str(TEST_FILE_PATH.stat().st_size),
+            "Upload-Metadata": metadata,
+        },
+    )
+    assert response.status == 201
+    assert response.headers["Upload-Offset"] == str(TEST_FILE_PATH.stat().st_size)
+    assert (tmp_path / "second.txt").read_bytes() == TEST_FILE_PATH.read_bytes()
@@ -1,5 +1,7 @@
+import mmap
 import shutil
 from functools import partial
+from typing import Tuple
 
 try:
     from contextlib import asynccontextmanager
@@ -15,6 +17,14 @@ from aiohttp_tus import setup_tus
 from aiohttp_tus.annotations import Decorator, Handler
 from aiohttp_tus.constants import APP_TUS_CONFIG_KEY
 from aiohttp_tus.data import Config, ResourceCallback
+from aiohttp_tus.processors import ChunkProcessor, HeadProcessor
+from aiohttp_tus.scheduling import IOScheduler
+from aiohttp_tus.writers import (
+    DURABILITY_NONE,
+    DURABILITY_SYNC,
+    WRITE_MODE_FILE,
+    WRITE_MODE_MMAP,
+)
 from tests.common import (
     get_upload_url,
     TEST_CHUNK_SIZE,
@@ -40,6 +50,10 @@ def aiohttp_test_client(tmp_path, aiohttp_client):
         allow_overwrite_files: bool = False,
         on_upload_done: ResourceCallback = None,
         decorator: Decorator = None,
+        chunk_processors: Tuple[ChunkProcessor, ...] = (),
+        write_mode: str = WRITE_MODE_FILE,
+        durability: str = DURABILITY_NONE,
+        io_scheduler: IOScheduler = None,
     ) -> TestClient:
         upload_path = tmp_path / "aiohttp_tus"
         app = setup_tus(
@@ -50,6 +64,11 @@ def aiohttp_test_client(tmp_path, aiohttp_client):
             allow_overwrite_files=allow_overwrite_files,
             on_upload_done=on_upload_done,
             decorator=decorator,
+            chunk_processors=chunk_processors,
+            write_mode=write_mode,
+            mmap_window_size=mmap.ALLOCATIONGRANULARITY,
+            durability=durability,
+            io_scheduler=io_scheduler,
         )
         try:
             yield await aiohttp_client(app)
@@ -108,6 +127,7 @@ async def test_on_upload_callback(aiohttp_test_client, loop):
 
     async def on_upload_done(request, resource, file_path):
         data[resource.file_name] = file_path
+        data["metadata"] = resource.metadata
 
     async with aiohttp_test_client(
         upload_url=TEST_UPLOAD_URL, on_upload_done=on_upload_done
@@ -118,6 +138,29 @@ async def test_on_upload_callback(aiohttp_test_client, loop):
             )
 
     assert TEST_FILE_NAME in data
+    assert data["metadata"]["filename"] == TEST_FILE_NAME.encode()
+
+
+async def test_on_upload_callback_chunk_processors(aiohttp_test_client, loop):
+    data = {}
+    upload = partial(
+        tus.upload, file_name=TEST_SCREENSHOT_NAME, chunk_size=TEST_CHUNK_SIZE
+    )
+
+    async def on_upload_done(request, resource, file_path):
+        data.update(resource.processors_results)
+
+    async with aiohttp_test_client(
+        upload_url=TEST_UPLOAD_URL,
+        on_upload_done=on_upload_done,
+        chunk_processors=(HeadProcessor(size=16),),
+    ) as client:
+        with open(TEST_SCREENSHOT_PATH, "rb") as handler:
+            await loop.run_in_executor(
+                None, upload, handler, get_upload_url(client, TEST_UPLOAD_URL)
+            )
+
+    assert data == {"head": TEST_SCREENSHOT_PATH.read_bytes()[:16]}
 
 
 async def test_overwrite_file_allowed(aiohttp_test_client, loop):
@@ -243,6 +286,37 @@ async def test_upload_large_file(aiohttp_test_client, loop, chunk_size):
         assert expected_upload_path.read_bytes() == TEST_SCREENSHOT_PATH.read_bytes()
 
 
+@pytest.mark.parametrize(
+    "write_mode, durability, io_scheduler",
+    (
+        (WRITE_MODE_FILE, DURABILITY_SYNC, None),
+        (WRITE_MODE_MMAP, DURABILITY_NONE, None),
+        (WRITE_MODE_MMAP, DURABILITY_SYNC, None),
+        (WRITE_MODE_FILE, DURABILITY_SYNC, IOScheduler()),
+        (WRITE_MODE_MMAP, DURABILITY_SYNC, IOScheduler()),
+    ),
+)
+async def test_upload_large_file_write_mode(
+    aiohttp_test_client, loop, write_mode, durability, io_scheduler
+):
+    upload = partial(tus.upload, file_name=TEST_SCREENSHOT_NAME)
+
+    async with aiohttp_test_client(
+        upload_url=TEST_UPLOAD_URL,
+        write_mode=write_mode,
+        durability=durability,
+        io_scheduler=io_scheduler,
+    ) as client:
+        with open(TEST_SCREENSHOT_PATH, "rb") as handler:
+            await loop.run_in_executor(
+                None, upload, handler, get_upload_url(client, TEST_UPLOAD_URL)
+            )
+
+        config: Config = client.app[APP_TUS_CONFIG_KEY]["/uploads"]
+        expected_upload_path = config.resolve_upload_path({}) / TEST_SCREENSHOT_NAME
+        assert expected_upload_path.read_bytes() == TEST_SCREENSHOT_PATH.read_bytes()
+
+
 async def test_upload_resource_name(aiohttp_test_client, loop):
     upload = partial(tus.upload, file_name=TEST_FILE_NAME)
 
@@ -1,9 +1,22 @@
+import asyncio
+import errno
+import json
+import os
+import uuid
+
 import pytest
-from aiohttp import web
+from aiohttp import ClientError, web
 from aiohttp.test_utils import TestClient
+from yarl import URL
 
-from aiohttp_tus import setup_tus
-from tests.common import TEST_UPLOAD_PATH, TEST_UPLOAD_URL
+from aiohttp_tus import constants, setup_tus
+from aiohttp_tus.constants import APP_TUS_CONFIG_KEY
+from aiohttp_tus.validators import validate_upload_metadata
+from tests.common import (
+    TEST_UPLOAD_METADATA_HEADER,
+    TEST_UPLOAD_PATH,
+    TEST_UPLOAD_URL,
+)
 
 
 @pytest.fixture
@@ -45,5 +58,677 @@ async def test_upload_options_204(tus_test_client):
     headers = response.headers
     assert headers["Tus-Resumable"] == "1.0.0"
     assert headers["Tus-Version"] == "1.0.0"
-    assert headers["Tus-Extension"] == "creation,termination,file-check"
+    assert (
+        headers["Tus-Extension"]
+        == "creation,creation-defer-length,termination,file-check"
+    )
     assert headers["Tus-Max-Size"] == "4294967296"
+
+
+async def test_resource_events(aiohttp_client, tmp_path):
+    client = await aiohttp_client(
+        setup_tus(
+            web.Application(),
+            upload_path=tmp_path,
+            upload_url=TEST_UPLOAD_URL,
+            progress_events=True,
+        )
+    )
+    response = await client.post(
+        TEST_UPLOAD_URL,
+        headers={
+            "Tus-Resumable": "1.0.0",
+            "Upload-Length": "5",
+            "Upload-Metadata": TEST_UPLOAD_METADATA_HEADER,
+        },
+    )
+    assert response.status == 201
+    resource_url = URL(response.headers["Location"]).path
+    uid = response.headers["Tus-Temp-Filename"]
+
+    events = await client.get(f"{resource_url}/events")
+    assert events.headers["Content-Type"] == "text/event-stream"
+
+    event, data = (await events.content.readuntil(b"\n\n")).decode().split("\n")[:2]
+    assert event == "event: progress"
+    assert json.loads(data[6:]) == {
+        "uid": uid,
+        "offset": 0,
+        "file_size": 5,
+        "event": "progress",
+    }
+
+    response = await client.patch(
+        resource_url,
+        data=b"Hello",
+        headers={"Tus-Resumable": "1.0.0", "Upload-Offset": "0"},
+    )
+    assert response.status == 204
+    assert (await events.content.read()).startswith(b"event: completed\n")
+
+
+async def test_resource_details_cached(aiohttp_client, tmp_path):
+    client = await aiohttp_client(
+        setup_tus(
+            web.Application(),
+            upload_path=tmp_path,
+            upload_url=TEST_UPLOAD_URL,
+            resource_cache_size=16,
+        )
+    )
+    response = await client.post(
+        TEST_UPLOAD_URL,
+        headers={
+            "Tus-Resumable": "1.0.0",
+            "Upload-Length": "10",
+            "Upload-Metadata": TEST_UPLOAD_METADATA_HEADER,
+        },
+    )
+    resource_url = URL(response.headers["Location"]).path
+
+    response = await client.patch(
+        resource_url,
+        data=b"Hello",
+        headers={"Tus-Resumable": "1.0.0", "Upload-Offset": "0"},
+    )
+    assert response.status == 204
+
+    # Resource metadata file is not read, while resource is cached
+    uid = response.headers["Tus-Temp-Filename"]
+    (tmp_path / ".metadata" / f"{uid}.json").unlink()
+
+    response = await client.head(resource_url, headers={"Tus-Resumable": "1.0.0"})
+    assert response.status == 200
+    assert response.headers["Upload-Offset"] == "5"
+
+    config = client.app[APP_TUS_CONFIG_KEY][TEST_UPLOAD_URL]
+    assert config.resource_cache.hits == 2
+
+    response = await client.delete(resource_url, headers={"Tus-Resumable": "1.0.0"})
+    assert response.status == 204
+
+    response = await client.head(resource_url, headers={"Tus-Resumable": "1.0.0"})
+    assert response.status == 404
+
+
+async def test_start_upload_invalid_metadata(aiohttp_client, tmp_path):
+    def deny_executables(metadata):
+        if metadata["filename"].endswith(b".exe"):
+            raise web.HTTPUnprocessableEntity(text="Executables are not allowed")
+        return metadata
+
+    client = await aiohttp_client(
+        setup_tus(
+            web.Application(),
+            upload_path=tmp_path,
+            upload_url=TEST_UPLOAD_URL,
+            metadata_validators=(validate_upload_metadata, deny_executables),
+            max_metadata_keys=2,
+        )
+    )
+    headers = {"Tus-Resumable": "1.0.0", "Upload-Length": "10"}
+
+    response = await client.post(
+        TEST_UPLOAD_URL,
+        headers={**headers, "Upload-Metadata": f"{TEST_UPLOAD_METADATA_HEADER},a,b"},
+    )
+    assert response.status == 400
+
+    response = await client.post(
+        TEST_UPLOAD_URL, headers={**headers, "Upload-Metadata": "filename aGkuZXhl"}
+    )
+    assert response.status == 422
+
+    response = await client.post(
+        TEST_UPLOAD_URL,
+        headers={**headers, "Upload-Metadata": TEST_UPLOAD_METADATA_HEADER},
+    )
+    assert response.status == 201
+
+
+async def test_upload_details(aiohttp_client, tmp_path):
+    client = await aiohttp_client(
+        setup_tus(
+            web.Application(), upload_path=tmp_path, upload_url=TEST_UPLOAD_URL
+        )
+    )
+    headers = {"Upload-Metadata": TEST_UPLOAD_METADATA_HEADER}
+
+    response = await client.get(TEST_UPLOAD_URL, headers=headers)
+    assert response.status == 200
+    assert response.headers["Tus-File-Exists"] == "false"
+
+    (tmp_path / "hello.txt").write_text("Hello, world!")
+    response = await client.get(TEST_UPLOAD_URL, headers=headers)
+    assert response.headers["Tus-File-Exists"] == "true"
+    assert response.headers["Tus-File-Name"] == "hello.txt"
+
+
+@pytest.mark.parametrize("fingerprint_lookup", (False, True))
+async def test_upload_details_resume(aiohttp_client, tmp_path, fingerprint_lookup):
+    client = await aiohttp_client(
+        setup_tus(
+            web.Application(),
+            upload_path=tmp_path,
+            upload_url=TEST_UPLOAD_URL,
+            upload_index=True,
+            fingerprint_lookup=fingerprint_lookup,
+        )
+    )
+    headers = {
+        "Tus-Resumable": "1.0.0",
+        "Upload-Length": "13",
+        "Upload-Metadata": f"{TEST_UPLOAD_METADATA_HEADER}, fingerprint YWJj",
+    }
+
+    response = await client.get(TEST_UPLOAD_URL, headers=headers)
+    assert "Location" not in response.headers
+
+    response = await client.post(TEST_UPLOAD_URL, headers=headers)
+    assert response.status == 201
+    location = response.headers["Location"]
+    uid = response.headers["Tus-Temp-Filename"]
+
+    response = await client.patch(
+        URL(location).path,
+        data=b"Hello",
+        headers={
+            "Tus-Resumable": "1.0.0",
+            "Content-Type": "application/offset+octet-stream",
+            "Upload-Offset": "0",
+        },
+    )
+    assert response.status == 204
+
+    # Client, which lost upload URL, finds it by the same fingerprint
+    response = await client.get(TEST_UPLOAD_URL, headers=headers)
+    if not fingerprint_lookup:
+        assert "Location" not in response.headers
+        return
+    assert response.status == 200
+    assert response.headers["Location"] == location
+    assert response.headers["Tus-Temp-Filename"] == uid
+    assert response.headers["Upload-Offset"] == "5"
+
+    for other_headers in (
+        {**headers, "Upload-Length": "14"},
+        {**headers, "Upload-Metadata": TEST_UPLOAD_METADATA_HEADER},
+    ):
+        response = await client.get(TEST_UPLOAD_URL, headers=other_headers)
+        assert "Location" not in response.headers
+
+    response = await client.delete(
+        URL(location).path, headers={"Tus-Resumable": "1.0.0"}
+    )
+    assert response.status == 204
+    response = await client.get(TEST_UPLOAD_URL, headers=headers)
+    assert "Location" not in response.headers
+
+
+def test_upload_details_resume_without_index(tmp_path):
+    with pytest.raises(ValueError):
+        setup_tus(
+            web.Application(),
+            upload_path=tmp_path,
+            upload_url=TEST_UPLOAD_URL,
+            fingerprint_lookup=True,
+        )
+
+
+@pytest.mark.parametrize(
+    "options",
+    (
+        {"read_idle_timeout": 0.1},
+        {"min_upload_rate": 1024, "min_upload_rate_grace": 0.1},
+    ),
+)
+async def test_upload_resource_slow_client(aiohttp_client, tmp_path, options):
+    client = await aiohttp_client(
+        setup_tus(
+            web.Application(),
+            upload_path=tmp_path,
+            upload_url=TEST_UPLOAD_URL,
+            **options,
+        )
+    )
+    response = await client.post(
+        TEST_UPLOAD_URL,
+        headers={
+            "Tus-Resumable": "1.0.0",
+            "Upload-Length": "13",
+            "Upload-Metadata": TEST_UPLOAD_METADATA_HEADER,
+        },
+    )
+    resource_url = URL(response.headers["Location"]).path
+    headers = {
+        "Tus-Resumable": "1.0.0",
+        "Content-Type": "application/offset+octet-stream",
+    }
+
+    async def body():
+        yield b"Hello"
+        await asyncio.sleep(1)
+        yield b", world!"
+
+    # Connection is closed without reading rest of the body, so client might not
+    # receive the response, but data received before the cut off is persisted
+    try:
+        response = await client.patch(
+            resource_url, data=body(), headers={**headers, "Upload-Offset": "0"}
+        )
+    except ClientError:
+        pass
+    else:
+        assert response.status == 408
+
+    response = await client.head(resource_url, headers=headers)
+    assert response.headers["Upload-Offset"] == "5"
+
+
+async def test_upload_resource_deferred_length(aiohttp_client, tmp_path):
+    client = await aiohttp_client(
+        setup_tus(
+            web.Application(),
+            upload_path=tmp_path,
+            upload_url=TEST_UPLOAD_URL,
+            write_mode="mmap",
+        )
+    )
+    headers = {
+        "Tus-Resumable": "1.0.0",
+        "Upload-Metadata": TEST_UPLOAD_METADATA_HEADER,
+    }
+
+    response = await client.post(TEST_UPLOAD_URL, headers=headers)
+    assert response.status == 400
+
+    response = await client.post(
+        TEST_UPLOAD_URL, headers={**headers, "Upload-Defer-Length": "1"}
+    )
+    assert response.status == 201
+    resource_url = URL(response.headers["Location"]).path
+    resource_path = tmp_path / ".resources" / response.headers["Tus-Temp-Filename"]
+    assert resource_path.stat().st_size == 0
+
+    headers = {
+        "Tus-Resumable": "1.0.0",
+        "Content-Type": "application/offset+octet-stream",
+    }
+
+    # Resource grows by appending chunks, until client declares its length
+    for offset, data in ((0, b"Hello"), (5, b", ")):
+        response = await client.patch(
+            resource_url, data=data, headers={**headers, "Upload-Offset": str(offset)}
+        )
+        assert response.status == 204
+        assert response.headers["Upload-Offset"] == str(offset + len(data))
+    assert resource_path.read_bytes() == b"Hello, "
+
+    response = await client.head(resource_url, headers=headers)
+    assert response.headers["Upload-Defer-Length"] == "1"
+    assert "Upload-Length" not in response.headers
+
+    response = await client.patch(
+        resource_url,
+        data=b"world",
+        headers={**headers, "Upload-Offset": "7", "Upload-Length": "5"},
+    )
+    assert response.status == 400
+
+    response = await client.patch(
+        resource_url,
+        data=b"world",
+        headers={**headers, "Upload-Offset": "7", "Upload-Length": "13"},
+    )
+    assert response.status == 204
+    assert response.headers["Upload-Offset"] == "12"
+    # Declared length is only recorded, while resource keeps growing by appending
+    assert resource_path.stat().st_size == 12
+
+    response = await client.head(resource_url, headers=headers)
+    assert response.headers["Upload-Length"] == "13"
+
+    # Length can not be changed, once declared
+    response = await client.patch(
+        resource_url,
+        data=b"!",
+        headers={**headers, "Upload-Offset": "12", "Upload-Length": "14"},
+    )
+    assert response.status == 400
+
+    response = await client.patch(
+        resource_url, data=b"!", headers={**headers, "Upload-Offset": "12"}
+    )
+    assert response.status == 204
+    assert (tmp_path / "hello.txt").read_bytes() == b"Hello, world!"
+
+
+async def test_upload_resource_deferred_length_max_size(
+    aiohttp_client, monkeypatch, tmp_path
+):
+    monkeypatch.setattr(constants, "TUS_MAX_FILE_SIZE", 8)
+    client = await aiohttp_client(
+        setup_tus(web.Application(), upload_path=tmp_path, upload_url=TEST_UPLOAD_URL)
+    )
+    response = await client.post(
+        TEST_UPLOAD_URL,
+        headers={
+            "Tus-Resumable": "1.0.0",
+            "Upload-Defer-Length": "1",
+            "Upload-Metadata": TEST_UPLOAD_METADATA_HEADER,
+        },
+    )
+    resource_url = URL(response.headers["Location"]).path
+    headers = {
+        "Tus-Resumable": "1.0.0",
+        "Content-Type": "application/offset+octet-stream",
+    }
+
+    response = await client.patch(
+        resource_url, data=b"Hello", headers={**headers, "Upload-Offset": "0"}
+    )
+    assert response.status == 204
+
+    # Appended chunk can not grow resource beyond max file size
+    response = await client.patch(
+        resource_url, data=b", world", headers={**headers, "Upload-Offset": "5"}
+    )
+    assert response.status == 413
+    response = await client.head(resource_url, headers=headers)
+    assert response.headers["Upload-Offset"] == "5"
+
+
+async def test_upload_resource_chunked(aiohttp_client, tmp_path):
+    client = await aiohttp_client(
+        setup_tus(
+            web.Application(client_max_size=8),
+            upload_path=tmp_path,
+            upload_url=TEST_UPLOAD_URL,
+        )
+    )
+    response = await client.post(
+        TEST_UPLOAD_URL,
+        headers={
+            "Tus-Resumable": "1.0.0",
+            "Upload-Length": "13",
+            "Upload-Metadata": TEST_UPLOAD_METADATA_HEADER,
+        },
+    )
+    resource_url = URL(response.headers["Location"]).path
+    headers = {
+        "Tus-Resumable": "1.0.0",
+        "Content-Type": "application/offset+octet-stream",
+    }
+
+    async def body(data: bytes):
+        for idx in range(0, len(data), 4):
+            yield data[idx : idx + 4]  # noqa: E203
+            await asyncio.sleep(0.01)
+
+    # Chunk larger than remaining resource size is rejected before reading it
+    response = await client.patch(
+        resource_url,
+        data=b"Hello, world!!",
+        headers={**headers, "Upload-Offset": "0"},
+    )
+    assert response.status == 413
+
+    # Partial chunk is accepted, when chunked request body exceeds max size
+    response = await client.patch(
+        resource_url,
+        data=body(b"Hello, world!"),
+        headers={**headers, "Upload-Offset": "0"},
+    )
+    assert response.status == 413
+
+    response = await client.head(resource_url, headers=headers)
+    offset = int(response.headers["Upload-Offset"])
+    assert offset == 8
+
+    # Upload is resumed exactly where written data ends
+    response = await client.patch(
+        resource_url,
+        data=body(b"Hello, world!"[offset:]),
+        headers={**headers, "Upload-Offset": str(offset)},
+    )
+    assert response.status == 204
+    assert response.headers["Upload-Offset"] == "13"
+    assert (tmp_path / "hello.txt").read_bytes() == b"Hello, world!"
+
+
+async def test_download_resource(aiohttp_client, tmp_path):
+    client = await aiohttp_client(
+        setup_tus(
+            web.Application(),
+            upload_path=tmp_path,
+            upload_url=TEST_UPLOAD_URL,
+            downloads=True,
+        )
+    )
+    response = await client.post(
+        TEST_UPLOAD_URL,
+        headers={
+            "Tus-Resumable": "1.0.0",
+            "Upload-Length": "13",
+            "Upload-Metadata": TEST_UPLOAD_METADATA_HEADER,
+        },
+    )
+    resource_url = URL(response.headers["Location"]).path
+    headers = {
+        "Tus-Resumable": "1.0.0",
+        "Content-Type": "application/offset+octet-stream",
+    }
+
+    response = await client.patch(
+        resource_url, data=b"Hello", headers={**headers, "Upload-Offset": "0"}
+    )
+    assert response.status == 204
+
+    # Only uploaded data is available for in-progress resource
+    response = await client.get(resource_url)
+    assert response.status == 200
+    assert response.headers["Upload-Offset"] == "5"
+    assert await response.read() == b"Hello"
+
+    response = await client.get(resource_url, headers={"Range": "bytes=1-2"})
+    assert response.status == 206
+    assert response.headers["Content-Range"] == "bytes 1-2/5"
+    assert await response.read() == b"el"
+
+    response = await client.get(resource_url, headers={"Range": "bytes=5-"})
+    assert response.status == 416
+
+    response = await client.patch(
+        resource_url, data=b", world!", headers={**headers, "Upload-Offset": "5"}
+    )
+    assert response.status == 204
+
+    # Completed resource is sent as file
+    response = await client.get(resource_url, headers={"Range": "bytes=-6"})
+    assert response.status == 206
+    assert await response.read() == b"world!"
+
+    (tmp_path / "hello.txt").unlink()
+    response = await client.get(resource_url)
+    assert response.status == 404
+
+
+async def test_download_resource_outside_upload_path(aiohttp_client, tmp_path):
+    upload_path = tmp_path / "uploads"
+    client = await aiohttp_client(
+        setup_tus(
+            web.Application(),
+            upload_path=upload_path,
+            upload_url=TEST_UPLOAD_URL,
+            downloads=True,
+        )
+    )
+    secret_path = tmp_path / "secret.txt"
+    secret_path.write_bytes(b"Secret")
+    uid = str(uuid.uuid4())
+    completed_path = upload_path / ".completed"
+    completed_path.mkdir(parents=True)
+    (completed_path / uid).symlink_to(secret_path)
+    (completed_path / "secret").symlink_to(secret_path)
+
+    for resource_uid in (uid, "secret", "..%2Fsecret.txt"):
+        response = await client.get(f"{TEST_UPLOAD_URL}/{resource_uid}")
+        assert response.status == 404
+
+
+async def test_upload_resource_pipelined(aiohttp_client, tmp_path):
+    client = await aiohttp_client(
+        setup_tus(
+            web.Application(),
+            upload_path=tmp_path,
+            upload_url=TEST_UPLOAD_URL,
+            pipelining_window=10,
+        )
+    )
+    response = await client.options(
+        TEST_UPLOAD_URL, headers={"Tus-Resumable": "1.0.0"}
+    )
+    assert response.headers["Tus-Extension"].endswith(",pipelining")
+    assert response.headers["Tus-Pipelining-Window"] == "10"
+
+    response = await client.post(
+        TEST_UPLOAD_URL,
+        headers={
+            "Tus-Resumable": "1.0.0",
+            "Upload-Length": "13",
+            "Upload-Metadata": TEST_UPLOAD_METADATA_HEADER,
+        },
+    )
+    resource_url = URL(response.headers["Location"]).path
+    headers = {
+        "Tus-Resumable": "1.0.0",
+        "Content-Type": "application/offset+octet-stream",
+        "Upload-Pipelining": "true",
+    }
+
+    def patch(offset: int, data: bytes):
+        return client.patch(
+            resource_url, data=data, headers={**headers, "Upload-Offset": str(offset)}
+        )
+
+    # Chunk beyond pipelining window
+    response = await patch(8, b"orld!")
+    assert response.status == 409
+
+    # Out of order chunks do not advance offset until the gap is filled
+    response = await patch(5, b", ")
+    assert response.status == 204
+    assert response.headers["Upload-Offset"] == "0"
+
+    response = await patch(5, b", ")
+    assert response.status == 409
+
+    responses = await asyncio.gather(patch(7, b"wor"), patch(0, b"Hello"))
+    assert [item.status for item in responses] == [204, 204]
+    assert {item.headers["Upload-Offset"] for item in responses} <= {"0", "7", "10"}
+
+    response = await patch(10, b"ld!")
+    assert response.status == 204
+    assert response.headers["Upload-Offset"] == "13"
+    assert (tmp_path / "hello.txt").read_bytes() == b"Hello, world!"
+
+
+async def test_upload_resource_pipelined_inflight(aiohttp_client, tmp_path):
+    client = await aiohttp_client(
+        setup_tus(
+            web.Application(),
+            upload_path=tmp_path,
+            upload_url=TEST_UPLOAD_URL,
+            pipelining_window=13,
+        )
+    )
+    response = await client.post(
+        TEST_UPLOAD_URL,
+        headers={
+            "Tus-Resumable": "1.0.0",
+            "Upload-Length": "13",
+            "Upload-Metadata": TEST_UPLOAD_METADATA_HEADER,
+        },
+    )
+    resource_url = URL(response.headers["Location"]).path
+    headers = {
+        "Tus-Resumable": "1.0.0",
+        "Content-Type": "application/offset+octet-stream",
+        "Upload-Pipelining": "true",
+    }
+    started, resumed = asyncio.Event(), asyncio.Event()
+
+    async def slow_body():
+        yield b"Hello"
+        started.set()
+        await resumed.wait()
+        yield b", wo"
+
+    task = asyncio.create_task(
+        client.patch(
+            resource_url,
+            data=slow_body(),
+            headers={**headers, "Content-Length": "9", "Upload-Offset": "0"},
+        )
+    )
+    await started.wait()
+    await asyncio.sleep(0.05)
+
+    # Chunk overlaps with range of the chunk, which is being uploaded
+    response = await client.patch(
+        resource_url, data=b"world!", headers={**headers, "Upload-Offset": "7"}
+    )
+    assert response.status == 409
+
+    resumed.set()
+    response = await task
+    assert response.status == 204
+    assert response.headers["Upload-Offset"] == "9"
+
+    response = await client.patch(
+        resource_url, data=b"rld!", headers={**headers, "Upload-Offset": "9"}
+    )
+    assert response.status == 204
+    assert response.headers["Upload-Offset"] == "13"
+    assert (tmp_path / "hello.txt").read_bytes() == b"Hello, world!"
+    assert client.app[APP_TUS_CONFIG_KEY][TEST_UPLOAD_URL].inflight_ranges == {}
+
+
+@pytest.mark.skipif(
+    not hasattr(os, "posix_fallocate"), reason="posix_fallocate is not supported"
+)
+async def test_upload_resource_disk_full(aiohttp_client, monkeypatch, tmp_path):
+    client = await aiohttp_client(
+        setup_tus(
+            web.Application(),
+            upload_path=tmp_path,
+            upload_url=TEST_UPLOAD_URL,
+            write_mode="mmap",
+        )
+    )
+    response = await client.post(
+        TEST_UPLOAD_URL,
+        headers={
+            "Tus-Resumable": "1.0.0",
+            "Upload-Length": "5",
+            "Upload-Metadata": TEST_UPLOAD_METADATA_HEADER,
+        },
+    )
+    resource_url = URL(response.headers["Location"]).path
+
+    def posix_fallocate(fd: int, offset: int, length: int) -> None:
+        raise OSError(errno.ENOSPC, os.strerror(errno.ENOSPC))
+
+    monkeypatch.setattr(os, "posix_fallocate", posix_fallocate)
+    headers = {
+        "Tus-Resumable": "1.0.0",
+        "Content-Type": "application/offset+octet-stream",
+        "Upload-Offset": "0",
+    }
+    response = await client.patch(resource_url, data=b"Hello", headers=headers)
+    assert response.status == 507
+
+    monkeypatch.undo()
+    response = await client.patch(resource_url, data=b"Hello", headers=headers)
+    assert response.status == 204
+    assert (tmp_path / "hello.txt").read_bytes() == b"Hello"
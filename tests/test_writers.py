@@ -0,0 +1,131 @@
+import errno
+import mmap
+import os
+
+import pytest
+
+from aiohttp_tus.writers import (
+    BufferPool,
+    ChunkWriter,
+    DURABILITY_SYNC,
+    MmapChunkWriter,
+)
+
+
+@pytest.fixture
+def path(tmp_path):
+    path = tmp_path / "resource"
+    path.write_bytes(b"\0" * 32)
+    return path
+
+
+def test_buffer_pool():
+    pool = BufferPool(buffer_size=8, max_buffers=1)
+    first, second = pool.acquire(), pool.acquire()
+    assert len(first) == 8
+    assert first is not second
+
+    pool.release(first)
+    pool.release(second)
+    assert pool.buffers == [first]
+    assert pool.acquire() is first
+
+
+def test_chunk_writer_coalesces_slices(path):
+    pool = BufferPool(buffer_size=8)
+    with ChunkWriter(path=path, offset=4, pool=pool) as writer:
+        writer.write(b"Hel")
+        writer.write(b"lo")
+        assert writer.buffered == 5
+        assert writer.offset == 4
+        assert writer.needs_flush(3) is False
+        assert writer.needs_flush(4) is True
+
+        writer.write(b", wor")
+        assert writer.buffered == 5
+        assert writer.offset == 9
+
+        writer.write(b"ld! Large slice")
+        assert writer.buffered == 0
+        assert writer.offset == 29
+
+        writer.write(b"!")
+
+    assert writer.offset == 30
+    assert pool.buffers and writer.buffer is None
+    assert path.read_bytes() == b"\0" * 4 + b"Hello, world! Large slice!" + b"\0" * 2
+
+
+def test_chunk_writer_flushes_on_error(path):
+    pool = BufferPool(buffer_size=8)
+    with pytest.raises(ValueError):
+        with ChunkWriter(path=path, offset=0, pool=pool) as writer:
+            writer.write(b"Hello")
+            raise ValueError("Request body interrupted")
+
+    assert writer.offset == 5
+    assert path.read_bytes()[:6] == b"Hello\0"
+
+
+def test_chunk_writer_sync(path):
+    with ChunkWriter(
+        path=path, offset=0, pool=BufferPool(buffer_size=8), durability=DURABILITY_SYNC
+    ) as writer:
+        writer.write(b"Hello")
+        assert writer.dirty is False
+
+        writer.sync()
+        assert writer.buffered == 0
+        assert writer.dirty is False
+        assert path.read_bytes()[:6] == b"Hello\0"
+
+
+@pytest.mark.parametrize("offset", (0, 100))
+def test_mmap_chunk_writer_windows(tmp_path, offset):
+    window_size = mmap.ALLOCATIONGRANULARITY
+    data = bytes(range(256)) * (window_size * 3 // 256)
+
+    path = tmp_path / "resource"
+    path.write_bytes(b"\0" * (offset + len(data)))
+
+    with MmapChunkWriter(
+        path=path, offset=offset, window_size=window_size, durability=DURABILITY_SYNC
+    ) as writer:
+        for idx in range(0, len(data), 1000):
+            writer.write(data[idx : idx + 1000])  # noqa: E203
+            assert len(writer.mapping) <= window_size * 2
+        assert writer.offset == offset + len(data)
+
+        with pytest.raises(ValueError):
+            writer.write(b"!")
+
+    assert writer.mapping is None
+    assert path.read_bytes() == b"\0" * offset + data
+
+
+@pytest.mark.skipif(
+    not hasattr(os, "posix_fallocate"), reason="posix_fallocate is not supported"
+)
+def test_mmap_chunk_writer_disk_full(monkeypatch, tmp_path):
+    path = tmp_path / "resource"
+    path.write_bytes(b"")
+    os.truncate(path, mmap.ALLOCATIONGRANULARITY * 4)
+
+    def posix_fallocate(fd: int, offset: int, length: int) -> None:
+        raise OSError(errno.ENOSPC, os.strerror(errno.ENOSPC))
+
+    # Window is allocated before mapping, so full disk raises error instead of
+    # SIGBUS on storing into sparse page
+    with MmapChunkWriter(
+        path=path, offset=0, window_size=mmap.ALLOCATIONGRANULARITY
+    ) as writer:
+        with monkeypatch.context() as patch:
+            patch.setattr(os, "posix_fallocate", posix_fallocate)
+            with pytest.raises(OSError) as err:
+                writer.write(b"Hello")
+        assert err.value.errno == errno.ENOSPC
+        assert writer.offset == 0
+        assert writer.mapping is None
+
+        writer.write(b"Hello")
+    assert path.read_bytes()[:5] == b"Hello"